@@ -0,0 +1,244 @@
+"""
+Admission control for chat requests and concurrency limits for the
+upstreams they fan out to. Under overload, requests are turned away early
+with 429 (per-user rate limit) or 503 (server busy) and a Retry-After hint
+instead of queueing without bound in front of Gemini, Yahoo and MongoDB.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from concurrency import UPSTREAM_WAIT_TIMEOUT, UpstreamBusy, yahoo_limit
+from metrics import CallbackMetric, Counter, Histogram, metrics_registry, run_callbacks
+
+# Chat requests processed at once; further requests wait in a bounded queue.
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "64"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "256"))
+# Longest a request may wait for a slot. Requests that would not get one in
+# time are rejected up front.
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "5"))
+# Per-user token bucket keyed on the request id; a rate of 0 disables it.
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "30"))
+CHAT_BURST = int(os.getenv("CHAT_BURST", "10"))
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "100000"))
+
+# LLM calls in flight across all requests. Yahoo is bounded by yahoo_limit
+# (concurrency.py), MongoDB by the Motor pool (MONGO_MAX_POOL_SIZE and
+# MONGO_WAIT_QUEUE_TIMEOUT_MS in db.py).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+admission_rejections = metrics_registry.register(Counter(
+    "fingpt_admission_rejections_total", "Chat requests turned away, by reason.", ("reason",)
+))
+admission_wait_seconds = metrics_registry.register(Histogram(
+    "fingpt_admission_wait_seconds", "Time admitted chat requests waited in the queue."
+))
+
+
+class Rejected(Exception):
+    """
+    A request turned away by admission control: `status` is 429 or 503 and
+    `retry_after` the number of seconds to suggest in Retry-After.
+    """
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBuckets:
+    """
+    One token bucket per key refilled at `rate_per_minute`, holding at most
+    `burst` tokens. Idle keys are dropped LRU-first beyond max_keys.
+    """
+
+    def __init__(self, rate_per_minute: float = CHAT_RATE_PER_MINUTE, burst: int = CHAT_BURST,
+                 max_keys: int = RATE_LIMIT_MAX_USERS):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """
+        Take a token for `key`. Returns 0 on success, else the seconds until
+        a token is available.
+        """
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+    def refund(self, key: str) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + 1)
+
+
+class AdmissionController:
+    """
+    Per-user rate limit, then a global concurrency limit with a bounded FIFO
+    wait queue. The expected wait is estimated from the queue depth
+    and a moving average of request service time; a request that would not
+    be admitted within `queue_timeout` is rejected at once.
+    """
+
+    def __init__(self, max_concurrency: int = CHAT_MAX_CONCURRENCY, max_queue: int = CHAT_MAX_QUEUE,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT, buckets: Optional[TokenBuckets] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buckets = buckets or TokenBuckets()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        # Moving average of seconds a request holds its slot.
+        self.service_time = 1.0
+
+    def _reject(self, user_id: str, status: int, reason: str, retry_after: float) -> Rejected:
+        admission_rejections.inc(reason=reason)
+        if status == 503:
+            self.buckets.refund(user_id)
+        return Rejected(status, reason, retry_after)
+
+    def expected_wait(self) -> float:
+        return (self.waiting + 1) / self.max_concurrency * self.service_time
+
+    async def acquire(self, user_id: str) -> float:
+        """
+        Wait for a slot. Returns the admission time to pass to release();
+        raises Rejected when the user is over their rate or the server is
+        too busy.
+        """
+        wait = self.buckets.take(user_id)
+        if wait:
+            raise self._reject(user_id, 429, "rate_limited", wait)
+        if self._slots.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                raise self._reject(user_id, 503, "queue_full", self.expected_wait())
+            if self.expected_wait() > self.queue_timeout:
+                raise self._reject(user_id, 503, "deadline", self.expected_wait())
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(user_id, 503, "queue_timeout", self.expected_wait())
+        finally:
+            self.waiting -= 1
+        admitted = time.monotonic()
+        admission_wait_seconds.observe(admitted - start)
+        self.active += 1
+        return admitted
+
+    def release(self, admitted: float) -> None:
+        self.active -= 1
+        self._slots.release()
+        self.service_time += 0.2 * (time.monotonic() - admitted - self.service_time)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        admitted = await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(admitted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": self.active, "waiting": self.waiting, "service_time": self.service_time}
+
+
+class LLMLimit(AsyncCallbackHandler):
+    """
+    Bounds concurrent LLM calls across requests. Attached to every LangChain
+    run: a call takes a slot when it starts and returns it when it ends or
+    fails; raises UpstreamBusy after waiting `timeout` for a slot.
+    """
+
+    raise_error = True
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = UPSTREAM_WAIT_TIMEOUT):
+        self.name = "llm"
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._holders: Set[Any] = set()
+        self.active = 0
+        self.waiting = 0
+        self.rejections = 0
+
+    async def _acquire(self, run_id) -> None:
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejections += 1
+            raise UpstreamBusy("The language model is busy, try again shortly.")
+        finally:
+            self.waiting -= 1
+        self._holders.add(run_id)
+        self.active += 1
+
+    def _release(self, run_id) -> None:
+        if run_id in self._holders:
+            self._holders.discard(run_id)
+            self.active -= 1
+            self._slots.release()
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        await self._acquire(run_id)
+
+    async def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        await self._acquire(run_id)
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        self._release(run_id)
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        self._release(run_id)
+
+
+admission = AdmissionController()
+llm_limit = LLMLimit()
+
+run_callbacks.append(llm_limit)
+
+metrics_registry.register(CallbackMetric(
+    "fingpt_admission_in_flight", "Chat requests being processed.", "gauge", (),
+    lambda: {(): admission.active}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_admission_queue_depth", "Chat requests waiting for a slot.", "gauge", (),
+    lambda: {(): admission.waiting}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_upstream_in_flight", "Upstream calls in flight.", "gauge", ("upstream",),
+    lambda: {(limit.name,): limit.active for limit in (llm_limit, yahoo_limit)}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_upstream_rejections_total", "Upstream calls failed for lack of a free slot.", "counter", ("upstream",),
+    lambda: {(limit.name,): limit.rejections for limit in (llm_limit, yahoo_limit)}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_upstream_waiting", "Upstream calls waiting for a slot.", "gauge", ("upstream",),
+    lambda: {(limit.name,): limit.waiting for limit in (llm_limit, yahoo_limit)}
+))
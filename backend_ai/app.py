@@ -1,9 +1,29 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Dict, Optional
+import asyncio
+import json
+import os
 import uvicorn
-from model import process_chat  
+from model import process_chat, stream_chat
+from admission import Rejected, admission
+from concurrency import UpstreamBusy, install_blocking_executor, run_blocking
+from cache_backends import cache_backend
+from db import ensure_indexes, portfolio_cache
+from memory import conversation_memory
+from market_cache import market_cache
+from response_cache import response_cache
+from metrics import CallbackMetric, collect_timings, metrics_registry, register_cache
+from prefetch import PREFETCH_ENABLED, prefetcher
+from model_config import MODEL_COMPONENTS
+import model_router  # registers the model tier metrics
+from registry import registry
+
+# Build the LLM, agents and database client before serving instead of on
+# the first request. Off by default so workers start (and scale out) fast.
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
 
 app = FastAPI()
 
@@ -15,20 +35,214 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def configure_executor():
+    # Agents run synchronous yfinance/pymongo tools through the loop's default
+    # executor; keep those threads on the bounded pool.
+    install_blocking_executor()
+
+async def _ensure_indexes():
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        print(f"Could not ensure MongoDB indexes: {str(e)}")
+
+@app.on_event("startup")
+async def create_indexes():
+    # In the background: startup shouldn't wait on a MongoDB round trip.
+    app.state.index_task = asyncio.create_task(_ensure_indexes())
+
+def warm_up():
+    """
+    Build every registered component and train the local intent classifier.
+    Failures are logged and left for the first request to surface.
+    """
+    from intent_classifier import classify_locally
+
+    classify_locally("warm up")
+    for name in MODEL_COMPONENTS + ("mongo", "ticker"):
+        try:
+            registry.get(name)
+        except Exception as e:
+            print(f"Could not warm up {name}: {str(e)}")
+    return registry.stats()
+
+@app.on_event("startup")
+async def warm_up_components():
+    if WARM_UP_ON_STARTUP:
+        await run_blocking(warm_up)
+
+@app.on_event("startup")
+async def start_prefetching():
+    # Keeps the most requested tickers' market data warm in the background.
+    if PREFETCH_ENABLED:
+        app.state.prefetch_task = asyncio.create_task(prefetcher.run())
+
+@app.on_event("shutdown")
+async def flush_conversations():
+    await conversation_memory.flush()
+
+register_cache("market", market_cache.stats)
+register_cache("response", response_cache.stats)
+register_cache("portfolio", portfolio_cache.stats)
+register_cache("conversation", conversation_memory.stats)
+metrics_registry.register(CallbackMetric(
+    "fingpt_cache_backend_errors_total", "Cache backend operations that failed and were served as misses.",
+    "counter", ("backend",), lambda: {(cache_backend().name,): cache_backend().errors}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_prefetch_requests_total", "Upstream requests made by the prefetcher.", "counter", ("kind",),
+    lambda: {(kind,): count for kind, count in prefetcher.requests.items()}
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_prefetch_over_budget_total", "Prefetches deferred for lack of upstream budget.", "counter", (),
+    lambda: {(): prefetcher.over_budget}
+))
+
 class ChatRequest(BaseModel):
     message: str
     id: str
+    # Include a per-stage timing breakdown (seconds) in the response.
+    timings: bool = False
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response that releases its admission slot once it has been
+    sent, including when the client disconnects before the body starts and
+    the body generator never runs.
+    """
+
+    def __init__(self, content, admitted: float, **kwargs):
+        super().__init__(content, **kwargs)
+        self.admitted = admitted
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self.admitted)
+
+def rejection_response(rejection: Rejected) -> JSONResponse:
+    return JSONResponse(
+        {"error": f"Server busy ({rejection.reason}), retry in {rejection.retry_after}s."},
+        status_code=rejection.status,
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     try:
-        response_data = await process_chat(request.message,request.id)
-        return {
+        admitted = await admission.acquire(request.id)
+    except Rejected as rejection:
+        return rejection_response(rejection)
+    try:
+        if request.timings:
+            with collect_timings() as timings:
+                response_data = await process_chat(request.message, request.id)
+        else:
+            response_data = await process_chat(request.message,request.id)
+        result = {
             "intent": response_data[0],
             "response": response_data[1]
         }
+        if request.timings:
+            result["timings"] = timings
+        return result
+    except UpstreamBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
     except Exception as e:
         return {"error": f"Error processing chat request: {str(e)}"}
+    finally:
+        admission.release(admitted)
+
+class ValuationRequest(BaseModel):
+    # Price paid per share by ticker; positions without one get no P&L.
+    cost_basis: Optional[Dict[str, float]] = None
+
+@app.get("/portfolio/{user_id}/valuation")
+async def portfolio_valuation_endpoint(user_id: str):
+    """
+    Current valuation of the user's portfolio (positions, totals, sector
+    exposure) computed directly, without the LLM.
+    """
+    return await _portfolio_valuation(user_id)
+
+@app.post("/portfolio/{user_id}/valuation")
+async def portfolio_valuation_with_cost_endpoint(user_id: str, request: ValuationRequest):
+    return await _portfolio_valuation(user_id, request.cost_basis)
+
+async def _portfolio_valuation(user_id: str, cost_basis: Optional[Dict[str, float]] = None):
+    from tools import value_user_portfolio
+
+    # Valuations reach Yahoo and MongoDB like a chat request, so they share
+    # its admission control and per-user rate limit.
+    try:
+        async with admission.admit(user_id):
+            return await value_user_portfolio(user_id, cost_basis)
+    except Rejected as rejection:
+        return rejection_response(rejection)
+    except UpstreamBusy as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+    except Exception as e:
+        return {"error": f"Error valuing portfolio: {str(e)}"}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus scrape endpoint. Rendered on the blocking pool: cache stats
+    count entries in the cache backend.
+    """
+    return PlainTextResponse(await run_blocking(metrics_registry.render), media_type="text/plain; version=0.0.4")
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat: intent, tool progress and LLM tokens
+    are pushed as they become available.
+    """
+    try:
+        admitted = await admission.acquire(request.id)
+    except Rejected as rejection:
+        return rejection_response(rejection)
+
+    async def event_source():
+        async for event in stream_chat(request.message, request.id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    return AdmittedStreamingResponse(
+        event_source(),
+        admitted,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """
+    WebSocket variant of /chat. Each received {"message", "id"} payload is
+    answered with the same event stream as /chat/stream.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                request = ChatRequest(**payload)
+            except Exception as e:
+                await websocket.send_json({"type": "error", "error": f"Invalid chat request: {str(e)}"})
+                continue
+            try:
+                admitted = await admission.acquire(request.id)
+            except Rejected as rejection:
+                await websocket.send_json({"type": "error", "error": rejection.reason, "retry_after": rejection.retry_after})
+                continue
+            try:
+                async for event in stream_chat(request.message, request.id):
+                    await websocket.send_text(json.dumps(event, default=str))
+            finally:
+                admission.release(admitted)
+    except WebSocketDisconnect:
+        pass
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
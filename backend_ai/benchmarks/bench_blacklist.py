@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: compiled blacklist matcher vs. the previous per-term
+substring scan, on inputs of increasing length, followed by the verdicts of
+both on finance queries the substring scan wrongly refused and on
+inflections of blacklisted terms that must still be refused.
+
+    python benchmarks/bench_blacklist.py [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from blacklist import DEFAULT_BLACKLIST, BlacklistMatcher
+
+# Clean text forces both implementations through the whole input.
+WORDS = (
+    "what is the expected return on my portfolio if interest rates rise and "
+    "the fund managers invest in index funds compared to bonds dividends "
+    "market capitalization volatility earnings outlook for next quarter"
+).split()
+
+# Legitimate finance queries that must be allowed. The substring scan
+# refuses most of them.
+FALSE_POSITIVES = [
+    "how does cpi affect my portfolio",
+    "which fintech won the hackathon",
+    "what is a crackdown on insider trading",
+    "explain the adulteration scandal impact on fmcg stocks",
+    "is sextant technologies a good buy",
+    "what is the methodology behind index rebalancing",
+    "which drug makers are good investments",
+    "Pfizer drug pipeline and its stock",
+]
+
+# Inflections of blacklisted terms that must still be refused.
+INFLECTIONS = [
+    "how do I get into hacking",
+    "best crypto scams",
+    "free pornography sites",
+    "send nudes",
+    "where to buy drugs cheaply",
+    "hackers stole my shares",
+    "i got scammed on a trading app",
+    "cracked trading software download",
+]
+
+
+def substring_scan(query: str) -> bool:
+    return any(word in query.lower() for word in DEFAULT_BLACKLIST)
+
+
+def make_query(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def run(repeat: int) -> None:
+    matcher = BlacklistMatcher(DEFAULT_BLACKLIST)
+    print(f"{'words':>7} {'substring (us)':>15} {'compiled (us)':>14} {'speedup':>8}")
+    for n_words in (10, 100, 1000, 10000):
+        query = make_query(n_words)
+        old = min(timeit.repeat(lambda: substring_scan(query), number=repeat, repeat=3)) / repeat
+        new = min(timeit.repeat(lambda: matcher.search(query), number=repeat, repeat=3)) / repeat
+        print(f"{n_words:>7} {old * 1e6:>15.1f} {new * 1e6:>14.1f} {old / new:>7.1f}x")
+
+    print()
+    print(f"{'substring':>10} {'compiled':>9}  query")
+    for query in FALSE_POSITIVES:
+        print(f"{str(substring_scan(query)):>10} {str(matcher.search(query) is not None):>9}  {query}")
+    for query in INFLECTIONS:
+        print(f"{str(substring_scan(query)):>10} {str(matcher.search(query) is not None):>9}  {query}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    run(args.repeat)
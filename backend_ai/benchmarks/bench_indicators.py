@@ -0,0 +1,103 @@
+"""
+Compute indicators for --tickers random-walk price series of --bars bars,
+with holidays punched into each ticker's calendar, and check that every way
+of getting them agrees:
+
+  batch        compute_indicators over the whole history
+  incremental  IndicatorState fed one bar at a time, each bar first arriving
+               as a provisional quote and then replaced by the final one
+  loop         EMA and RSI recomputed bar by bar, as a reference for the
+               vectorized weighted-sum versions
+
+Reports the time of a batch pass and of one incremental append + snapshot.
+
+    python benchmarks/bench_indicators.py --tickers 50 --bars 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from indicators import IndicatorState, compute_indicators, ema, pack_valid, rsi
+
+
+def make_prices(tickers: int, bars: int, holidays: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(bars, tickers)), axis=0))
+    prices[rng.random(prices.shape) < holidays] = np.nan
+    # Tickers listed later than others, and one with too few bars for the windows.
+    prices[: bars // 3, 1] = np.nan
+    prices[:-10, 2] = np.nan
+    return prices
+
+
+def loop_ema(prices: np.ndarray, span: int) -> np.ndarray:
+    alpha = 2.0 / (span + 1)
+    current = np.full(prices.shape[1], np.nan)
+    for row in prices:
+        current = np.where(np.isnan(current), row, np.where(np.isnan(row), current, alpha * row + (1 - alpha) * current))
+    return current
+
+
+def loop_rsi(prices: np.ndarray, period: int) -> np.ndarray:
+    state = IndicatorState(prices.shape[1], rsi_period=period)
+    for row in prices:
+        state.append(row)
+    return state.snapshot()["rsi"]
+
+
+def check(name: str, expected: np.ndarray, actual: np.ndarray) -> bool:
+    if expected.dtype.kind in "US":
+        same = bool(np.all(expected == actual))
+    else:
+        same = bool(np.allclose(expected, actual, rtol=1e-9, atol=1e-9, equal_nan=True))
+    if not same:
+        print(f"  MISMATCH {name}:\n    expected {expected}\n    got      {actual}")
+    return same
+
+
+def run(args) -> None:
+    prices = make_prices(args.tickers, args.bars, args.holidays)
+    rng = np.random.default_rng(1)
+
+    start = time.perf_counter()
+    batch = compute_indicators(prices)
+    batch_time = time.perf_counter() - start
+
+    state = IndicatorState(args.tickers)
+    update_times = []
+    for row in prices:
+        start = time.perf_counter()
+        state.append(row * (1 + rng.normal(0, 0.01, size=row.shape)))
+        state.replace_last(row)
+        snapshot = state.snapshot()
+        update_times.append(time.perf_counter() - start)
+
+    ok = all(check(f"incremental {name}", batch[name], snapshot[name]) for name in batch)
+    packed = pack_valid(prices)
+    for span in (20, 50):
+        ok &= check(f"ema({span})", loop_ema(packed, span), ema(prices, span))
+    ok &= check("rsi(14)", loop_rsi(prices, 14), rsi(prices, 14))
+    prefix = prices[: args.bars // 2]
+    ok &= all(check(f"prefix {name}", compute_indicators(prefix)[name],
+                    IndicatorState.from_prices(prefix).snapshot()[name]) for name in batch)
+
+    print(f"{args.tickers} tickers x {args.bars} bars, {args.holidays:.0%} holidays")
+    print(f"  batch compute_indicators:        {batch_time * 1000:8.2f} ms")
+    print(f"  incremental append + snapshot:   {np.median(update_times) * 1000:8.3f} ms per bar (median)")
+    print(f"  incremental, loop and batch results {'match' if ok else 'DIFFER'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=1000)
+    parser.add_argument("--holidays", type=float, default=0.03, help="Share of bars missing from each ticker.")
+    args = parser.parse_args()
+    run(args)
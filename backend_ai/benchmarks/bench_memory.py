@@ -0,0 +1,67 @@
+"""
+Prompt tokens and latency per turn of a long conversation, with the bounded
+conversation memory and with the full history passed on every turn. Runs on
+the fakes, no network needed.
+
+    python benchmarks/bench_memory.py --turns 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fakes, isolate_state
+
+QUESTIONS = [
+    "What is the price of AAPL today?",
+    "What is diversification?",
+    "And what about the MSFT price?",
+    "How is my portfolio doing?",
+    "Explain index funds in detail",
+]
+
+
+async def converse(memory, turns: int, conversation_id: str):
+    import model
+    from metrics import collect_timings
+
+    model.conversation_memory = memory
+    rows = []
+    for turn in range(turns):
+        with collect_timings() as timings:
+            start = time.perf_counter()
+            await model.process_chat(QUESTIONS[turn % len(QUESTIONS)], conversation_id)
+            elapsed = time.perf_counter() - start
+        # Read before the background summarizer adds its own tokens.
+        rows.append((timings["tokens"].get("input", 0), elapsed))
+        await memory.flush()
+    return rows
+
+
+async def run(args) -> None:
+    from memory import ConversationMemory
+
+    bounded = await converse(ConversationMemory(), args.turns, "user-1")
+    unbounded = await converse(ConversationMemory(window=10 ** 6, budget=10 ** 9), args.turns, "user-2")
+    print(f"{'turn':>5} {'bounded tokens':>15} {'ms':>7} {'full history tokens':>20} {'ms':>7}")
+    for turn in range(0, args.turns, max(args.turns // 10, 1)):
+        (tokens, elapsed), (full_tokens, full_elapsed) = bounded[turn], unbounded[turn]
+        print(f"{turn + 1:>5} {tokens:>15} {elapsed * 1000:>7.1f} {full_tokens:>20} {full_elapsed * 1000:>7.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--llm-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    isolate_state()
+    install_fakes(llm_latency=args.llm_latency, market_latency=0.005)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Send --calls concurrent calls per route (intent, general, and the market
+and personalized agents' tool-selection and answer steps) through the model
+router, on fake tiers whose latency has a slow tail, and report latency
+percentiles and which tiers answered:
+
+  single  every route on the standard tier, as before the router
+  routed  the default routes, with hedging
+  outage  the default routes while the fast tier fails --outage-rate of calls
+  agent   one market agent question (a tool-selection step, the tool, an
+          answer step) through AgentExecutor, invoked and streamed, with
+          the standard tier taking --agent-slow seconds: both agent steps
+          must hedge to a faster tier
+
+    python benchmarks/bench_model_router.py --calls 200
+    python benchmarks/bench_model_router.py --agent-only
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeChatModel, install_fakes, isolate_state
+
+
+def fake_tiers(args, outage: float = 0.0):
+    return {
+        "fast": FakeChatModel(model_name="fast", latency=0.1, slow_latency=3, slow_rate=args.slow_rate,
+                              failure_rate=outage),
+        "standard": FakeChatModel(model_name="standard", latency=0.3, slow_latency=6, slow_rate=args.slow_rate),
+        "heavy": FakeChatModel(model_name="heavy", latency=0.8, slow_latency=12, slow_rate=args.slow_rate),
+    }
+
+
+def messages_for(route: str):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    question = HumanMessage(content="What is the price of AAPL? Classify the intent")
+    if route.endswith(".answer"):
+        call = {"name": "get_current_price", "args": {"ticker": "AAPL"}, "id": "call_1"}
+        return [question, AIMessage(content="", tool_calls=[call]), ToolMessage(content="{}", tool_call_id="call_1")]
+    return [question]
+
+
+async def scenario(label: str, router, args) -> None:
+    routes = [name for name in router.routes if name != "summary"]
+    print(label)
+    for name in routes:
+        model = router.chat_model(name.split(".")[0])
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        tiers = Counter()
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await model.ainvoke(messages_for(name))
+                    tiers[result.response_metadata["model_tier"]] += 1
+                except Exception:
+                    tiers["failed"] += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one() for _ in range(args.calls)))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        answered = "  ".join(f"{tier} {count}" for tier, count in sorted(tiers.items()))
+        print(f"  {name:26s} p50 {p50 * 1000:6.0f} ms  p95 {p95 * 1000:6.0f} ms  p99 {p99 * 1000:6.0f} ms  "
+              f"hedged {router.hedges[name]:3d}  fell back {router.fallbacks[name]:3d}  | {answered}")
+
+
+async def agent_scenario(args) -> bool:
+    import model_config
+    from model_router import ROUTES
+    from registry import registry
+
+    install_fakes(market_latency=0.01)
+    inputs = {"messages": [("human", "What is the price of AAPL?")]}
+    # Slowest acceptable run: each step hedged at its SLO, plus the faster tier.
+    bound = ROUTES["market_agent"].slo + ROUTES["market_agent.answer"].slo + 1
+
+    async def streamed(agent):
+        async for _ in agent.astream_events(inputs, version="v2"):
+            pass
+
+    print(f"agent (standard tier {args.agent_slow:g}s, others 0.1s, bound {bound:g}s)")
+    ok = True
+    for label, call in (("ainvoke", lambda agent: agent.ainvoke(inputs)), ("astream_events", streamed)):
+        # A fresh router each time: the first run's stats would demote the slow tier.
+        model_config.initialize_models(chat_model={
+            "fast": FakeChatModel(model_name="fast", latency=0.1),
+            "standard": FakeChatModel(model_name="standard", latency=args.agent_slow),
+            "heavy": FakeChatModel(model_name="heavy", latency=0.1),
+        })
+        router = registry.get("model_router")
+        start = time.perf_counter()
+        await call(registry.get("market_agent"))
+        elapsed = time.perf_counter() - start
+        hedged = {name: router.hedges[name] for name in ("market_agent", "market_agent.answer")}
+        ok &= elapsed < bound and all(hedged.values())
+        print(f"  {label:15s} {elapsed:5.2f} s  hedged " + "  ".join(f"{name} {count}" for name, count in hedged.items()))
+    return ok
+
+
+async def run(args) -> None:
+    import model_config
+    from model_router import ROUTES, ModelRouter, Route
+
+    if args.agent_only:
+        if not await agent_scenario(args):
+            sys.exit(1)
+        return
+
+    single = {name: Route(("standard",), route.max_tokens, route.slo, route.timeout) for name, route in ROUTES.items()}
+    await scenario("single (standard tier only)", ModelRouter(fake_tiers(args), model_config.build_model, single), args)
+    await scenario("routed", ModelRouter(fake_tiers(args), model_config.build_model), args)
+    await scenario(f"outage (fast tier failing {args.outage_rate:.0%})",
+                   ModelRouter(fake_tiers(args, args.outage_rate), model_config.build_model), args)
+    if not await agent_scenario(args):
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Calls per route.")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of calls hitting the slow tail.")
+    parser.add_argument("--outage-rate", type=float, default=0.5)
+    parser.add_argument("--agent-slow", type=float, default=8, help="Standard tier latency in the agent scenario.")
+    parser.add_argument("--agent-only", action="store_true", help="Run only the agent scenario.")
+    args = parser.parse_args()
+
+    isolate_state()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Time a market agent run whose single step requests one price lookup per
+ticker, with the per-request tool concurrency capped at 1 (sequential) and
+at --concurrency, then show a slow tool coming back as a structured timeout
+error instead of failing the run. Runs on the fakes, no network needed.
+
+    python benchmarks/bench_parallel_tools.py
+    python benchmarks/bench_parallel_tools.py --tickers 6 --market-latency 0.5 --concurrency 3
+"""
+import argparse
+import asyncio
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeTicker, install_fakes, isolate_state
+
+
+def fresh_tickers(run: int, count: int):
+    # New symbols for every run, so no result is served from the market cache.
+    letters = string.ascii_uppercase
+    return [f"Q{letters[run % 26]}{letters[i % 26]}" for i in range(count)]
+
+
+async def timed_run(run: int, count: int, limit: int) -> float:
+    from langchain_core.messages import HumanMessage
+    from metrics import run_config
+    from registry import registry
+    from tool_runtime import limit_tool_calls
+
+    message = f"What is the price of {' '.join(fresh_tickers(run, count))} today?"
+    start = time.perf_counter()
+    limit_tool_calls(limit)
+    await registry.get("market_agent").ainvoke({"messages": [HumanMessage(content=message)]}, config=run_config())
+    return time.perf_counter() - start
+
+
+async def run(args) -> None:
+    import tool_runtime
+    import tools
+
+    print(f"{args.tickers} get_current_price calls in one step, {args.market_latency:g}s each, "
+          f"LLM {args.llm_latency:g}s per step")
+    for run_index, limit in enumerate((1, args.concurrency)):
+        elapsed = [await timed_run(run_index * args.repeat + i, args.tickers, limit) for i in range(args.repeat)]
+        print(f"  concurrency {limit:>2}: {min(elapsed):.2f}s best of {args.repeat}")
+
+    tool_runtime.TOOL_TIMEOUTS["get_current_price"] = args.market_latency / 2
+    slow = tool_runtime.guard_tool(tools.get_current_price)
+    result = await slow.ainvoke({"ticker": fresh_tickers(99, 1)[0]})
+    print(f"  timeout {args.market_latency / 2:g}s: {result}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--market-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    isolate_state()
+    install_fakes(llm_latency=args.llm_latency, market_latency=args.market_latency)
+    FakeTicker.latency = args.market_latency
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Report estimated prompt tokens per tool result before and after projection
+and compaction. Uses the fake Ticker by default; pass --live to query
+Yahoo Finance.
+
+    python benchmarks/bench_payloads.py
+    python benchmarks/bench_payloads.py --live --ticker MSFT --other AAPL
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeTicker, fake_portfolio, isolate_state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="use yfinance instead of the fake Ticker")
+    parser.add_argument("--ticker", default="AAPL")
+    parser.add_argument("--other", default="MSFT")
+    args = parser.parse_args()
+
+    isolate_state()
+    from registry import registry
+    if not args.live:
+        FakeTicker.latency = 0
+        registry.register("ticker", lambda: FakeTicker)
+    import tools
+    from metrics import tool_payload_tokens
+    from payloads import estimate_tokens, format_portfolio
+
+    calls = [
+        (tools.company_information, {"ticker": args.ticker}),
+        (tools.stock_compare, {"ticker1": args.ticker, "ticker2": args.other}),
+        (tools.stock_news, {"ticker": args.ticker}),
+        (tools.last_dividend_and_earnings_date, {"ticker": args.ticker}),
+        (tools.stock_splits_history, {"ticker": args.ticker}),
+        (tools.last_n_years_dividends, {"ticker": args.ticker, "n": 8}),
+        (tools.summary_of_institutional_holders, {"ticker": args.ticker}),
+        (tools.summary_of_mutual_fund_holders, {"ticker": args.ticker}),
+        (tools.stock_performance_analysis, {"ticker": args.ticker}),
+        (tools.buy_sell_recommendation, {"ticker": args.ticker}),
+        (tools.portfolio_technical_analysis, {"tickers": [args.ticker, args.other]}),
+        (tools.aggregate_market_data, {"tickers": [args.ticker, args.other]}),
+    ]
+    print(f"{'tool':>34} {'raw tokens':>11} {'sent tokens':>12} {'saved':>7}")
+    total_raw = total_sent = 0
+    for tool, tool_args in calls:
+        try:
+            tool.invoke(tool_args)
+        except Exception as e:
+            print(f"{tool.name:>34} failed: {e}")
+    for (name, stage), value in sorted(tool_payload_tokens._values.items()):
+        if stage != "raw":
+            continue
+        sent = tool_payload_tokens._values.get((name, "sent"), 0)
+        total_raw += value
+        total_sent += sent
+        print(f"{name:>34} {value:>11.0f} {sent:>12.0f} {1 - sent / value if value else 0:>7.0%}")
+
+    portfolio = fake_portfolio("user-1")
+    raw, sent = estimate_tokens(str(portfolio)), estimate_tokens(format_portfolio(portfolio))
+    print(f"{'portfolio in prompt':>34} {raw:>11} {sent:>12} {1 - sent / raw:>7.0%}")
+    print(f"{'all of the above':>34} {total_raw + raw:>11.0f} {total_sent + sent:>12.0f} "
+          f"{1 - (total_sent + sent) / (total_raw + raw):>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Replay a Zipf-distributed stream of quote lookups (get_current_price) over
+--tickers symbols with and without the popularity prefetcher running, and
+report the market-cache hit ratio and lookup latency. Uses the fake Ticker;
+the quote TTL is shortened so entries expire during the run.
+
+    python benchmarks/bench_prefetch.py --duration 20 --rate 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fakes, isolate_state
+
+
+async def replay(args, prefetching: bool) -> None:
+    import prefetch
+    import tools
+    from concurrency import run_blocking
+    from market_cache import market_cache
+
+    market_cache.invalidate()
+    tracker = prefetch.PopularityTracker(f"bench-{prefetching}")
+    prefetch.popularity = tracker
+    prefetcher = prefetch.Prefetcher(tracker, top_n=args.top_n, budget_per_minute=args.budget)
+    task = asyncio.create_task(prefetcher.run()) if prefetching else None
+
+    symbols = [f"Z{i:03d}" for i in range(args.tickers)]
+    weights = 1 / np.arange(1, args.tickers + 1) ** args.skew
+    rng = np.random.default_rng(0)
+    stats = market_cache.stats()
+    hits, misses = stats["hits"], stats["misses"]
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        ticker = symbols[rng.choice(args.tickers, p=weights / weights.sum())]
+        tracker.touch(ticker)
+        start = time.perf_counter()
+        await run_blocking(tools.get_current_price.func, ticker)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(1 / args.rate)
+    if task is not None:
+        task.cancel()
+
+    stats = market_cache.stats()
+    lookups = stats["hits"] - hits + stats["misses"] - misses
+    print(f"  prefetch {'on ' if prefetching else 'off'}: hit ratio {(stats['hits'] - hits) / lookups:.0%}  "
+          f"p50 {np.percentile(latencies, 50) * 1000:6.1f} ms  p95 {np.percentile(latencies, 95) * 1000:6.1f} ms  "
+          f"upstream prefetches {prefetcher.requests['info']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--rate", type=float, default=40, help="lookups per second")
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=300, help="prefetch requests per minute")
+    parser.add_argument("--quote-ttl", type=float, default=3)
+    parser.add_argument("--market-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    isolate_state()
+    os.environ.setdefault("PREFETCH_INTERVAL", "1")
+    os.environ.setdefault("PREFETCH_CLOSED_INTERVAL", "1")
+    install_fakes(market_latency=args.market_latency)
+    import market_cache
+    market_cache.market_cache.ttls["quote"] = args.quote_ttl
+    market_cache.CLOSED_MARKET_QUOTE_TTL = args.quote_ttl
+
+    print(f"{args.rate:g} lookups/s over {args.tickers} tickers (Zipf {args.skew:g}), quote TTL {args.quote_ttl:g}s")
+    for prefetching in (False, True):
+        asyncio.run(replay(args, prefetching))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Run 1, 2, 4, ... worker processes that each look up company info for
+--lookups Zipf-distributed tickers through the market cache, once per cache
+backend, and report the aggregate hit ratio, upstream fetches and lookups
+per second. With the per-process memory backend every worker fetches each
+ticker itself; with the sqlite and redis backends one worker's fetch serves
+all of them. The redis backend runs against the stand-in server in
+resp_server.py unless --redis-url is given.
+
+    python benchmarks/bench_shared_cache.py --workers 1 2 4 8 --lookups 2000
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+
+def worker(index: int, args, barrier, results) -> None:
+    from fakes import FakeTicker, isolate_state
+
+    isolate_state()
+    from market_cache import market_cache
+
+    FakeTicker.latency = args.market_latency
+    symbols = [f"Z{i:03d}" for i in range(args.tickers)]
+    weights = 1 / np.arange(1, args.tickers + 1) ** args.skew
+    rng = np.random.default_rng(index)
+    stream = rng.choice(args.tickers, size=args.lookups, p=weights / weights.sum())
+    fetches = 0
+
+    def fetch(ticker: str):
+        nonlocal fetches
+        fetches += 1
+        return FakeTicker(ticker).get_info()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for i in stream:
+        ticker = symbols[i]
+        market_cache.get_or_fetch(ticker, "info", lambda: fetch(ticker))
+    results.put((market_cache.hits, fetches, time.perf_counter() - start))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(backend: str, workers: int, args) -> None:
+    os.environ["CACHE_BACKEND"] = backend
+    os.environ["CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="fingpt-cache-"), "cache.sqlite3")
+    os.environ["REDIS_KEY_PREFIX"] = f"bench-{time.time()}:"
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(i, args, barrier, results)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    outcomes = np.array([results.get() for _ in processes])
+    for process in processes:
+        process.join()
+    lookups = workers * args.lookups
+    hits, fetches = outcomes[:, :2].sum(axis=0)
+    elapsed = outcomes[:, 2].max()
+    print(f"  {backend:6s} {workers:2d} workers: hit ratio {hits / lookups:6.1%}  upstream fetches {fetches:5.0f}  "
+          f"{lookups / elapsed:7.0f} lookups/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite", "redis"])
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups per worker.")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--market-latency", type=float, default=0.05)
+    parser.add_argument("--redis-url", help="Use this server instead of starting the stand-in.")
+    args = parser.parse_args()
+
+    server = None
+    if "redis" in args.backends:
+        if args.redis_url:
+            os.environ["REDIS_URL"] = args.redis_url
+        else:
+            port = free_port()
+            server = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "resp_server.py"), "--port", str(port)],
+                                      stdout=subprocess.DEVNULL)
+            os.environ["REDIS_URL"] = f"redis://127.0.0.1:{port}/0"
+            time.sleep(1)
+    try:
+        print(f"{args.tickers} tickers, Zipf skew {args.skew}, {args.market_latency * 1000:.0f} ms upstream latency, "
+              f"{args.lookups} lookups per worker")
+        for backend in args.backends:
+            for workers in args.workers:
+                run(backend, workers, args)
+    finally:
+        if server is not None:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
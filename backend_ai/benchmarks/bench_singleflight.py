@@ -0,0 +1,60 @@
+"""
+Show that concurrent cache misses for the same ticker are coalesced into a
+single upstream fetch.
+
+    python benchmarks/bench_singleflight.py --callers 50 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from market_cache import MarketDataCache
+
+
+class SlowFetcher:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return {"regularMarketPrice": 123.45, "marketCap": 10 ** 12}
+
+
+def run(callers: int, latency: float) -> None:
+    cache = MarketDataCache()
+    fetcher = SlowFetcher(latency)
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_fetch("NVDA", "info", fetcher))
+
+    threads = [threading.Thread(target=worker) for _ in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    assert fetcher.calls == 1, f"expected 1 upstream call, got {fetcher.calls}"
+    assert len(results) == callers and all(r is results[0] for r in results)
+    print(f"{callers} concurrent callers -> {fetcher.calls} upstream call in {elapsed:.3f}s")
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    run(args.callers, args.latency)
@@ -0,0 +1,60 @@
+"""
+Measure worker start-up: how long `import app` takes, how long until the
+FastAPI startup hooks have run (cold start), and what an optional warm-up
+adds. Each run is a fresh interpreter without GOOGLE_API_KEY or MONGODB_URL
+unless they are already set, so it also checks the app imports without
+credentials.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --runs 3 --warm-up
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+from registry import registry
+with TestClient(app.app):
+    started = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "cold_start": started - start,
+    "built": sorted(registry.stats()),
+}))
+"""
+
+
+def run_once(warm_up: bool) -> dict:
+    env = dict(os.environ, WARM_UP_ON_STARTUP="true" if warm_up else "false")
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="set WARM_UP_ON_STARTUP for the runs")
+    args = parser.parse_args()
+
+    results = [run_once(args.warm_up) for _ in range(args.runs)]
+    for name in ("import", "cold_start"):
+        timings = [r[name] * 1000 for r in results]
+        print(f"{name:>10}: median {statistics.median(timings):7.1f} ms   max {max(timings):7.1f} ms")
+    print(f"     built: {', '.join(results[-1]['built']) or 'nothing (lazy)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Value a portfolio of --holdings positions through the batch valuation
+(one concurrent price fetch, one vectorized pass) and through the per-holding
+tool chain the agent used before (get_current_price then
+calculate_profit_loss for each position). Uses the fake Ticker and Mongo.
+
+    python benchmarks/bench_valuation.py --holdings 25 --market-latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import install_fakes, isolate_state
+
+
+async def run(args, client) -> None:
+    import tools
+    from market_cache import market_cache
+
+    stocks = [{"stock": f"H{i:03d}", "holding": 1 + i % 40, "purchase_price": 50 + i} for i in range(args.holdings)]
+    client.collection.documents.append({"userId": "bench-user", "stocks": stocks})
+
+    market_cache.invalidate()
+    start = time.perf_counter()
+    valuation = await tools.value_user_portfolio("bench-user")
+    batch = time.perf_counter() - start
+
+    market_cache.invalidate()
+    start = time.perf_counter()
+    for item in stocks:
+        quote = await tools.get_current_price.ainvoke({"ticker": item["stock"]})
+        await tools.calculate_profit_loss.ainvoke({
+            "ticker": item["stock"], "purchase_price": item["purchase_price"],
+            "quantity": item["holding"], "current_price": quote["current_price"],
+        })
+    chained = time.perf_counter() - start
+
+    print(f"{args.holdings} holdings, {args.market_latency:g}s per quote")
+    print(f"  batch valuation:    {batch * 1000:8.1f} ms  total {valuation['total']['market_value']:.2f}")
+    print(f"  per-holding tools:  {chained * 1000:8.1f} ms  ({2 * args.holdings} tool calls, each an LLM step in the agent)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--holdings", type=int, default=25)
+    parser.add_argument("--market-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    isolate_state()
+    client = install_fakes(market_latency=args.market_latency)
+    asyncio.run(run(args, client))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Offline evaluation of the response cache's near-duplicate matching.
+
+Stores an answer for the first query of each pair and looks up the second:
+rephrasings of the same question should be served from the cache, questions
+that differ in a meaningful word must not be. Also reports lookup latency
+on a full cache.
+
+    python benchmarks/eval_response_cache.py [--similarity 0.9] [--entries 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_cache import RESPONSE_CACHE_SIMILARITY, ResponseCache, embed, normalize_query
+
+# Same question, different phrasing: should hit.
+SAME_QUESTION = [
+    ("What is a mutual fund?", "what are mutual funds"),
+    ("Explain index funds", "what are index funds?"),
+    ("what is the p/e ratio", "Please tell me what the P/E ratio is"),
+    ("difference between stocks and bonds", "difference between bonds and stocks"),
+    ("how does compound interest work", "How does compound interest work??"),
+    ("what is a demat account", "could you explain demat accounts"),
+]
+
+# One meaningful word apart, including the interrogative or modal: must miss.
+DIFFERENT_QUESTION = [
+    ("how are dividends taxed for a resident", "how are dividends taxed for a non-resident"),
+    ("market order vs limit order", "stop order vs limit order"),
+    ("how does inflation affect bonds in the long run", "how does inflation affect bonds in the short run"),
+    ("what is a call option", "what is a put option"),
+    ("what is short term capital gains tax", "what is long term capital gains tax"),
+    ("what is a bull market", "what is a bear market"),
+    ("difference between NSE and BSE", "difference between NSE and NYSE"),
+    ("what is a large cap fund", "what is a small cap fund"),
+    ("when should I invest in index funds", "why should I invest in index funds"),
+    ("when should I invest in index funds", "how should I invest in index funds"),
+    ("how is inflation measured", "why is inflation measured"),
+    ("how is inflation measured", "when is inflation measured"),
+    ("should I buy bonds", "can I buy bonds"),
+]
+
+
+def evaluate(similarity: float, entries: int, verbose: bool) -> None:
+    hits = misses = 0
+    for pairs, expect_hit in ((SAME_QUESTION, True), (DIFFERENT_QUESTION, False)):
+        for stored, asked in pairs:
+            cache = ResponseCache(path=None, similarity=similarity)
+            cache.store(stored, "model", "answer")
+            hit = cache.lookup(asked, "model") is not None
+            hits += hit and expect_hit
+            misses += not hit and not expect_hit
+            if verbose:
+                score = float(embed(normalize_query(stored)) @ embed(normalize_query(asked)))
+                mark = "" if hit == expect_hit else "  <-- wrong"
+                print(f"{'hit ' if hit else 'miss'} {score:.3f}  {stored!r} -> {asked!r}{mark}")
+
+    cache = ResponseCache(path=None, max_entries=entries, similarity=similarity)
+    for i in range(entries):
+        cache.store(f"what is financial term number {i}", "model", "answer")
+    latencies = []
+    for i in range(200):
+        start = time.perf_counter()
+        cache.lookup(f"explain unrelated concept {i}", "model")
+        latencies.append(time.perf_counter() - start)
+        cache.store(f"what is another financial term {i}", "model", "answer")
+    latencies.sort()
+
+    print(f"rephrasings served:      {hits}/{len(SAME_QUESTION)}")
+    print(f"different questions missed: {misses}/{len(DIFFERENT_QUESTION)}")
+    print(f"miss latency with {entries} entries, storing between lookups: "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.2f} ms / max {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--similarity", type=float, default=RESPONSE_CACHE_SIMILARITY)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    evaluate(args.similarity, args.entries, args.verbose)
@@ -0,0 +1,432 @@
+"""
+Deterministic stand-ins for Gemini, Yahoo Finance and MongoDB with
+configurable latency, so backend_ai and graph/graph.py can be benchmarked
+offline. Call isolate_state() before importing the app (it keeps the fake
+data out of the real price store and response cache), then install_fakes().
+
+Run the API on fakes for an external load generator:
+
+    python benchmarks/fakes.py --port 8000 --llm-latency 0.3 --market-latency 0.05
+"""
+import argparse
+import asyncio
+import copy
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FAKE_TICKERS = ["AAPL", "MSFT", "NVDA", "GOOGL", "AMZN", "META", "TSLA", "JPM", "V", "KO"]
+
+# A sample of the other numeric fields real get_info() payloads carry, so
+# payload sizes are realistic.
+_EXTRA_INFO_FIELDS = (
+    "auditRisk", "boardRisk", "compensationRisk", "shareHolderRightsRisk", "overallRisk", "maxAge",
+    "priceHint", "open", "dayLow", "dayHigh", "regularMarketPreviousClose", "regularMarketOpen",
+    "regularMarketDayLow", "regularMarketDayHigh", "dividendRate", "payoutRatio", "fiveYearAvgDividendYield",
+    "volume", "regularMarketVolume", "averageVolume", "averageVolume10days", "averageDailyVolume10Day",
+    "bid", "ask", "bidSize", "askSize", "priceToSalesTrailing12Months", "fiftyDayAverage",
+    "twoHundredDayAverage", "trailingAnnualDividendRate", "trailingAnnualDividendYield", "enterpriseValue",
+    "profitMargins", "floatShares", "sharesOutstanding", "sharesShort", "sharesShortPriorMonth",
+    "sharesShortPreviousMonthDate", "dateShortInterest", "sharesPercentSharesOut", "heldPercentInsiders",
+    "heldPercentInstitutions", "shortRatio", "shortPercentOfFloat", "impliedSharesOutstanding", "bookValue",
+    "priceToBook", "lastFiscalYearEnd", "nextFiscalYearEnd", "mostRecentQuarter", "earningsQuarterlyGrowth",
+    "netIncomeToCommon", "forwardEps", "lastSplitDate", "enterpriseToRevenue", "enterpriseToEbitda",
+    "52WeekChange", "SandP52WeekChange", "lastDividendValue", "lastDividendDate", "targetHighPrice",
+    "targetLowPrice", "targetMeanPrice", "targetMedianPrice", "recommendationMean",
+    "numberOfAnalystOpinions", "totalCash", "totalCashPerShare", "ebitda", "totalDebt", "quickRatio",
+    "currentRatio", "totalRevenue", "debtToEquity", "revenuePerShare", "returnOnAssets", "returnOnEquity",
+    "grossProfits", "freeCashflow", "operatingCashflow", "earningsGrowth", "revenueGrowth", "grossMargins",
+    "ebitdaMargins", "operatingMargins", "firstTradeDateMilliseconds", "postMarketChangePercent",
+    "postMarketPrice", "postMarketChange", "regularMarketChange", "regularMarketChangePercent",
+    "regularMarketDayRange", "fiftyTwoWeekLowChange", "fiftyTwoWeekLowChangePercent",
+    "fiftyTwoWeekHighChange", "fiftyTwoWeekHighChangePercent", "fiftyDayAverageChange",
+    "fiftyDayAverageChangePercent", "twoHundredDayAverageChange", "twoHundredDayAverageChangePercent",
+)
+
+_TICKER_RE = re.compile(r"\b[A-Z]{2,5}\b")
+# The personalized agent's prompt names the user (payloads.format_portfolio).
+_USER_RE = re.compile(r"\buser (\S+) holds\b")
+_NOT_TICKERS = {"AI", "ETF", "IPO", "CEO", "USA", "GDP", "EPS", "SIP", "NAV"}
+
+
+def isolate_state() -> str:
+    """
+    Point the price store and the SQLite cache backend at a temporary
+    directory and keep the response cache in memory. Must run before
+    backend_ai modules are imported.
+    """
+    root = tempfile.mkdtemp(prefix="fingpt-bench-")
+    os.environ["PRICE_STORE_DIR"] = os.path.join(root, "prices")
+    os.environ["RESPONSE_CACHE_PATH"] = ""
+    os.environ.setdefault("CACHE_PATH", os.path.join(root, "cache.sqlite3"))
+    os.environ.setdefault("GOOGLE_API_KEY", "fake")
+    os.environ.setdefault("MONGODB_URL", "mongodb://fake")
+    return root
+
+
+def _seed(symbol: str) -> int:
+    return zlib.crc32(symbol.upper().encode())
+
+
+def _words(text: str) -> int:
+    return len(text.split())
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers after `latency` seconds, or `slow_latency` for
+    a `slow_rate` share of calls, and fails a `failure_rate` share. Bound to
+    tools, it requests the tools picked from the query's keywords and
+    tickers in one step, then answers from the tool result; otherwise it
+    classifies or writes `answer_words` words.
+    Reports token usage like a real model.
+    """
+
+    latency: float = 0.2
+    slow_latency: float = 0.0
+    slow_rate: float = 0.0
+    failure_rate: float = 0.0
+    answer_words: int = 60
+    model_name: str = "fake-chat"
+    tool_names: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def model(self) -> str:
+        return self.model_name
+
+    def _delay(self) -> float:
+        if random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.model_name} is unavailable")
+        return self.slow_latency if random.random() < self.slow_rate else self.latency
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": [getattr(tool, "name", str(tool)) for tool in tools]})
+
+    def _respond(self, messages) -> AIMessage:
+        prompt = " ".join(str(message.content) for message in messages)
+        last = messages[-1]
+        if self.tool_names and not isinstance(last, ToolMessage):
+            tool_calls = self._pick_tools(str(last.content))
+            if tool_calls:
+                return self._message("", prompt, tool_calls=tool_calls)
+        if isinstance(last, ToolMessage):
+            text = f"Based on the latest data: {str(last.content)[:200]}"
+        elif "Classify the intent" in prompt:
+            text = self._classify(str(last.content))
+        else:
+            text = " ".join(["Diversification spreads risk across assets."] * (self.answer_words // 5))
+        return self._message(text, prompt)
+
+    def _message(self, text: str, prompt: str, tool_calls=None) -> AIMessage:
+        usage = {"input_tokens": _words(prompt), "output_tokens": max(_words(text), 1)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=text, tool_calls=tool_calls or [], usage_metadata=usage)
+
+    @staticmethod
+    def _classify(query: str) -> str:
+        lowered = query.lower()
+        if "portfolio" in lowered or " my " in f" {lowered} ":
+            return "personalized"
+        if "price" in lowered or "today" in lowered or "news" in lowered:
+            return "real time"
+        if lowered.startswith(("hi", "hello", "who are you")):
+            return "greeting"
+        return "general"
+
+    def _pick_tools(self, content: str) -> List[Dict[str, Any]]:
+        """
+        Tool calls for one agent step: a price lookup per ticker for price
+        questions (plus news if asked), otherwise one tool by keyword.
+        """
+        tickers = list(dict.fromkeys(t for t in _TICKER_RE.findall(content) if t not in _NOT_TICKERS)) or ["AAPL"]
+        lowered = content.lower()
+        if "price" in lowered and "get_current_price" in self.tool_names:
+            calls = [self._call("get_current_price", {"ticker": ticker}) for ticker in tickers]
+            if "news" in lowered and "stock_news" in self.tool_names:
+                calls.append(self._call("stock_news", {"ticker": tickers[0]}))
+            return calls
+        candidates = [
+            ("portfolio_valuation", any(w in lowered for w in ("worth", "value", "profit")),
+             {"user_id": _USER_RE.search(content).group(1) if _USER_RE.search(content) else "user-0"}),
+            ("portfolio_technical_analysis", "portfolio" in lowered, {"tickers": tickers[:10]}),
+            ("aggregate_market_data", "portfolio" in lowered, {"tickers": tickers[:10]}),
+            ("stock_compare", "compare" in lowered and len(tickers) > 1, {"ticker1": tickers[0], "ticker2": tickers[-1]}),
+            ("stock_news", "news" in lowered, {"ticker": tickers[0]}),
+            ("last_n_years_dividends", "dividend" in lowered, {"ticker": tickers[0], "n": 5}),
+            ("buy_sell_recommendation", "buy" in lowered or "sell" in lowered, {"ticker": tickers[0]}),
+            ("get_current_price", True, {"ticker": tickers[0]}),
+            ("company_information", True, {"ticker": tickers[0]}),
+        ]
+        for name, wanted, args in candidates:
+            if wanted and name in self.tool_names:
+                return [self._call(name, args)]
+        return []
+
+    @staticmethod
+    def _call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        return {"name": name, "args": args, "id": f"call_{name}_{time.monotonic_ns()}"}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+class FakeTicker:
+    """
+    yfinance.Ticker look-alike with deterministic, per-symbol data. Every
+    call sleeps `latency` seconds. The latest bar drifts every `tick_seconds`
+    so pollers see changing prices.
+    """
+
+    latency = 0.05
+    tick_seconds = 5.0
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol.upper()
+        self.seed = _seed(self.symbol)
+        self.base_price = 50.0 + self.seed % 450
+        self.calls = 0
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _price(self) -> float:
+        tick = int(time.time() // self.tick_seconds)
+        return round(self.base_price * (1 + 0.01 * np.sin(tick + self.seed % 7)), 2)
+
+    def get_info(self) -> Dict[str, Any]:
+        self._wait()
+        price = self._price()
+        info = {field: round(price * (1 + i % 13) / 7.0, 6) for i, field in enumerate(_EXTRA_INFO_FIELDS)}
+        info.update({
+            "address1": "One Example Way", "city": "Cupertino", "state": "CA", "zip": "95014",
+            "country": "United States", "phone": "(408) 555 0100", "fullTimeEmployees": 1000 + self.seed % 100000,
+            "currency": "USD", "exchange": "NMS", "quoteType": "EQUITY", "recommendationKey": "buy",
+            "symbol": self.symbol,
+            "longName": f"{self.symbol} Holdings Inc.",
+            "sector": "Technology",
+            "industry": "Software",
+            "website": f"https://{self.symbol.lower()}.example.com",
+            "longBusinessSummary": f"{self.symbol} makes products. " * 40,
+            "companyOfficers": [{"maxAge": 1, "name": f"Officer {i}", "age": 50 + i, "title": "Senior Vice President",
+                                 "yearBorn": 1970 + i, "fiscalYear": 2023, "totalPay": 1234567 + i,
+                                 "exercisedValue": 0, "unexercisedValue": 0} for i in range(10)],
+            "regularMarketPrice": price,
+            "currentPrice": price,
+            "marketCap": int(price * (1 + self.seed % 50) * 10 ** 8),
+            "trailingPE": 10 + self.seed % 30 + 0.123456,
+        })
+        return info
+
+    def get_calendar(self) -> Dict[str, Any]:
+        self._wait()
+        return {"Dividend Date": "2024-05-16", "Earnings Date": ["2024-07-25"]}
+
+    def get_splits(self) -> pd.Series:
+        self._wait()
+        return pd.Series([2.0, 4.0], index=pd.to_datetime(["2014-06-09", "2020-08-31"]), name="Stock Splits")
+
+    def get_news(self) -> List[Dict[str, Any]]:
+        self._wait()
+        return [{
+            "id": f"{self.symbol}-{i}",
+            "content": {
+                "id": f"{self.symbol}-{i}", "contentType": "STORY",
+                "title": f"{self.symbol} shares move after quarterly update {i}",
+                "description": "", "summary": f"{self.symbol} reported results. " * 8,
+                "pubDate": "2024-07-25T20:30:00Z", "displayTime": "2024-07-25T20:30:00Z",
+                "thumbnail": {"originalUrl": "https://example.com/img.jpg", "originalWidth": 1200, "originalHeight": 800,
+                              "resolutions": [{"url": f"https://example.com/img{w}.jpg", "width": w, "height": w * 2 // 3,
+                                               "tag": f"{w}x{w * 2 // 3}"} for w in (170, 640, 1200)]},
+                "provider": {"displayName": "Example Wire", "url": "https://example.com"},
+                "canonicalUrl": {"url": f"https://example.com/news/{self.symbol}-{i}", "site": "finance", "region": "US", "lang": "en-US"},
+                "clickThroughUrl": {"url": f"https://example.com/news/{self.symbol}-{i}", "site": "finance", "region": "US", "lang": "en-US"},
+                "metadata": {"editorsPick": False}, "finance": {"premiumFinance": {"isPremiumNews": False}},
+                "storyline": None,
+            },
+        } for i in range(10)]
+
+    @property
+    def dividends(self) -> pd.Series:
+        self._wait()
+        dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=40, freq="QS")
+        return pd.Series(np.round(np.linspace(0.1, 0.3, 40), 3), index=dates, name="Dividends")
+
+    def _holders(self) -> pd.DataFrame:
+        self._wait()
+        return pd.DataFrame({
+            "Holder": [f"Fund {i}" for i in range(10)],
+            "pctHeld": np.linspace(0.05, 0.005, 10),
+            "Shares": np.arange(10, 0, -1) * 10 ** 6,
+        })
+
+    def get_mutualfund_holders(self) -> pd.DataFrame:
+        return self._holders()
+
+    def get_institutional_holders(self) -> pd.DataFrame:
+        return self._holders()
+
+    def history(self, period: Optional[str] = None, interval: str = "1d", start: Optional[str] = None) -> pd.DataFrame:
+        self._wait()
+        end = pd.Timestamp.now().normalize()
+        first = pd.Timestamp(start) if start else end - pd.DateOffset(years=5)
+        dates = pd.bdate_range(first, end)
+        # The walk depends only on the symbol and the date, so incremental
+        # refreshes line up with earlier ones.
+        days = (dates - pd.Timestamp("2000-01-01")).days.to_numpy()
+        walk = self.base_price * (1 + 0.2 * np.sin(days / 37.0 + self.seed % 11) + 0.05 * np.sin(days / 5.0))
+        close = walk.copy()
+        if len(close):
+            close[-1] = self._price()
+        return pd.DataFrame({
+            "Open": walk * 0.995,
+            "High": np.maximum(walk, close) * 1.01,
+            "Low": np.minimum(walk, close) * 0.99,
+            "Close": close,
+            "Volume": (1 + (days * 7919 + self.seed) % 97) * 10 ** 5,
+        }, index=dates)
+
+
+class _UpdateResult:
+    def __init__(self, matched: int, modified: int, upserted_id: Any = None):
+        self.matched_count = matched
+        self.modified_count = modified
+        self.upserted_id = upserted_id
+
+
+class InMemoryCollection:
+    """
+    Async stand-in for a Motor collection, covering the queries db.py makes:
+    field equality or $in, $push/$pull on `stocks`, $set, upsert with
+    $setOnInsert.
+    """
+
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+        self.documents: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        for field, condition in query.items():
+            value = document.get(field)
+            if isinstance(condition, dict) and "$in" in condition:
+                if value not in condition["$in"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    async def create_index(self, *args, **kwargs) -> str:
+        return "userId_1"
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        await asyncio.sleep(self.latency)
+        for document in self.documents:
+            if self._matches(document, query):
+                return copy.deepcopy(document)
+        return None
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> _UpdateResult:
+        await asyncio.sleep(self.latency)
+        document = next((d for d in self.documents if self._matches(d, query)), None)
+        upserted_id = None
+        if document is None:
+            if not upsert:
+                return _UpdateResult(0, 0)
+            document = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            document.update(copy.deepcopy(update.get("$setOnInsert", {})))
+            self.documents.append(document)
+            upserted_id = len(self.documents)
+        before = len(document.get("stocks", []))
+        if "$set" in update:
+            document.update(copy.deepcopy(update["$set"]))
+            modified = int(upserted_id is None)
+        if "$push" in update:
+            document.setdefault("stocks", []).append(update["$push"]["stocks"])
+        if "$pull" in update:
+            removed = update["$pull"]["stocks"]
+            document["stocks"] = [s for s in document.get("stocks", []) if s.get("stock") != removed.get("stock")]
+        if "$set" not in update:
+            modified = int(len(document.get("stocks", [])) != before and upserted_id is None)
+        return _UpdateResult(1, modified, upserted_id)
+
+
+class InMemoryMongoClient:
+    def __init__(self, latency: float = 0.002):
+        self.collection = InMemoryCollection(latency)
+        self.conversations = InMemoryCollection(latency)
+
+    def __getitem__(self, name: str):
+        return {"stocks": self.collection, "conversations": self.conversations}
+
+
+def fake_portfolio(user_id: str) -> Dict[str, Any]:
+    seed = _seed(user_id)
+    picks = [FAKE_TICKERS[(seed + i * 3) % len(FAKE_TICKERS)] for i in range(2 + seed % 4)]
+    return {"userId": user_id, "stocks": [{"stock": s, "holding": 1 + (seed + i) % 50}
+                                          for i, s in enumerate(dict.fromkeys(picks))]}
+
+
+def install_fakes(llm_latency: float = 0.2, market_latency: float = 0.05, db_latency: float = 0.002,
+                  users: int = 100, answer_words: int = 60) -> InMemoryMongoClient:
+    """
+    Register the fakes with the component registry: the chat model (through
+    initialize_models), the Ticker provider and the Mongo client, seeded with
+    portfolios for users user-0 ... user-{users-1}.
+    """
+    import model_config
+    from registry import registry
+
+    FakeTicker.latency = market_latency
+    registry.register("ticker", lambda: FakeTicker)
+    client = InMemoryMongoClient(db_latency)
+    client.collection.documents = [fake_portfolio(f"user-{i}") for i in range(users)]
+    registry.register("mongo", lambda: client)
+    model_config.initialize_models(chat_model=FakeChatModel(latency=llm_latency, answer_words=answer_words))
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--market-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    isolate_state()
+    import uvicorn
+    import app
+
+    install_fakes(args.llm_latency, args.market_latency, args.db_latency)
+    uvicorn.run(app.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
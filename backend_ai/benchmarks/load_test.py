@@ -0,0 +1,232 @@
+"""
+Load generator for the chat API and the graph socket.io server. Reports
+p50/p95/p99 latency and throughput.
+
+By default everything runs offline: the chat app is driven in-process
+against the fakes in benchmarks/fakes.py, and the graph server is started
+in a background thread with the fake Ticker provider. Pass --url to drive a
+running server instead (for example one started with benchmarks/fakes.py).
+
+    python benchmarks/load_test.py chat --concurrency 50 --requests 2000
+    python benchmarks/load_test.py chat --url http://127.0.0.1:8000 --concurrency 100 --duration 30
+    python benchmarks/load_test.py graph --clients 200 --symbols 20 --interval 1 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FAKE_TICKERS, FakeTicker, install_fakes, isolate_state
+
+GRAPH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "graph")
+
+CHAT_QUERIES = [
+    "hello",
+    "who are you",
+    "what is a mutual fund",
+    "explain dollar cost averaging",
+    "what is the difference between stocks and bonds",
+    "what is the current price of {ticker}",
+    "latest news for {ticker}",
+    "compare {ticker} and {other}",
+    "should I buy or sell {ticker}",
+    "how is my portfolio doing",
+    "analyze my portfolio",
+]
+
+
+def summarize(name: str, latencies: List[float], elapsed: Optional[float] = None, errors: int = 0,
+              unit: str = "req/s") -> None:
+    if not latencies:
+        print(f"{name}: no samples")
+        return
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    line = f"{name:>28}: n={len(ms):<6} p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  max {ms.max():8.1f} ms"
+    if elapsed:
+        line += f"  {len(ms) / elapsed:8.1f} {unit}"
+    if errors:
+        line += f"  errors {errors}"
+    print(line)
+
+
+def chat_payload(i: int, users: int) -> Dict[str, str]:
+    template = CHAT_QUERIES[i % len(CHAT_QUERIES)]
+    ticker = FAKE_TICKERS[(i // len(CHAT_QUERIES)) % len(FAKE_TICKERS)]
+    other = FAKE_TICKERS[(i // len(CHAT_QUERIES) + 3) % len(FAKE_TICKERS)]
+    return {"message": template.format(ticker=ticker, other=other), "id": f"user-{i % users}"}
+
+
+async def run_chat(args) -> None:
+    import httpx
+
+    lifespan = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        isolate_state()
+        import app
+        install_fakes(args.llm_latency, args.market_latency, args.db_latency, users=args.users)
+        lifespan = app.app.router.lifespan_context(app.app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://bench",
+                                   timeout=args.timeout)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    counter = iter(range(10 ** 9))
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if (deadline is None and i >= args.requests) or (deadline is not None and time.perf_counter() >= deadline):
+                return
+            start = time.perf_counter()
+            intent = "failed"
+            try:
+                response = await client.post("/chat", json=chat_payload(i, args.users))
+                body = response.json()
+                intent = "rejected" if response.status_code in (429, 503) else str(body.get("intent", "error"))
+                failed = response.status_code != 200 or "error" in body or str(body.get("response", "")).startswith("Error")
+            except Exception:
+                failed = True
+            latencies[intent].append(time.perf_counter() - start)
+            errors[intent] += failed
+            if intent == "rejected":
+                # Back off like a well-behaved client.
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    if lifespan is not None:
+        await lifespan.__aexit__(None, None, None)
+
+    print(f"/chat at concurrency {args.concurrency}, {elapsed:.1f} s")
+    summarize("all", [v for values in latencies.values() for v in values], elapsed, sum(errors.values()))
+    for intent in sorted(latencies):
+        summarize(intent, latencies[intent], errors=errors[intent])
+
+
+def start_graph_server(args) -> str:
+    isolate_state()
+    os.environ["GRAPH_MIN_INTERVAL"] = str(args.interval)
+    os.environ["PRICE_STORE_REFRESH_INTERVAL"] = str(args.interval)
+    os.environ["GRAPH_UPSTREAM_RATE"] = str(args.upstream_rate)
+    sys.path.insert(0, GRAPH_DIR)
+    import graph
+    from registry import registry
+
+    FakeTicker.latency = args.market_latency
+    FakeTicker.tick_seconds = args.interval
+    registry.register("ticker", lambda: FakeTicker)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = 5055
+    threading.Thread(
+        target=graph.socketio.run, args=(graph.app,),
+        kwargs={"host": "127.0.0.1", "port": port, "allow_unsafe_werkzeug": True, "log_output": False},
+        daemon=True
+    ).start()
+    time.sleep(1.0)
+    return f"http://127.0.0.1:{port}"
+
+
+def run_graph(args) -> None:
+    import socketio
+
+    url = args.url or start_graph_server(args)
+    first_message: List[float] = []
+    delivery: List[float] = []
+    sizes: Dict[str, List[int]] = defaultdict(list)
+    lock = threading.Lock()
+    clients = []
+
+    def attach(client, subscribed_at):
+        state = {"first": True}
+
+        def on_message(event, payload):
+            now = time.perf_counter()
+            sent = datetime.fromisoformat(payload["timestamp"]).timestamp()
+            with lock:
+                if state["first"]:
+                    first_message.append(now - subscribed_at[0])
+                    state["first"] = False
+                delivery.append(max(time.time() - sent, 0.0))
+                sizes[event].append(len(json.dumps(payload)))
+
+        for event in ("stock_update", "stock_snapshot", "stock_delta"):
+            client.on(event, lambda payload, event=event: on_message(event, payload))
+
+    start = time.perf_counter()
+    for i in range(args.clients):
+        client = socketio.Client(reconnection=False)
+        subscribed_at = [0.0]
+        attach(client, subscribed_at)
+        client.connect(url)
+        subscribed_at[0] = time.perf_counter()
+        request = {"symbol": FAKE_TICKERS[i % args.symbols % len(FAKE_TICKERS)] if args.symbols <= len(FAKE_TICKERS)
+                   else f"SYM{i % args.symbols}", "interval": args.interval}
+        if args.protocol == "delta":
+            request["protocol"] = "delta"
+        client.emit("start_monitoring", request)
+        clients.append(client)
+    connected = time.perf_counter() - start
+    time.sleep(args.duration)
+    for client in clients:
+        client.disconnect()
+
+    print(f"graph start_monitoring: {args.clients} clients on {args.symbols} symbols, "
+          f"protocol {args.protocol}, connected in {connected:.1f} s, measured {args.duration:.0f} s")
+    summarize("subscribe -> first message", first_message)
+    summarize("server emit -> client", delivery, args.duration, unit="msg/s")
+    for event, values in sorted(sizes.items()):
+        print(f"{event:>28}: {len(values)} messages, mean {np.mean(values):.0f} bytes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="target", required=True)
+
+    chat = sub.add_parser("chat", help="drive POST /chat")
+    chat.add_argument("--url", help="running API server (default: in-process on fakes)")
+    chat.add_argument("--concurrency", type=int, default=20)
+    chat.add_argument("--requests", type=int, default=500)
+    chat.add_argument("--duration", type=float, default=0, help="run for this many seconds instead of --requests")
+    chat.add_argument("--users", type=int, default=100)
+    chat.add_argument("--timeout", type=float, default=60)
+    chat.add_argument("--llm-latency", type=float, default=0.2)
+    chat.add_argument("--market-latency", type=float, default=0.05)
+    chat.add_argument("--db-latency", type=float, default=0.002)
+
+    graph = sub.add_parser("graph", help="drive socket.io start_monitoring")
+    graph.add_argument("--url", help="running graph server (default: started in-process on fakes)")
+    graph.add_argument("--clients", type=int, default=50)
+    graph.add_argument("--symbols", type=int, default=10)
+    graph.add_argument("--interval", type=float, default=1.0)
+    graph.add_argument("--duration", type=float, default=10.0)
+    graph.add_argument("--protocol", choices=("full", "delta"), default="delta")
+    graph.add_argument("--upstream-rate", type=float, default=50)
+    graph.add_argument("--market-latency", type=float, default=0.05)
+
+    args = parser.parse_args()
+    if args.target == "chat":
+        asyncio.run(run_chat(args))
+    else:
+        run_graph(args)
+
+
+if __name__ == "__main__":
+    main()
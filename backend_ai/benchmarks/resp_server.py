@@ -0,0 +1,165 @@
+"""
+Local stand-in for a Redis server: speaks enough of the Redis protocol
+(PING, GET, SET with EX/PX/NX/XX, DEL, EXISTS, SCAN with MATCH/COUNT, DBSIZE,
+FLUSHDB, SELECT, AUTH) for the redis cache backend, keeping everything in
+memory. For benchmarks and local multi-worker runs without a Redis install.
+
+    python benchmarks/resp_server.py --port 6390
+    CACHE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6390/0 uvicorn app:app --workers 4
+"""
+import argparse
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def glob_to_regex(pattern: bytes) -> "re.Pattern":
+    """
+    Redis glob syntax: * ? [...] and backslash escapes.
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i:i + 1]
+        if char == b"\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1:i + 2]))
+            i += 1
+        elif char == b"*":
+            out.append(b".*")
+        elif char == b"?":
+            out.append(b".")
+        elif char == b"[":
+            end = pattern.find(b"]", i + 1)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                out.append(b"[" + (b"^" + body[1:] if body.startswith(b"^") else body) + b"]")
+                i = end
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return re.compile(b"".join(out) + b"\\Z", re.S)
+
+
+class RespServer:
+    def __init__(self):
+        # key -> (value, expires_at or None)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and time.time() >= entry[1]:
+            del self.data[key]
+            return None
+        return entry[0]
+
+    def execute(self, args: List[bytes]) -> Any:
+        self.commands += 1
+        name = args[0].upper()
+        if name == b"PING":
+            return b"+PONG"
+        if name in (b"SELECT", b"AUTH"):
+            return b"+OK"
+        if name == b"GET":
+            return self._live(args[1])
+        if name == b"SET":
+            expires_at = None
+            options = [arg.upper() for arg in args[3:]]
+            for option, value in zip(options, args[4:]):
+                if option == b"EX":
+                    expires_at = time.time() + int(value)
+                elif option == b"PX":
+                    expires_at = time.time() + int(value) / 1000
+            exists = self._live(args[1]) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return None
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK"
+        if name in (b"DEL", b"EXISTS"):
+            found = sum(self._live(key) is not None for key in args[1:])
+            if name == b"DEL":
+                for key in args[1:]:
+                    self.data.pop(key, None)
+            return found
+        if name == b"SCAN":
+            return self._scan(args)
+        if name == b"DBSIZE":
+            return len(self.data)
+        if name == b"FLUSHDB":
+            self.data.clear()
+            return b"+OK"
+        return ValueError(f"ERR unknown command '{name.decode(errors='replace')}'")
+
+    def _scan(self, args: List[bytes]) -> Any:
+        cursor = int(args[1])
+        match, count = None, 10
+        for option, value in zip(args[2::2], args[3::2]):
+            if option.upper() == b"MATCH":
+                match = glob_to_regex(value)
+            elif option.upper() == b"COUNT":
+                count = int(value)
+        keys = sorted(self.data)
+        batch = keys[cursor:cursor + count]
+        following = cursor + count if cursor + count < len(keys) else 0
+        found = [key for key in batch if (match is None or match.match(key)) and self._live(key) is not None]
+        return [str(following).encode(), found]
+
+    @staticmethod
+    def reply(value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return b"-" + str(value).encode() + b"\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(RespServer.reply(item) for item in value)
+        if value.startswith(b"+"):
+            return value + b"\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.startswith(b"*"):
+                    # Inline command, as sent by telnet.
+                    args = line.split()
+                else:
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int((await reader.readline())[1:])
+                        args.append((await reader.readexactly(length + 2))[:-2])
+                if args:
+                    writer.write(self.reply(self.execute(args)))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = await asyncio.start_server(RespServer().handle, host, port)
+    print(f"Serving the Redis protocol on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_BLACKLIST = [
+    "torrent", "xxx", "porn", "hagu", "nsfw", "sex", "nude", "naked", "deepfake", "hentai",
+    "erotic", "adult", "camgirl", "webcam", "escort", "fetish", "incest", "lolita", "bdsm", "explicit",
+    "onlyfans", "hookup", "rape", "child porn", "cp", "dark web", "black market", "drugs", "weed", "marijuana",
+    "cocaine", "heroin", "lsd", "meth", "cheat code", "hack", "crack", "keygen", "serial key", "license bypass",
+    "phishing", "ddos", "ransomware", "scam", "scammer", "bitcoin fraud", "carding", "fake id", "identity theft", "spyware"
+]
+
+# Optional JSON list or newline-separated file overriding DEFAULT_BLACKLIST.
+BLACKLIST_PATH = os.getenv("BLACKLIST_PATH")
+
+
+def load_blacklist(path: Optional[str] = BLACKLIST_PATH) -> List[str]:
+    if not path:
+        return list(DEFAULT_BLACKLIST)
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return [str(term) for term in json.loads(content)]
+    return [line.strip() for line in content.splitlines() if line.strip() and not line.startswith("#")]
+
+
+_WORD_RE = re.compile(r"\w+")
+# Inflections a term also matches: "hack" blocks "hacking" and "hackers",
+# "porn" blocks "pornography", while "hackathon" or "cpi" stay allowed.
+_SUFFIXES = ("s", "es", "ed", "er", "ers", "ing", "ings", "y", "ies", "ity",
+             "ography", "ographic", "ographer", "ographers")
+
+
+def inflections(word: str) -> Iterator[str]:
+    """
+    The word and its inflected forms: a final consonant may double
+    ("scamming") and a final e may drop ("raping") before a suffix starting
+    with a vowel. Plural terms do not match their singular, so "drugs" still
+    allows "drug makers".
+    """
+    yield word
+    for suffix in _SUFFIXES:
+        yield word + suffix
+        if suffix[0] in "aeio":
+            yield word + word[-1] + suffix
+            if word.endswith("e"):
+                yield word[:-1] + suffix
+
+
+class BlacklistMatcher:
+    """
+    Word-boundary blacklist matching in a single pass over the query: the
+    query is tokenized once and each token is looked up in hashed tables of
+    the terms' inflected forms, so the cost no longer grows with the number
+    of terms. Terms match whole words and their inflections ("hack" matches
+    "hacking" but not "hackathon", "cp" does not match "cpi"); multi-word
+    terms match consecutive words. Terms containing non-word characters fall
+    back to one compiled regex.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted({" ".join(term.lower().split()) for term in terms if term.strip()})
+        # Inflected form -> single-word term.
+        self._words: Dict[str, str] = {}
+        # Inflected form -> word of a multi-word term, and the forms of their
+        # first words.
+        self._phrase_words: Dict[str, str] = {}
+        self._first_words = set()
+        self._phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        irregular = []
+        for term in self.terms:
+            words = tuple(term.split())
+            if not all(_WORD_RE.fullmatch(word) for word in words):
+                irregular.append(term)
+            elif len(words) == 1:
+                for form in inflections(term):
+                    self._words.setdefault(form, term)
+            else:
+                self._phrases.setdefault(words[0], []).append(words[1:])
+                for word in words:
+                    for form in inflections(word):
+                        self._phrase_words.setdefault(form, word)
+                self._first_words.update(inflections(words[0]))
+        # An exact term wins over another term's inflection.
+        for term in self._words.values():
+            self._words[term] = term
+        self._pattern = None
+        if irregular:
+            alternation = "|".join(r"\s+".join(map(re.escape, term.split())) for term in irregular)
+            self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    def _phrase_matches(self, tokens: List[str]) -> Iterator[Tuple[int, str]]:
+        words = [self._phrase_words.get(token, token) for token in tokens]
+        for i, word in enumerate(words):
+            for rest in self._phrases.get(word, ()):
+                if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    yield i, " ".join((word,) + rest)
+
+    def find_all(self, text: str) -> List[str]:
+        """
+        Return every blacklisted term in text, in order of appearance
+        (terms handled by the regex fallback come last).
+        """
+        tokens = _WORD_RE.findall(text.lower())
+        found = [(i, self._words[token]) for i, token in enumerate(tokens) if token in self._words]
+        if not self._first_words.isdisjoint(tokens):
+            found.extend(self._phrase_matches(tokens))
+        matches = [term for _, term in sorted(found)]
+        if self._pattern is not None:
+            matches.extend(" ".join(match.lower().split()) for match in self._pattern.findall(text))
+        return matches
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        Return a blacklisted term found in text, or None.
+        """
+        tokens = _WORD_RE.findall(text.lower())
+        if not self._words.keys().isdisjoint(tokens):
+            return next(self._words[token] for token in tokens if token in self._words)
+        if not self._first_words.isdisjoint(tokens):
+            for _, term in self._phrase_matches(tokens):
+                return term
+        if self._pattern is not None:
+            match = self._pattern.search(text)
+            if match:
+                return " ".join(match.group(0).lower().split())
+        return None
+
+
+blacklist_matcher = BlacklistMatcher(load_blacklist())
+
+
+def is_blacklisted(query: str) -> bool:
+    return blacklist_matcher.search(query) is not None
@@ -0,0 +1,666 @@
+"""
+Storage for the market data, portfolio, conversation and response caches.
+With several worker processes, an in-process cache means every worker
+fetches and holds its own copy; a shared backend lets one worker's fetch
+serve the others and makes invalidation visible to all of them.
+
+CACHE_BACKEND selects the backend:
+  memory  per-process LRU bounded by CACHE_MAX_BYTES (the default)
+  sqlite  one SQLite file in WAL mode at CACHE_PATH, shared by the
+          processes on one host
+  redis   any server speaking the Redis protocol at REDIS_URL, shared
+          across hosts
+
+Entries live in a namespace under a string key and expire after a TTL.
+Shared backends store values as JSON with a one-byte format version, so
+every worker reads back what another wrote and nothing read from a shared
+store is ever executed; dicts, lists, scalars, dates, ObjectIds and pandas
+Series/DataFrames round-trip. An entry in an unknown format reads as a miss.
+Async code uses the a* methods, which keep disk and network I/O off the
+event loop.
+"""
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+from concurrency import run_blocking
+from registry import registry
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", os.getenv("MARKET_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+CACHE_PATH = os.getenv(
+    "CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_cache.sqlite3")
+)
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+# Prefix for every key this app writes, so it can share a Redis database.
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "fingpt:")
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "1"))
+# After a failed connection, serve misses for this many seconds before
+# trying the server again.
+REDIS_RETRY_INTERVAL = float(os.getenv("REDIS_RETRY_INTERVAL", "5"))
+
+FORMAT_VERSION = b"\x02"
+
+
+def _datetimes(index: pd.DatetimeIndex) -> Dict[str, Any]:
+    unit = getattr(index, "unit", "ns")
+    return {"__t": "datetimes", "v": index.asi8.tolist(), "unit": unit, "tz": str(index.tz) if index.tz else None,
+            "name": _to_json(index.name)}
+
+
+def _column(values: pd.Series) -> Dict[str, Any]:
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return _datetimes(pd.DatetimeIndex(values))
+    return {"__t": "column", "v": _to_json(values.tolist()), "dtype": str(values.dtype)}
+
+
+def _values(column: Any) -> Any:
+    if isinstance(column, dict) and "dtype" in column:
+        try:
+            return pd.array(column["v"], dtype=column["dtype"])
+        except (TypeError, ValueError):
+            return column["v"]
+    return column
+
+
+def _to_json(value: Any) -> Any:
+    """
+    JSON-compatible form of a cached value; types JSON lacks are tagged
+    with "__t" and restored by _from_json.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        if "__t" not in value and all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        return {"__t": "dict", "v": [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__t": "tuple", "v": [_to_json(item) for item in value]}
+    if value is pd.NaT:
+        return {"__t": "nat"}
+    if isinstance(value, pd.Timestamp):
+        return {"__t": "timestamp", "v": value.value, "tz": str(value.tz) if value.tz else None}
+    if isinstance(value, datetime):
+        return {"__t": "datetime", "v": value.isoformat()}
+    if isinstance(value, date):
+        return {"__t": "date", "v": value.isoformat()}
+    if isinstance(value, np.generic):
+        return _to_json(value.item())
+    if isinstance(value, ObjectId):
+        return {"__t": "objectid", "v": str(value)}
+    if isinstance(value, pd.DatetimeIndex):
+        return _datetimes(value)
+    if isinstance(value, pd.Index):
+        return {"__t": "index", "v": _to_json(value.tolist()), "name": _to_json(value.name)}
+    if isinstance(value, pd.Series):
+        return {"__t": "series", "index": _to_json(value.index), "v": _column(value), "name": _to_json(value.name)}
+    if isinstance(value, pd.DataFrame):
+        return {"__t": "frame", "index": _to_json(value.index), "columns": _to_json(list(value.columns)),
+                "v": [_column(value.iloc[:, i]) for i in range(value.shape[1])]}
+    if isinstance(value, np.ndarray):
+        return _to_json(value.tolist())
+    raise TypeError(f"values of type {type(value).__name__} cannot be cached")
+
+
+def _from_json(value: Dict[str, Any]) -> Any:
+    tag = value.get("__t")
+    if tag is None:
+        return value
+    if tag == "dict":
+        return {(tuple(key) if isinstance(key, list) else key): item for key, item in value["v"]}
+    if tag == "tuple":
+        return tuple(value["v"])
+    if tag == "nat":
+        return pd.NaT
+    if tag == "timestamp":
+        return pd.Timestamp(value["v"], tz="UTC").tz_convert(value["tz"]) if value["tz"] else pd.Timestamp(value["v"])
+    if tag == "datetime":
+        return datetime.fromisoformat(value["v"])
+    if tag == "date":
+        return date.fromisoformat(value["v"])
+    if tag == "objectid":
+        return ObjectId(value["v"])
+    if tag == "datetimes":
+        index = pd.DatetimeIndex(pd.to_datetime(value["v"], unit=value["unit"]), name=value["name"])
+        if hasattr(index, "as_unit"):
+            index = index.as_unit(value["unit"])
+        return index.tz_localize("UTC").tz_convert(value["tz"]) if value["tz"] else index
+    if tag == "index":
+        return pd.Index(value["v"], name=value["name"])
+    if tag == "column":
+        # Kept as a dict until its series or frame restores the dtype.
+        return value
+    if tag == "series":
+        return pd.Series(_values(value["v"]), index=value["index"], name=value["name"])
+    if tag == "frame":
+        frame = pd.DataFrame({i: _values(column) for i, column in enumerate(value["v"])}, index=value["index"])
+        frame.columns = value["columns"]
+        return frame
+    raise ValueError(f"unknown cached type '{tag}'")
+
+
+def encode(value: Any) -> bytes:
+    return FORMAT_VERSION + json.dumps(_to_json(value), separators=(",", ":")).encode()
+
+
+def decode(data: bytes) -> Tuple[bool, Any]:
+    if not data or data[:1] != FORMAT_VERSION:
+        return False, None
+    try:
+        return True, json.loads(data[1:], object_hook=_from_json)
+    except Exception:
+        return False, None
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Rough in-memory footprint of a cached value in bytes.
+    """
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheBackend:
+    """
+    Interface of a cache backend. `get` returns (stored_at, value) for a
+    live entry, stored_at being a Unix timestamp, or None. Backend failures
+    are logged and read as misses; a cache outage must not fail requests.
+    """
+
+    name = "base"
+    # Whether other processes see this backend's entries.
+    shared = False
+    # Whether calls may block on disk or network I/O, in which case the a*
+    # methods run them on the blocking pool.
+    blocking = False
+
+    def __init__(self):
+        self.errors = 0
+        self._failing = False
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        raise NotImplementedError
+
+    def keys(self, namespace: str, prefix: str = "") -> List[str]:
+        raise NotImplementedError
+
+    def delete_prefix(self, namespace: str, prefix: str = "") -> None:
+        self.delete(namespace, self.keys(namespace, prefix))
+
+    def count(self, namespace: str) -> Optional[int]:
+        """
+        Live entries in a namespace, or None where counting is not cheap.
+        """
+        return None
+
+    def claim(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew a lock held for `ttl` seconds. Returns whether `owner`
+        holds it; another owner's unexpired claim wins. Shared backends
+        make the check and the write atomic.
+        """
+        entry = self.get(namespace, key)
+        if entry is not None and entry[1] != owner:
+            return False
+        self.set(namespace, key, owner, ttl)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "errors": self.errors}
+
+    async def _call(self, method: Callable[..., Any], *args: Any) -> Any:
+        return await run_blocking(method, *args) if self.blocking else method(*args)
+
+    async def aget(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        return await self._call(self.get, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        await self._call(self.set, namespace, key, value, ttl)
+
+    async def adelete(self, namespace: str, keys: Iterable[str]) -> None:
+        await self._call(self.delete, namespace, list(keys))
+
+    def _encode(self, value: Any) -> Optional[bytes]:
+        try:
+            return encode(value)
+        except (TypeError, ValueError) as e:
+            print(f"Cache backend {self.name} skipped a value: {str(e)}")
+            return None
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        if not self._failing:
+            self._failing = True
+            print(f"Cache backend {self.name} failed on {operation}: {str(error)}")
+
+    def _recovered(self) -> None:
+        if self._failing:
+            self._failing = False
+            print(f"Cache backend {self.name} recovered")
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Per-process LRU over all namespaces, evicting the least recently used
+    entries once their estimated footprint exceeds max_bytes. Values are
+    stored as is and must not be mutated by callers.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, float, int, Any]]" = OrderedDict()
+        self._counts: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _pop(self, entry_key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+            self._counts[entry_key[0]] -= 1
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            if time.time() >= entry[1]:
+                self._pop(entry_key)
+                return None
+            self._entries.move_to_end(entry_key)
+            return entry[0], entry[3]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        size = estimate_size(value)
+        now = time.time()
+        entry_key = (namespace, key)
+        with self._lock:
+            self._pop(entry_key)
+            if size > self.max_bytes:
+                return
+            self._entries[entry_key] = (now, now + ttl, size, value)
+            self._counts[namespace] = self._counts.get(namespace, 0) + 1
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._pop((namespace, key))
+
+    def keys(self, namespace: str, prefix: str = "") -> List[str]:
+        with self._lock:
+            return [key for ns, key in self._entries if ns == namespace and key.startswith(prefix)]
+
+    def count(self, namespace: str) -> Optional[int]:
+        return self._counts.get(namespace, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(super().stats(), entries=len(self._entries), bytes=self._bytes,
+                        max_bytes=self.max_bytes, evictions=self.evictions)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    One SQLite database shared by the processes on a host. WAL mode lets
+    readers proceed while a writer commits; each thread has its own
+    connection. Expired entries are purged, and the oldest evicted once the
+    stored values exceed max_bytes, every PURGE_EVERY writes.
+    """
+
+    name = "sqlite"
+    shared = True
+    blocking = True
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self.evictions = 0
+        db = self._connection()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT, key TEXT, value BLOB, stored_at REAL, expires_at REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            row = self._connection().execute(
+                "SELECT stored_at, value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        self._recovered()
+        if row is None:
+            return None
+        found, value = decode(row[1])
+        return (row[0], value) if found else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        data = self._encode(value)
+        if data is None or len(data) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, data, now, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            self._failed("set", e)
+
+    def claim(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        data = encode(owner)
+        now = time.time()
+        try:
+            db = self._connection()
+            db.execute(
+                "INSERT INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at, "
+                "expires_at = excluded.expires_at WHERE cache.expires_at <= ? OR cache.value = excluded.value",
+                (namespace, key, data, now, now + ttl, now)
+            )
+            row = db.execute("SELECT value FROM cache WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        except sqlite3.Error as e:
+            self._failed("claim", e)
+            return False
+        return row is not None and row[0] == data
+
+    def purge(self) -> None:
+        db = self._connection()
+        db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        size, entries = db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0), COUNT(*) FROM cache").fetchone()
+        if size > self.max_bytes:
+            # Drop the oldest entries in proportion to the overshoot, plus a
+            # margin so the next purge has room to spare.
+            evict = int(entries * (1 - self.max_bytes / size)) + entries // 10 + 1
+            db.execute(
+                "DELETE FROM cache WHERE (namespace, key) IN "
+                "(SELECT namespace, key FROM cache ORDER BY stored_at LIMIT ?)", (evict,)
+            )
+            self.evictions += evict
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        try:
+            self._connection().executemany(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", [(namespace, key) for key in keys]
+            )
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def keys(self, namespace: str, prefix: str = "") -> List[str]:
+        try:
+            rows = self._connection().execute(
+                "SELECT key FROM cache WHERE namespace = ? AND substr(key, 1, ?) = ? AND expires_at > ?",
+                (namespace, len(prefix), prefix, time.time())
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed("keys", e)
+            return []
+        return [row[0] for row in rows]
+
+    def delete_prefix(self, namespace: str, prefix: str = "") -> None:
+        try:
+            self._connection().execute(
+                "DELETE FROM cache WHERE namespace = ? AND substr(key, 1, ?) = ?", (namespace, len(prefix), prefix)
+            )
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def count(self, namespace: str) -> Optional[int]:
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed("count", e)
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), path=self.path, max_bytes=self.max_bytes, evictions=self.evictions)
+
+
+class RespError(Exception):
+    pass
+
+
+class RespConnection:
+    """
+    Minimal client for the Redis serialization protocol (RESP2): enough to
+    send commands and parse their replies, with no dependency on redis-py.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = REDIS_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    @staticmethod
+    def pack(args: Tuple[Any, ...]) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts += [b"$%d\r\n" % len(arg), arg, b"\r\n"]
+        return b"".join(parts)
+
+    def command(self, *args: Any) -> Any:
+        self.sock.sendall(self.pack(args))
+        return self.read()
+
+    def read(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server.")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RespError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else self.reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line[:40]!r}")
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def escape_glob(text: str) -> str:
+    return "".join("\\" + char if char in "*?[]\\" else char for char in text)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Entries in a Redis-protocol server under
+    <REDIS_KEY_PREFIX><namespace>:<key>, expiring through SET ... PX. Each
+    thread keeps its own connection and reconnects once on a dropped one.
+    The server's own maxmemory policy bounds its size.
+    """
+
+    name = "redis"
+    shared = True
+    blocking = True
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_KEY_PREFIX):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.database = int(parsed.path.strip("/") or 0)
+        self.prefix = prefix
+        self._local = threading.local()
+        self._retry_at = 0.0
+
+    def _connect(self) -> RespConnection:
+        connection = RespConnection(self.host, self.port)
+        if self.password:
+            connection.command("AUTH", self.password)
+        if self.database:
+            connection.command("SELECT", self.database)
+        return connection
+
+    def _command(self, *args: Any) -> Any:
+        if time.monotonic() < self._retry_at:
+            raise ConnectionError("Cache server unavailable, waiting to retry.")
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            try:
+                if connection is None:
+                    connection = self._local.connection = self._connect()
+                return connection.command(*args)
+            except (OSError, ConnectionError):
+                if connection is not None:
+                    connection.close()
+                self._local.connection = None
+                if attempt:
+                    self._retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+                    raise
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            data = self._command("GET", self._key(namespace, key))
+        except (OSError, ConnectionError, RespError) as e:
+            self._failed("get", e)
+            return None
+        self._recovered()
+        found, entry = decode(data)
+        return entry if found else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        data = self._encode((time.time(), value))
+        if data is None:
+            return
+        try:
+            self._command("SET", self._key(namespace, key), data, "PX", max(1, int(ttl * 1000)))
+        except (OSError, ConnectionError, RespError) as e:
+            self._failed("set", e)
+
+    def claim(self, namespace: str, key: str, owner: str, ttl: float) -> bool:
+        key = self._key(namespace, key)
+        milliseconds = max(1, int(ttl * 1000))
+        try:
+            if self._command("SET", key, owner, "NX", "PX", milliseconds) is not None:
+                return True
+            if self._command("GET", key) != owner.encode():
+                return False
+            return self._command("SET", key, owner, "XX", "PX", milliseconds) is not None
+        except (OSError, ConnectionError, RespError) as e:
+            self._failed("claim", e)
+            return False
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        keys = [self._key(namespace, key) for key in keys]
+        try:
+            for i in range(0, len(keys), 500):
+                self._command("DEL", *keys[i:i + 500])
+        except (OSError, ConnectionError, RespError) as e:
+            self._failed("delete", e)
+
+    def keys(self, namespace: str, prefix: str = "") -> List[str]:
+        start = len(self._key(namespace, ""))
+        pattern = escape_glob(self._key(namespace, prefix)) + "*"
+        found = []
+        cursor = b"0"
+        try:
+            while True:
+                cursor, batch = self._command("SCAN", cursor, "MATCH", pattern, "COUNT", 1000)
+                found += [key.decode()[start:] for key in batch]
+                if cursor == b"0":
+                    return found
+        except (OSError, ConnectionError, RespError) as e:
+            self._failed("keys", e)
+            return found
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), url=f"redis://{self.host}:{self.port}/{self.database}")
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend, "redis": RedisBackend}
+
+
+def create_backend() -> CacheBackend:
+    if CACHE_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND '{CACHE_BACKEND}', expected one of {', '.join(BACKENDS)}.")
+    return BACKENDS[CACHE_BACKEND]()
+
+
+registry.register_default("cache_backend", create_backend)
+
+
+def cache_backend() -> CacheBackend:
+    """
+    The shared cache backend, created on first use.
+    """
+    return registry.get("cache_backend")
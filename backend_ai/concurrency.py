@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Upper bound on threads used for libraries that can only block (yfinance, pymongo).
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+# Yahoo Finance requests in flight across all threads.
+YAHOO_MAX_CONCURRENCY = int(os.getenv("YAHOO_MAX_CONCURRENCY", "8"))
+# Longest a call waits for an upstream slot before failing with UpstreamBusy.
+UPSTREAM_WAIT_TIMEOUT = float(os.getenv("UPSTREAM_WAIT_TIMEOUT", "10"))
+
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE,
+    thread_name_prefix="blocking-io"
+)
+
+
+def install_blocking_executor(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """
+    Make the bounded pool the loop's default executor, so LangChain's async
+    execution of synchronous tools is capped by the same pool.
+    """
+    loop = loop or asyncio.get_running_loop()
+    loop.set_default_executor(blocking_executor)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the bounded pool without stalling the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(blocking_executor, partial(ctx.run, func, *args, **kwargs))
+
+
+class UpstreamBusy(Exception):
+    pass
+
+
+class UpstreamLimit:
+    """
+    Bounds concurrent calls to a blocking upstream across threads. Used as
+    `with limit:`; raises UpstreamBusy after waiting `timeout` for a slot.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, timeout: float = UPSTREAM_WAIT_TIMEOUT):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.rejections = 0
+
+    def _count(self, field: str, delta: int) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def __enter__(self) -> "UpstreamLimit":
+        self._count("waiting", 1)
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            self._count("waiting", -1)
+        if not acquired:
+            self._count("rejections", 1)
+            raise UpstreamBusy(f"{self.name} is busy, try again shortly.")
+        self._count("active", 1)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._count("active", -1)
+        self._slots.release()
+
+
+yahoo_limit = UpstreamLimit("yahoo", YAHOO_MAX_CONCURRENCY)
@@ -0,0 +1,179 @@
+import os
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from cache_backends import CacheBackend, cache_backend
+from registry import registry
+from metrics import mongo_timer
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "test")
+
+# Connection pool tuning for the Atlas cluster.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+# How long an operation waits for a pooled connection before failing, so a
+# burst fails fast instead of queueing on the pool without bound.
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+
+PORTFOLIO_CACHE_TTL = float(os.getenv("PORTFOLIO_CACHE_TTL", "60"))
+
+
+def create_client():
+    if not MONGODB_URL:
+        raise ValueError("MONGODB_URL is not set in the environment variables.")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(
+        MONGODB_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        retryReads=True,
+        retryWrites=True
+    )
+
+
+registry.register_default("mongo", create_client)
+
+
+def get_client():
+    """
+    Shared Motor client, created on first use.
+    """
+    return registry.get("mongo")
+
+
+def stocks_collection():
+    return get_client()[MONGO_DB_NAME]["stocks"]
+
+
+def conversations_collection():
+    return get_client()[MONGO_DB_NAME]["conversations"]
+
+
+async def ensure_indexes() -> None:
+    await stocks_collection().create_index("userId")
+    await conversations_collection().create_index("conversationId", unique=True)
+
+
+def user_id_filter(user_id: str) -> Dict[str, Any]:
+    """
+    Match a userId stored either as a string or as an ObjectId in one query.
+    """
+    ids = [user_id]
+    if ObjectId.is_valid(user_id):
+        ids.append(ObjectId(user_id))
+    return {"userId": {"$in": ids}}
+
+
+def stored_user_id(user_id: str) -> Any:
+    """
+    The userId to store in a new document: an ObjectId, as the Node backend
+    stores it, when user_id is a valid one.
+    """
+    return ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id
+
+
+class PortfolioCache:
+    """
+    Per-user portfolio documents with a short TTL, kept in the cache
+    backend. Writes through push_stock/pull_stock invalidate the user's
+    entry, for every worker sharing the backend.
+    """
+
+    namespace = "portfolio"
+
+    def __init__(self, ttl: float = PORTFOLIO_CACHE_TTL, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or cache_backend()
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = await self.backend.aget(self.namespace, user_id)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    async def set(self, user_id: str, portfolio: Dict[str, Any]) -> None:
+        await self.backend.aset(self.namespace, user_id, portfolio, self.ttl)
+
+    async def invalidate(self, user_id: str) -> None:
+        await self.backend.adelete(self.namespace, [user_id])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "entries": self.backend.count(self.namespace),
+        }
+
+
+portfolio_cache = PortfolioCache()
+
+
+async def find_portfolio(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the user's portfolio document, or None if there is none.
+    """
+    portfolio = await portfolio_cache.get(user_id)
+    if portfolio is None:
+        with mongo_timer("find_portfolio"):
+            portfolio = await stocks_collection().find_one(user_id_filter(user_id), {"_id": 0})
+        if portfolio is not None:
+            await portfolio_cache.set(user_id, portfolio)
+    return portfolio
+
+
+async def push_stock(user_id: str, stock: str, holding: int):
+    with mongo_timer("push_stock"):
+        result = await stocks_collection().update_one(
+            user_id_filter(user_id),
+            {
+                "$push": {"stocks": {"stock": stock, "holding": holding}},
+                "$setOnInsert": {"userId": stored_user_id(user_id)}
+            },
+            upsert=True
+        )
+    await portfolio_cache.invalidate(user_id)
+    return result
+
+
+async def pull_stock(user_id: str, stock: str):
+    with mongo_timer("pull_stock"):
+        result = await stocks_collection().update_one(
+            user_id_filter(user_id),
+            {"$pull": {"stocks": {"stock": stock}}}
+        )
+    await portfolio_cache.invalidate(user_id)
+    return result
+
+
+async def find_conversation(conversation_id: str) -> Optional[Dict[str, Any]]:
+    with mongo_timer("find_conversation"):
+        return await conversations_collection().find_one({"conversationId": conversation_id}, {"_id": 0})
+
+
+async def save_conversation(conversation: Dict[str, Any]):
+    with mongo_timer("save_conversation"):
+        return await conversations_collection().update_one(
+            {"conversationId": conversation["conversationId"]},
+            {"$set": conversation},
+            upsert=True
+        )
@@ -0,0 +1,315 @@
+"""
+Vectorized technical indicators over a 2-D (time x ticker) price matrix.
+Missing bars are NaN. Every function handles all tickers in one call.
+compute_indicators works on each ticker's own bars, so a holiday in one
+ticker's calendar does not open a gap in another's windows. IndicatorState
+keeps the same results up to date one bar at a time.
+"""
+import copy
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def align_closes(histories: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Align the close columns of several PriceHistory objects on the union of
+    their timestamps. Returns (timestamps, prices) with prices of shape
+    (len(timestamps), len(histories)).
+    """
+    if not histories:
+        return np.empty(0, dtype="datetime64[ns]"), np.empty((0, 0))
+    timestamps = np.unique(np.concatenate([np.asarray(h.timestamps) for h in histories]))
+    prices = np.full((len(timestamps), len(histories)), np.nan)
+    for j, history in enumerate(histories):
+        prices[np.searchsorted(timestamps, history.timestamps), j] = history.close
+    return timestamps, prices
+
+
+def pack_valid(prices: np.ndarray) -> np.ndarray:
+    """
+    Shift each column's valid prices down to end on the last row, keeping
+    their order, with NaN above them. Windows over the result span each
+    ticker's last N bars rather than the last N rows of a shared timeline.
+    """
+    valid = ~np.isnan(prices)
+    rows = np.cumsum(valid, axis=0) - 1 + (len(prices) - valid.sum(axis=0))
+    packed = np.full(prices.shape, np.nan)
+    r, c = np.nonzero(valid)
+    packed[rows[r, c], c] = prices[r, c]
+    return packed
+
+
+def crossover_signal(short_ma: np.ndarray, long_ma: np.ndarray) -> np.ndarray:
+    """
+    "buy" when the short average is above the long one, "sell" when not,
+    "insufficient data" while either is unavailable.
+    """
+    with np.errstate(invalid="ignore"):
+        signal = np.where(short_ma > long_ma, "buy", "sell")
+    return np.where(np.isnan(short_ma) | np.isnan(long_ma), "insufficient data", signal)
+
+
+def simple_returns(prices: np.ndarray) -> np.ndarray:
+    return prices[1:] / prices[:-1] - 1
+
+
+def sma(prices: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling mean over the previous `window` bars; NaN until a full window of
+    valid prices is available.
+    """
+    valid = ~np.isnan(prices)
+    sums = np.cumsum(np.where(valid, prices, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    out = np.full(prices.shape, np.nan)
+    if len(prices) < window:
+        return out
+    window_sums = sums[window - 1:].copy()
+    window_counts = counts[window - 1:].copy()
+    window_sums[1:] -= sums[:-window]
+    window_counts[1:] -= counts[:-window]
+    out[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return out
+
+
+def _bars_after(valid: np.ndarray) -> np.ndarray:
+    # For each valid price, how many of its column's valid prices follow it.
+    return valid.sum(axis=0) - np.cumsum(valid, axis=0)
+
+
+def ema(prices: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponential moving average of the latest bar for each ticker, with
+    alpha = 2 / (span + 1), seeded with the ticker's first valid price; NaN
+    bars are skipped. Computed as the equivalent weighted sum of each
+    column's prices rather than bar by bar.
+    """
+    alpha = 2.0 / (span + 1)
+    valid = ~np.isnan(prices)
+    after = _bars_after(valid)
+    first = np.cumsum(valid, axis=0) == 1
+    weights = np.where(first, 1.0, alpha) * (1 - alpha) ** np.where(valid, after, 0)
+    total = np.sum(np.where(valid, weights * np.where(valid, prices, 0.0), 0.0), axis=0)
+    return np.where(valid.any(axis=0), total, np.nan)
+
+
+def rsi(prices: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Wilder's relative strength index of the latest bar for each ticker: the
+    first `period` changes are averaged, later ones smoothed by 1 / period.
+    Computed as the equivalent weighted sum of each column's changes.
+    """
+    changes = np.diff(pack_valid(prices), axis=0)
+    valid = ~np.isnan(changes)
+    count = valid.sum(axis=0)
+    order = np.cumsum(valid, axis=0) - 1
+    # A seed change counts as if it arrived with the period-th change.
+    steps = np.where(order < period, count - period, _bars_after(valid))
+    weights = np.where(valid, (1 - 1.0 / period) ** np.maximum(steps, 0) / period, 0.0)
+    changes = np.where(valid, changes, 0.0)
+    avg_gain = np.sum(weights * np.maximum(changes, 0.0), axis=0)
+    avg_loss = np.sum(weights * np.maximum(-changes, 0.0), axis=0)
+    return _rsi_value(avg_gain, avg_loss, count >= period)
+
+
+def _rsi_value(avg_gain: np.ndarray, avg_loss: np.ndarray, ready: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rs = avg_gain / avg_loss
+        out = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + rs))
+    return np.where(ready, out, np.nan)
+
+
+def max_drawdown(prices: np.ndarray) -> np.ndarray:
+    """
+    Largest peak-to-trough decline per ticker, as a negative fraction.
+    """
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nanmin(prices / peaks - 1, axis=0, initial=0.0)
+
+
+class _Accumulators:
+    """
+    Running state behind IndicatorState, folded one row at a time. A NaN in
+    a row means that ticker has no bar, as in compute_indicators.
+    """
+
+    def __init__(self, n: int, short_window: int, long_window: int, rsi_period: int):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.rsi_period = rsi_period
+        # Each column's last long_window valid prices, oldest first, NaN above.
+        self.window = np.full((long_window, n), np.nan)
+        self.bars = np.zeros(n, dtype=int)
+        self.first = np.full(n, np.nan)
+        self.last = np.full(n, np.nan)
+        self.peak = np.full(n, np.nan)
+        self.drawdown = np.zeros(n)
+        self.ema_short = np.full(n, np.nan)
+        self.ema_long = np.full(n, np.nan)
+        # Welford accumulators for the mean and variance of returns.
+        self.return_count = np.zeros(n, dtype=int)
+        self.return_mean = np.zeros(n)
+        self.return_m2 = np.zeros(n)
+        # Changes seen and Wilder averages for the RSI.
+        self.change_count = np.zeros(n, dtype=int)
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+
+    def update(self, row: np.ndarray) -> None:
+        valid = ~np.isnan(row)
+        change = row / self.last - 1
+        has_change = ~np.isnan(change)
+        self.return_count += has_change
+        delta = np.where(has_change, change - self.return_mean, 0.0)
+        self.return_mean += delta / np.maximum(self.return_count, 1)
+        self.return_m2 += delta * np.where(has_change, change - self.return_mean, 0.0)
+
+        diff = np.where(has_change, row - self.last, 0.0)
+        self.change_count += has_change
+        weight = np.where(has_change, 1.0 / np.minimum(np.maximum(self.change_count, 1), self.rsi_period), 0.0)
+        self.avg_gain += (np.maximum(diff, 0.0) - self.avg_gain) * weight
+        self.avg_loss += (np.maximum(-diff, 0.0) - self.avg_loss) * weight
+
+        for attr, span in (("ema_short", self.short_window), ("ema_long", self.long_window)):
+            alpha = 2.0 / (span + 1)
+            current = getattr(self, attr)
+            setattr(self, attr, np.where(np.isnan(current), row,
+                                         np.where(valid, alpha * row + (1 - alpha) * current, current)))
+
+        self.window[:-1, valid] = self.window[1:, valid]
+        self.window[-1, valid] = row[valid]
+        self.bars += valid
+        self.first = np.where(np.isnan(self.first), row, self.first)
+        self.last = np.where(valid, row, self.last)
+        self.peak = np.fmax(self.peak, row)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.drawdown = np.fmin(self.drawdown, row / self.peak - 1)
+
+    def _window_mean(self, window: int) -> np.ndarray:
+        return np.where(self.bars >= window, self.window[-window:].mean(axis=0), np.nan)
+
+    def values(self) -> Dict[str, np.ndarray]:
+        short_ma = self._window_mean(self.short_window)
+        long_ma = self._window_mean(self.long_window)
+        with np.errstate(invalid="ignore"):
+            volatility = np.where(self.return_count > 1,
+                                  np.sqrt(self.return_m2 / np.maximum(self.return_count - 1, 1)), np.nan)
+        return {
+            "last_price": self.last,
+            "short_moving_average": short_ma,
+            "long_moving_average": long_ma,
+            "short_ema": self.ema_short,
+            "long_ema": self.ema_long,
+            "recommendation": crossover_signal(short_ma, long_ma),
+            "average_return": np.where(self.return_count > 0, self.return_mean * 100, np.nan),
+            "volatility": volatility * 100,
+            "trend": np.where(self.last > self.first, "upward", "downward"),
+            "max_drawdown": self.drawdown * 100,
+            "rsi": _rsi_value(self.avg_gain, self.avg_loss, self.change_count >= self.rsi_period),
+        }
+
+
+class IndicatorState:
+    """
+    compute_indicators() results for a set of tickers, kept up to date one
+    bar at a time in O(tickers * long_window) instead of recomputing the
+    history. The newest bar stays pending until the next one arrives, so it
+    can be replaced while it is still forming (a price-store refresh
+    re-fetches the current bar).
+    """
+
+    def __init__(self, n: int, short_window: int = 20, long_window: int = 50, rsi_period: int = 14):
+        self._done = _Accumulators(n, short_window, long_window, rsi_period)
+        self._pending: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_prices(cls, prices: np.ndarray, **windows) -> "IndicatorState":
+        prices = np.asarray(prices, dtype=float)
+        state = cls(prices.shape[1], **windows)
+        for row in prices:
+            state.append(row)
+        return state
+
+    def append(self, row: np.ndarray) -> None:
+        """
+        Add a new bar (one price per ticker, NaN for none).
+        """
+        if self._pending is not None:
+            self._done.update(self._pending)
+        self._pending = np.array(row, dtype=float)
+
+    def replace_last(self, row: np.ndarray) -> None:
+        """
+        Replace the newest bar, e.g. with a refreshed quote for it.
+        """
+        if self._pending is None:
+            self.append(row)
+        else:
+            self._pending = np.array(row, dtype=float)
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        if self._pending is None:
+            return self._done.values()
+        current = copy.deepcopy(self._done)
+        current.update(self._pending)
+        return current.values()
+
+
+def compute_indicators(prices: np.ndarray, short_window: int = 20, long_window: int = 50,
+                       rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    Latest SMA/EMA crossover, mean return and volatility (percent), trend,
+    max drawdown (percent) and RSI for every column of a (time x ticker)
+    price matrix, computed in one vectorized pass over each column's valid
+    bars.
+    """
+    prices = np.asarray(prices, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    n = prices.shape[1]
+    if not len(prices):
+        prices = np.full((1, n), np.nan)
+    prices = pack_valid(prices)
+
+    returns = simple_returns(prices)
+    counts = np.sum(~np.isnan(returns), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average_return = np.where(counts > 0, np.nansum(returns, axis=0) / np.maximum(counts, 1), np.nan)
+        deviations = np.where(np.isnan(returns), 0.0, returns - average_return)
+        volatility = np.where(counts > 1, np.sqrt((deviations ** 2).sum(axis=0) / np.maximum(counts - 1, 1)), np.nan)
+
+    short_ma = sma(prices, short_window)[-1]
+    long_ma = sma(prices, long_window)[-1]
+    valid = ~np.isnan(prices)
+    first = prices[valid.argmax(axis=0), np.arange(n)]
+    last = prices[len(prices) - 1 - valid[::-1].argmax(axis=0), np.arange(n)]
+    return {
+        "last_price": last,
+        "short_moving_average": short_ma,
+        "long_moving_average": long_ma,
+        "short_ema": ema(prices, short_window),
+        "long_ema": ema(prices, long_window),
+        "recommendation": crossover_signal(short_ma, long_ma),
+        "average_return": average_return * 100,
+        "volatility": volatility * 100,
+        "trend": np.where(last > first, "upward", "downward"),
+        "max_drawdown": max_drawdown(prices) * 100,
+        "rsi": rsi(prices, rsi_period),
+    }
+
+
+def indicators_by_ticker(tickers: List[str], indicators: Dict[str, np.ndarray]) -> Dict[str, Dict[str, object]]:
+    """
+    Transpose compute_indicators() output into {ticker: {name: value}} with
+    plain Python values (NaN becomes None).
+    """
+    result = {}
+    for j, ticker in enumerate(tickers):
+        row = {}
+        for name, values in indicators.items():
+            value = values[j].item()
+            row[name] = None if isinstance(value, float) and np.isnan(value) else value
+        result[ticker] = row
+    return result
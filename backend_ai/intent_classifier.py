@@ -0,0 +1,203 @@
+import os
+import re
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Below this confidence the query is left to the LLM classification_chain.
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+_GREETING_RE = re.compile(
+    r"^\s*(?:(?:hi|hii+|hello|hey|heya|yo|hola|namaste|greetings|good\s+(?:morning|afternoon|evening|day))"
+    r"(?:\s+(?:there|fingpt|bot|buddy|friend))?|who\s+are\s+you|what(?:'s|\s+is)\s+your\s+name"
+    r"|who\s+(?:made|built|created)\s+you|thanks?(?:\s+you)?|thank\s+you)\s*[!.?]*\s*$",
+    re.IGNORECASE
+)
+_PERSONALIZED_RE = re.compile(
+    r"\b(?:my|mine|i\s+(?:own|hold|bought|have|invested))\b.*\b(?:portfolio|holdings?|stocks?|shares?|"
+    r"positions?|investments?|profit|loss|returns?)\b"
+    r"|\b(?:add|remove|delete|sell)\b.*\b(?:to|from)\s+my\s+portfolio\b",
+    re.IGNORECASE
+)
+# Finance vocabulary, or a ticker-like token such as AAPL or RELIANCE.NS.
+# Only greetings are classified locally without one; everything else, off-topic
+# questions included, is left to the LLM, which refuses what is out of scope.
+_FINANCE_TERMS_RE = re.compile(
+    r"\b(?:stocks?|shares?|positions?|share\s*holders?|equit(?:y|ies)|markets?|invest\w*|portfolios?|holdings?|"
+    r"dividends?|splits?|earnings|revenue|profits?|funds?|etfs?|bonds?|ipos?|sip|demat|brokers?\w*|"
+    r"trad(?:e|es|ed|er|ers|ing)|index|indices|nifty|sensex|nasdaq|nyse|nse|bse|dow|s&p|"
+    r"capitali[sz]ation|market\s+cap|capital\s+gains?|p/?e|valuations?|volatil\w*|diversif\w*|"
+    r"interest\s+rates?|compound(?:ing)?|inflation|recession|bull(?:ish)?|bear(?:ish)?|hedg\w*|"
+    r"options?|futures|derivatives?|crypto\w*|bitcoin|forex|returns?|yields?|capm|beta|"
+    r"liquidity|assets?|liabilit(?:y|ies)|balance\s+sheet|finance|financial|economy|economic\w*)\b",
+    re.IGNORECASE
+)
+_TICKER_RE = re.compile(r"\b[A-Z][A-Z0-9&]{1,9}(?:\.[A-Z]{1,3})?\b")
+# Attempts to steer the assistant rather than ask it something always take the
+# LLM classifier.
+_ADVERSARIAL_RE = re.compile(
+    r"\b(?:ignore|disregard|forget)\s+(?:all\s+|any\s+|the\s+|your\s+)?(?:previous|prior|above|earlier)?\s*"
+    r"(?:instructions?|prompts?|rules?)\b|\bsystem\s+prompt\b|\bjailbreak\b|\byou\s+are\s+now\b"
+    r"|\bpretend\s+(?:to\s+be|you)\b|\bact\s+as\b",
+    re.IGNORECASE
+)
+_REAL_TIME_RE = re.compile(
+    r"\b(?:current|live|latest|today'?s?|right\s+now|now|trading\s+at)\b.*\b(?:price|quote|value|news|market\s+cap)\b"
+    r"|\b(?:price|quote|share\s+price|stock\s+price|market\s+cap|news|dividends?|splits?|earnings\s+date|"
+    r"holders?)\s+(?:of|for)\s+"
+    # A company or ticker ends the query, so "price of risk in CAPM" or "price
+    # of oil affects stocks" are not taken for a quote request.
+    r"(?!(?:the\s+)?(?:risk|money|time|capital|credit|debt|liquidity|inflation)\b)"
+    r"[A-Za-z.&]+(?:\s+(?:ltd|limited|inc|corp|bank|motors|industries|stock|shares?))?\s*[?.!]*\s*$",
+    re.IGNORECASE
+)
+_GENERAL_RE = re.compile(
+    r"^\s*(?:what\s+(?:is|are|does)|what's|explain|define|meaning\s+of|how\s+(?:does|do|can|should)|"
+    r"why\s+(?:do|does|is|are)|difference\s+between|tell\s+me\s+about)\b"
+    r"(?!.*\b(?:my|today|now|current|live|latest|stock\s+price|share\s+price)\b)",
+    re.IGNORECASE
+)
+
+
+def _about_finance(query: str) -> bool:
+    return bool(_FINANCE_TERMS_RE.search(query) or _TICKER_RE.search(query))
+
+
+# Seed examples for the TF-IDF model; the regex rules above handle the
+# unambiguous phrasings, the model covers paraphrases.
+TRAINING_EXAMPLES = [
+    ("hi", "greeting"),
+    ("hello there", "greeting"),
+    ("hey fingpt", "greeting"),
+    ("good morning", "greeting"),
+    ("who are you", "greeting"),
+    ("what is your name", "greeting"),
+    ("who built you", "greeting"),
+    ("introduce yourself", "greeting"),
+    ("hey, how are you doing", "greeting"),
+    ("thanks a lot", "greeting"),
+    ("how is my portfolio doing", "personalized"),
+    ("what is the value of my holdings", "personalized"),
+    ("should I sell my tesla shares", "personalized"),
+    ("add 10 shares of AAPL to my portfolio", "personalized"),
+    ("remove MSFT from my portfolio", "personalized"),
+    ("what is my profit on nvidia", "personalized"),
+    ("analyse my investments", "personalized"),
+    ("which of my stocks performed best", "personalized"),
+    ("am I diversified enough", "personalized"),
+    ("how much money have I made", "personalized"),
+    ("expected return on my infosys position", "personalized"),
+    ("recommend whether I should buy more of what I hold", "personalized"),
+    ("what is the price of TSLA", "real time"),
+    ("current price of apple", "real time"),
+    ("NVDA stock price", "real time"),
+    ("how is reliance trading today", "real time"),
+    ("latest news on microsoft", "real time"),
+    ("market cap of amazon", "real time"),
+    ("who are the institutional holders of google", "real time"),
+    ("when is the next earnings date for meta", "real time"),
+    ("show me the stock splits of AAPL", "real time"),
+    ("compare TCS and infosys", "real time"),
+    ("what did the dividend of ITC look like last 5 years", "real time"),
+    ("is the market up today", "real time"),
+    ("what is a p/e ratio", "general"),
+    ("explain dividends", "general"),
+    ("what is an index fund", "general"),
+    ("how does the stock market work", "general"),
+    ("difference between stocks and bonds", "general"),
+    ("what are mutual funds", "general"),
+    ("define market capitalization", "general"),
+    ("how do I start investing", "general"),
+    ("what is inflation", "general"),
+    ("why do companies split their stock", "general"),
+    ("what is compound interest", "general"),
+    ("tell me about SIP investing", "general"),
+]
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    """
+    Build the TF-IDF + logistic regression model on first use. Returns None
+    when scikit-learn is unavailable, leaving only the regex rules.
+
+    Only the analyzer, vocabulary, idf and linear weights are kept: scoring a
+    single query by hand is several times faster than vectorizer.transform()
+    plus predict_proba(), which are built for batches.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    from sklearn.feature_extraction.text import TfidfVectorizer
+                    from sklearn.linear_model import LogisticRegression
+                except ImportError:
+                    _model = False
+                    return None
+                texts, labels = zip(*TRAINING_EXAMPLES)
+                vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, lowercase=True)
+                classifier = LogisticRegression(C=10.0, max_iter=1000)
+                classifier.fit(vectorizer.fit_transform(texts), labels)
+                _model = (
+                    vectorizer.build_analyzer(),
+                    vectorizer.vocabulary_,
+                    vectorizer.idf_,
+                    classifier.coef_.T.copy(),
+                    classifier.intercept_.copy(),
+                    [str(label) for label in classifier.classes_]
+                )
+    return _model or None
+
+
+def predict_intent(query: str) -> Tuple[Optional[str], float]:
+    """
+    Return (intent, confidence) from the local rules and model. intent is
+    None when neither produced a prediction, and for queries that are not
+    about finance or try to steer the assistant.
+    """
+    if _GREETING_RE.match(query):
+        return "greeting", 1.0
+    if _ADVERSARIAL_RE.search(query) or not _about_finance(query):
+        return None, 0.0
+    if _PERSONALIZED_RE.search(query):
+        return "personalized", 0.95
+    if _REAL_TIME_RE.search(query):
+        return "real time", 0.9
+    if _GENERAL_RE.match(query) and _FINANCE_TERMS_RE.search(query):
+        return "general", 0.9
+
+    model = _get_model()
+    if model is None:
+        return None, 0.0
+    analyzer, vocabulary, idf, weights, intercept, classes = model
+    counts = {}
+    for term in analyzer(query):
+        index = vocabulary.get(term)
+        if index is not None:
+            counts[index] = counts.get(index, 0) + 1
+
+    scores = intercept
+    if counts:
+        indices = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = (1 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))) * idf[indices]
+        values /= np.sqrt(values @ values)
+        scores = values @ weights[indices] + intercept
+    scores = np.exp(scores - scores.max())
+    probabilities = scores / scores.sum()
+    best = probabilities.argmax()
+    return classes[best], float(probabilities[best])
+
+
+def classify_locally(query: str, threshold: float = INTENT_CONFIDENCE_THRESHOLD) -> Optional[str]:
+    """
+    Fast-path intent classification. Returns None when the query should be
+    classified by the LLM instead.
+    """
+    intent, confidence = predict_intent(query)
+    if intent is None or confidence < threshold:
+        return None
+    return intent
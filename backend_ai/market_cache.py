@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from cache_backends import CacheBackend, cache_backend
+from singleflight import SingleFlight
+from concurrency import yahoo_limit
+
+# Freshness per kind of market data, in seconds.
+DEFAULT_TTLS = {
+    "quote": 15,
+    "news": 5 * 60,
+    "info": 6 * 60 * 60,
+    "calendar": 6 * 60 * 60,
+    "holders": 6 * 60 * 60,
+    "splits": 24 * 60 * 60,
+    "dividends": 24 * 60 * 60,
+}
+
+# Quote freshness while the US market is closed, when prices don't move.
+CLOSED_MARKET_QUOTE_TTL = float(os.getenv("CLOSED_MARKET_QUOTE_TTL", str(10 * 60)))
+MARKET_TIMEZONE = "America/New_York"
+
+
+def market_open(now: Optional[pd.Timestamp] = None) -> bool:
+    """
+    Whether US equities are in their regular session (9:30-16:00 New York
+    time, Monday to Friday). Exchange holidays are not accounted for.
+    """
+    now = (now or pd.Timestamp.now(tz="UTC")).tz_convert(MARKET_TIMEZONE)
+    minutes = now.hour * 60 + now.minute
+    return now.weekday() < 5 and 9 * 60 + 30 <= minutes < 16 * 60
+
+
+class MarketDataCache:
+    """
+    TTL cache for market data keyed by (ticker, kind, params), stored in the
+    configured cache backend so that worker processes sharing a backend
+    share fetched data. Misses for the same key within a process share a
+    single upstream fetch.
+    """
+
+    namespace = "market"
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, backend: Optional[CacheBackend] = None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._backend = backend
+        self._flights = SingleFlight()
+        # Tools call get() from several threads at once.
+        self._counts_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or cache_backend()
+
+    @staticmethod
+    def make_key(ticker: str, kind: str, params: Dict[str, Hashable]) -> str:
+        # Ticker first so a ticker's entries can be invalidated by prefix.
+        params = "&".join(f"{name}={value}" for name, value in sorted(params.items()))
+        return f"{ticker.upper()}|{kind}|{params}"
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        Return (found, value). An entry older than its kind's TTL, or than
+        max_age when given, counts as a miss.
+        """
+        entry = self.backend.get(self.namespace, key)
+        found = entry is not None and (max_age is None or time.time() - entry[0] <= max_age)
+        with self._counts_lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (True, entry[1]) if found else (False, None)
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(self.namespace, key, value, self.ttls.get(key.split("|")[1], 0))
+
+    def age(self, ticker: str, kind: str, **params: Hashable) -> Optional[float]:
+        """
+        Seconds since the entry was stored, or None if it is not cached.
+        Does not count as a lookup.
+        """
+        entry = self.backend.get(self.namespace, self.make_key(ticker, kind, params))
+        return None if entry is None else time.time() - entry[0]
+
+    def refresh(self, ticker: str, kind: str, fetcher: Callable[[], Any], **params: Hashable) -> Any:
+        """
+        Fetch and store a fresh value whether or not one is cached, sharing
+        the fetch with concurrent misses for the same key.
+        """
+        key = self.make_key(ticker, kind, params)
+
+        def fetch_and_store():
+            with yahoo_limit:
+                value = fetcher()
+            self.set(key, value)
+            return value
+
+        return self._flights.do(key, fetch_and_store)
+
+    def get_or_fetch(self, ticker: str, kind: str, fetcher: Callable[[], Any],
+                     max_age: Optional[float] = None, **params: Hashable) -> Any:
+        """
+        Return the cached value for (ticker, kind, params), calling fetcher()
+        and caching its result on a miss. Concurrent misses for the same key
+        share a single upstream fetch, which counts against the Yahoo
+        concurrency limit.
+        """
+        found, value = self.get(self.make_key(ticker, kind, params), max_age)
+        if found:
+            return value
+        return self.refresh(ticker, kind, fetcher, **params)
+
+    def invalidate(self, ticker: Optional[str] = None, kind: Optional[str] = None) -> None:
+        if ticker is not None:
+            prefix = f"{ticker.upper()}|{kind}|" if kind else f"{ticker.upper()}|"
+            self.backend.delete_prefix(self.namespace, prefix)
+        elif kind is None:
+            self.backend.delete_prefix(self.namespace)
+        else:
+            self.backend.delete(self.namespace, [key for key in self.backend.keys(self.namespace)
+                                                 if key.split("|")[1] == kind])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "coalesced": self._flights.shared,
+            "entries": self.backend.count(self.namespace),
+        }
+
+
+market_cache = MarketDataCache()
+
+
+def quote_max_age() -> float:
+    """
+    Freshness required of quote-level data: the quote TTL during market
+    hours, CLOSED_MARKET_QUOTE_TTL otherwise.
+    """
+    return market_cache.ttls["quote"] if market_open() else CLOSED_MARKET_QUOTE_TTL
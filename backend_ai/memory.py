@@ -0,0 +1,214 @@
+"""
+Conversation memory keyed by the chat request id: the most recent turns are
+kept verbatim, older ones are folded into a rolling summary, and the whole
+history stays under MEMORY_TOKEN_BUDGET prompt tokens however long the
+conversation gets. Conversations are cached in the cache backend (shared
+by the workers when it is) and backed by the MongoDB `conversations`
+collection.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from cache_backends import CacheBackend, cache_backend
+from db import find_conversation, save_conversation
+from metrics import run_config
+from payloads import estimate_tokens
+from registry import registry
+
+# Turns kept verbatim; older turns are folded into the summary.
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "4"))
+# Prompt tokens the summary plus the verbatim turns may take.
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1500"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+# A single stored message or response is cut to this many tokens.
+MEMORY_TURN_TOKENS = int(os.getenv("MEMORY_TURN_TOKENS", "400"))
+# Seconds an idle conversation stays cached before it is reloaded from MongoDB.
+MEMORY_CACHE_TTL = float(os.getenv("MEMORY_CACHE_TTL", str(24 * 60 * 60)))
+# Rewrite the summary with the LLM (in the background) instead of only
+# appending a clipped transcript of the folded turns.
+MEMORY_LLM_SUMMARY = os.getenv("MEMORY_LLM_SUMMARY", "true").lower() in ("1", "true", "yes")
+
+SUMMARY_PROMPT = (
+    "Update the summary of a conversation between a user and FinGPT, a finance assistant, "
+    "so that it also covers the new turns. Keep tickers, numbers, holdings and the user's "
+    "stated goals and preferences; drop pleasantries. Answer with the summary only, "
+    "in at most {words} words.\n\nCurrent summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+
+def _clip(text: str, tokens: int) -> str:
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+def _transcript(turns: List[Dict[str, str]], tokens: int = MEMORY_TURN_TOKENS) -> str:
+    return "\n".join(
+        f"User: {_clip(turn['message'], tokens)}\nFinGPT: {_clip(turn['response'], tokens)}" for turn in turns
+    )
+
+
+def conversation_tokens(conversation: Dict[str, Any]) -> int:
+    return estimate_tokens(conversation["summary"]) + sum(
+        estimate_tokens(turn["message"]) + estimate_tokens(turn["response"]) for turn in conversation["turns"]
+    )
+
+
+def to_messages(conversation: Dict[str, Any]) -> List[BaseMessage]:
+    """
+    The conversation as alternating chat messages, with the summary of
+    earlier turns prefixed to the first one.
+    """
+    messages: List[BaseMessage] = []
+    for i, turn in enumerate(conversation["turns"]):
+        message = turn["message"]
+        if i == 0 and conversation["summary"]:
+            message = f"(Summary of our earlier conversation: {conversation['summary']})\n\n{message}"
+        messages += [HumanMessage(content=message), AIMessage(content=turn["response"])]
+    return messages
+
+
+class ConversationMemory:
+    """
+    Windowed, summarized chat history per conversation. Reads are served
+    from the cache backend; writes update it immediately and reach MongoDB
+    (and the LLM summarizer) in the background, so neither adds to the
+    request's latency.
+    """
+
+    namespace = "conversation"
+
+    def __init__(self, window: int = MEMORY_WINDOW_TURNS, budget: int = MEMORY_TOKEN_BUDGET,
+                 ttl: float = MEMORY_CACHE_TTL, backend: Optional[CacheBackend] = None):
+        self.window = window
+        self.budget = budget
+        self.ttl = ttl
+        self._backend = backend
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.summaries = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or cache_backend()
+
+    async def _cached(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        entry = await self.backend.aget(self.namespace, conversation_id)
+        return None if entry is None else entry[1]
+
+    async def _cache(self, conversation: Dict[str, Any]) -> None:
+        await self.backend.aset(self.namespace, conversation["conversationId"], conversation, self.ttl)
+
+    async def load(self, conversation_id: str) -> Dict[str, Any]:
+        conversation = await self._cached(conversation_id)
+        if conversation is not None:
+            self.hits += 1
+            return conversation
+        self.misses += 1
+        try:
+            conversation = await find_conversation(conversation_id)
+        except Exception as e:
+            print(f"Could not load conversation {conversation_id}: {str(e)}")
+        # Another request for the same conversation may have loaded it meanwhile.
+        cached = await self._cached(conversation_id)
+        if cached is not None:
+            return cached
+        conversation = conversation or {"conversationId": conversation_id, "summary": "", "turns": [], "folded": 0}
+        await self._cache(conversation)
+        return conversation
+
+    async def history(self, conversation_id: str) -> List[BaseMessage]:
+        return to_messages(await self.load(conversation_id))
+
+    async def record(self, conversation_id: str, message: str, response: str) -> None:
+        """
+        Append a turn, fold whatever no longer fits the window or the token
+        budget into the summary, and persist in the background.
+        """
+        conversation = await self.load(conversation_id)
+        conversation["turns"].append({
+            "message": _clip(message, MEMORY_TURN_TOKENS),
+            "response": _clip(response or "", MEMORY_TURN_TOKENS),
+        })
+        conversation["updatedAt"] = time.time()
+        folded = self._fold(conversation)
+        await self._cache(conversation)
+        if folded and MEMORY_LLM_SUMMARY:
+            self._spawn(self._summarize(conversation, folded))
+        else:
+            self._spawn(self._save(conversation))
+
+    def _fold(self, conversation: Dict[str, Any]) -> List[Dict[str, str]]:
+        # The folded turns are appended to the summary as a clipped
+        # transcript right away, so nothing drops out of context while the
+        # LLM rewrite is pending. Old transcript is cut from the front.
+        turns = conversation["turns"]
+        folded = []
+        while len(turns) > 1 and (len(turns) > self.window or conversation_tokens(conversation) > self.budget):
+            turn = turns.pop(0)
+            folded.append(turn)
+            conversation["summary"] = (conversation["summary"] + "\n" + _transcript([turn], 60)).strip()
+            if estimate_tokens(conversation["summary"]) > MEMORY_SUMMARY_TOKENS:
+                conversation["summary"] = "..." + conversation["summary"][-MEMORY_SUMMARY_TOKENS * 4:]
+        if folded:
+            conversation["folded"] = conversation.get("folded", 0) + len(folded)
+        return folded
+
+    async def _summarize(self, conversation: Dict[str, Any], folded: List[Dict[str, str]]) -> None:
+        folded_count = conversation["folded"]
+        previous = conversation["summary"]
+        prompt = SUMMARY_PROMPT.format(
+            words=MEMORY_SUMMARY_TOKENS * 3 // 4, summary=previous or "(none)", turns=_transcript(folded)
+        )
+        try:
+            summarizer = registry.get("model_router").chat_model("summary")
+            result = await summarizer.ainvoke([HumanMessage(content=prompt)], config=run_config())
+            summary = result.content if isinstance(result.content, str) else ""
+            # Apply the rewrite to the latest copy, which may hold turns
+            # recorded meanwhile, possibly by another worker. Skip it if more
+            # turns were folded in the meantime; the next fold summarizes
+            # those together with this one.
+            conversation = await self._cached(conversation["conversationId"]) or conversation
+            if summary.strip() and conversation["folded"] == folded_count:
+                conversation["summary"] = _clip(summary.strip(), MEMORY_SUMMARY_TOKENS)
+                await self._cache(conversation)
+                self.summaries += 1
+        except Exception as e:
+            print(f"Could not summarize conversation {conversation['conversationId']}: {str(e)}")
+        await self._save(conversation)
+
+    async def _save(self, conversation: Dict[str, Any]) -> None:
+        try:
+            await save_conversation(dict(conversation, turns=list(conversation["turns"])))
+        except Exception as e:
+            print(f"Could not save conversation {conversation['conversationId']}: {str(e)}")
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        """
+        Wait for pending summaries and writes, e.g. before shutdown.
+        """
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "entries": self.backend.count(self.namespace),
+            "summaries": self.summaries,
+            "pending_writes": len(self._tasks),
+        }
+
+
+conversation_memory = ConversationMemory()
@@ -0,0 +1,341 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts followed by the running sum.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = self.header()
+        for key, values in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge or counter whose samples are read from `collect` at scrape time,
+    for state that already lives elsewhere (e.g. cache statistics).
+    """
+
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[LabelValues, Optional[float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.collect().items()):
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                print(f"Could not collect metric {metric.name}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+chat_stage_seconds = metrics_registry.register(Histogram(
+    "fingpt_chat_stage_seconds", "Time spent in each stage of a chat request.", ("stage", "route")
+))
+intent_classifications = metrics_registry.register(Counter(
+    "fingpt_intent_classifications_total", "Intent classifications by source (local fast path or LLM).", ("source",)
+))
+tool_seconds = metrics_registry.register(Histogram(
+    "fingpt_tool_seconds", "Agent tool invocation time.", ("tool", "status")
+))
+llm_seconds = metrics_registry.register(Histogram(
+    "fingpt_llm_seconds", "LLM call time.", ("status",)
+))
+llm_tokens = metrics_registry.register(Counter(
+    "fingpt_llm_tokens_total", "LLM tokens used, by direction.", ("type",)
+))
+mongo_seconds = metrics_registry.register(Histogram(
+    "fingpt_mongo_seconds", "MongoDB operation time.", ("operation",)
+))
+tool_payload_tokens = metrics_registry.register(Counter(
+    "fingpt_tool_payload_tokens_total",
+    "Estimated prompt tokens of tool results before (raw) and after (sent) compaction.", ("tool", "stage")
+))
+
+_breakdown: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_breakdown", default=None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, Any]]:
+    """
+    Collect a per-request timing breakdown for everything recorded inside
+    the block (including tools and LLM calls made by agents).
+    """
+    breakdown: Dict[str, Any] = {"stages": {}, "tools": [], "llm": [], "mongo": [], "payloads": [], "tokens": {}}
+    token = _breakdown.set(breakdown)
+    start = time.perf_counter()
+    try:
+        yield breakdown
+    finally:
+        breakdown["total"] = time.perf_counter() - start
+        _breakdown.reset(token)
+
+
+def _record(section: str, entry: Any) -> None:
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        breakdown[section].append(entry)
+
+
+@contextmanager
+def stage_timer(stage: str, route: str = "") -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        chat_stage_seconds.observe(elapsed, stage=stage, route=route)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown["stages"][stage] = elapsed
+
+
+@contextmanager
+def mongo_timer(operation: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        mongo_seconds.observe(elapsed, operation=operation)
+        _record("mongo", {"operation": operation, "seconds": elapsed})
+
+
+def record_payload(tool: str, raw_tokens: int, sent_tokens: int) -> None:
+    tool_payload_tokens.inc(raw_tokens, tool=tool, stage="raw")
+    tool_payload_tokens.inc(sent_tokens, tool=tool, stage="sent")
+    _record("payloads", {"tool": tool, "raw_tokens": raw_tokens, "tokens": sent_tokens})
+
+
+def _token_usage(response: Any) -> Dict[str, int]:
+    usage: Dict[str, int] = {}
+    for generations in getattr(response, "generations", []):
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            for key, name in (("input_tokens", "input"), ("output_tokens", "output")):
+                if metadata.get(key):
+                    usage[name] = usage.get(name, 0) + metadata[key]
+    return usage
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records tool and LLM timings plus token usage for every LangChain run
+    it is attached to. Runs inline on the event loop, so per-request
+    breakdowns see the caller's context.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[Any, Tuple[float, str]] = {}
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        self._started[run_id] = (time.perf_counter(), name)
+
+    def _tool_done(self, run_id, status: str) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started[0]
+        tool_seconds.observe(elapsed, tool=started[1], status=status)
+        _record("tools", {"tool": started[1], "status": status, "seconds": elapsed})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_done(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, "error")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = (time.perf_counter(), "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = (time.perf_counter(), "llm")
+
+    def _llm_done(self, run_id, status: str, response: Any = None) -> None:
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started[0]
+        llm_seconds.observe(elapsed, status=status)
+        usage = _token_usage(response)
+        for name, count in usage.items():
+            llm_tokens.inc(count, type=name)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown["llm"].append({"status": status, "seconds": elapsed, **usage})
+            for name, count in usage.items():
+                breakdown["tokens"][name] = breakdown["tokens"].get(name, 0) + count
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._llm_done(run_id, "ok", response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._llm_done(run_id, "error")
+
+
+metrics_callback = MetricsCallbackHandler()
+
+# Handlers attached to every LangChain run: the metrics callback, plus the
+# LLM concurrency limit once admission.py is imported.
+run_callbacks: List[BaseCallbackHandler] = [metrics_callback]
+
+
+def run_config() -> Dict[str, Any]:
+    """
+    LangChain run config attaching the run callbacks.
+    """
+    return {"callbacks": list(run_callbacks)}
+
+
+class CacheMetrics(_Metric):
+    """
+    A cache's hits, misses, hit ratio and entry count, all read from one
+    stats() call per scrape: stats() may count entries in a shared backend.
+    """
+
+    FIELDS = (
+        ("hits_total", "hits", "counter", "Cache hits."),
+        ("misses_total", "misses", "counter", "Cache misses."),
+        ("hit_ratio", "hit_rate", "gauge", "Cache hit ratio since start."),
+        ("entries", "entries", "gauge", "Entries currently cached."),
+    )
+
+    def __init__(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        super().__init__(f"fingpt_{name}_cache", "Cache statistics.")
+        self.stats = stats
+
+    def render(self) -> List[str]:
+        stats = self.stats()
+        lines = []
+        for suffix, key, type, documentation in self.FIELDS:
+            name = f"{self.name}_{suffix}"
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {type}"]
+            if stats.get(key) is not None:
+                lines.append(f"{name} {_format_value(stats[key])}")
+        return lines
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Export a cache's hits, misses, hit ratio and entry count, read from its
+    stats() once per scrape.
+    """
+    metrics_registry.register(CacheMetrics(name, stats))
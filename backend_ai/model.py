@@ -1,90 +1,217 @@
-import json
-from typing import Optional, Dict, Any, List
-from model_config import (
-    model,
-    market_finance_agent_executor,
-    personalized_finance_agent_executor,
-    classification_chain
-)
-from langchain_core.messages import HumanMessage, AIMessage
-from tools import *
+from typing import Optional, Dict, Any, List, AsyncIterator, Sequence
+import model_config  # registers the LLM, chains and agents with the registry
+from langchain_core.messages import BaseMessage, HumanMessage
+from registry import registry
+from concurrency import run_blocking
+from blacklist import is_blacklisted
+from intent_classifier import classify_locally
+from response_cache import response_cache
+from payloads import format_portfolio
+from tool_runtime import limit_tool_calls
+from memory import conversation_memory
+from metrics import intent_classifications, run_config, stage_timer
+
+GREETING_RESPONSE = "Hello, my name is FinGPT, made by Team Sniders."
+UNSUPPORTED_RESPONSE = ("I'm sorry, I can only answer queries about general market and finance info, "
+                        "personalized stock data, greetings, or real-time market data.")
+
+def resolve_route(intent: str) -> Optional[str]:
+    """
+    Map the classifier's free-text intent onto one of the handlers:
+    'greeting', 'personalized', 'market' or 'general'. Returns None when the
+    intent is not supported.
+    """
+    intent_lower = intent.lower()
+    if "greeting" in intent_lower or "who are you" in intent_lower:
+        return "greeting"
+    if "personalized" in intent_lower:
+        return "personalized"
+    if "real time" in intent_lower or "market" in intent_lower:
+        return "market"
+    if "general" in intent_lower:
+        return "general"
+    return None
+
+async def classify_intent(message: str, history: Sequence[BaseMessage] = ()) -> str:
+    """
+    Classify the message locally when the fast-path classifier is confident,
+    otherwise through the LLM classification_chain with the conversation
+    history. Blacklisted queries always go to the chain so they get its refusal.
+    """
+    if not is_blacklisted(message):
+        intent = classify_locally(message)
+        if intent is not None:
+            intent_classifications.inc(source="local")
+            return intent
+
+    intent_classifications.inc(source="llm")
+
+    return await registry.get("classification_chain").ainvoke({
+        "chat_history": list(history),
+        "query": message
+    }, config=run_config())
 
 async def process_chat(message: str, id: str) -> List[str]:
     """
     Process an incoming chat message and return a list containing:
       [classified intent, response]
     Allowed intents: greeting, personalized, real time, or general.
+    Earlier turns of the conversation `id` are passed along as history.
     """
-    chat_history = []  
-    formatted_history = [
-        HumanMessage(content=chat["message"]) if i % 2 == 0 
-        else AIMessage(content=chat["response"])
-        for i, chat in enumerate(chat_history)
-    ]
+    with stage_timer("memory"):
+        history = await conversation_memory.history(id)
+    with stage_timer("classification"):
+        intent = await classify_intent(message, history)
 
-    intent = classification_chain.invoke({
-        "chat_history": formatted_history,
-        "query": message
-    })
+    route = resolve_route(intent)
+    with stage_timer("handler", route or "unsupported"):
+        if route == "greeting":
+            response = GREETING_RESPONSE
+        elif route == "personalized":
+            response = await handle_personalized_query(message, id, history)
+        elif route == "market":
+            response = await handle_market_query(message, history)
+        elif route == "general":
+            response = await handle_general_query(message, history)
+        else:
+            response = UNSUPPORTED_RESPONSE
 
-    response = None
-    intent_lower = intent.lower()
-    if "greeting" in intent_lower or "who are you" in intent_lower:
-        response = "Hello, my name is FinGPT, made by Team Sniders."
-    elif "personalized" in intent_lower:
-        response = await handle_personalized_query(message, id)
-    elif "real time" in intent_lower or "market" in intent_lower:
-        response = await handle_market_query(message)
-    elif "general" in intent_lower:
-        response = await handle_general_query(message)
-    else:
-        response = ("I'm sorry, I can only answer queries about general market and finance info, "
-                    "personalized stock data, greetings, or real-time market data.")
-    
+    await conversation_memory.record(id, message, response)
     return [intent, response]
 
-async def handle_market_query(message: str) -> str:
+async def stream_chat(message: str, id: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Process an incoming chat message as a stream of events:
+      {"type": "intent"}, then {"type": "tool_start"/"tool_end"} for agent
+      tool calls, {"type": "token"} as the LLM generates, and a final
+      {"type": "done"} carrying the complete response.
+    """
+    tokens = []
+    response = None
+    try:
+        with stage_timer("memory"):
+            history = await conversation_memory.history(id)
+        with stage_timer("classification"):
+            intent = await classify_intent(message, history)
+        yield {"type": "intent", "intent": intent}
+
+        route = resolve_route(intent)
+        if route in ("personalized", "market"):
+            if route == "personalized":
+                executor = registry.get("personalized_agent")
+                inputs = await build_personalized_input(message, id, history)
+            else:
+                executor = registry.get("market_agent")
+                inputs = {"messages": [*history, HumanMessage(content=message)]}
+
+            if isinstance(inputs, str):
+                response = inputs
+            else:
+                limit_tool_calls()
+                async for event in executor.astream_events(inputs, config=run_config(), version="v2"):
+                    kind = event["event"]
+                    if kind == "on_tool_start":
+                        yield {"type": "tool_start", "tool": event["name"], "input": event["data"].get("input")}
+                    elif kind == "on_tool_end":
+                        yield {"type": "tool_end", "tool": event["name"]}
+                    elif kind == "on_chat_model_stream":
+                        content = event["data"]["chunk"].content
+                        if isinstance(content, str) and content:
+                            tokens.append(content)
+                            yield {"type": "token", "content": content}
+                    elif kind == "on_chain_end" and event["name"] == "AgentExecutor":
+                        response = event["data"]["output"].get("output")
+                if response is None:
+                    response = "".join(tokens) or "Sorry, I couldn't process that request."
+        elif route == "general":
+            # Follow-ups depend on the conversation, so only a conversation's
+            # first question is served from (and stored in) the response cache.
+            response = None if history else await run_blocking(response_cache.lookup, message, general_model_name())
+            if response is not None:
+                yield {"type": "token", "content": response}
+            else:
+                async for chunk in registry.get("model").astream([*history, HumanMessage(content=message)], config=run_config()):
+                    if isinstance(chunk.content, str) and chunk.content:
+                        tokens.append(chunk.content)
+                        yield {"type": "token", "content": chunk.content}
+                response = "".join(tokens)
+                if response and not history:
+                    await run_blocking(response_cache.store, message, general_model_name(), response)
+        else:
+            response = GREETING_RESPONSE if route == "greeting" else UNSUPPORTED_RESPONSE
+            yield {"type": "token", "content": response}
+    except Exception as e:
+        yield {"type": "error", "error": f"Error processing chat request: {str(e)}"}
+        return
+
+    await conversation_memory.record(id, message, response)
+    yield {"type": "done", "intent": intent, "response": response}
+
+async def handle_market_query(message: str, history: Sequence[BaseMessage] = ()) -> str:
     """
     Handle market data related queries using the market agent executor.
     """
     try:
-        result = market_finance_agent_executor.invoke({
-            "messages": [HumanMessage(content=message)]
-        })
+        limit_tool_calls()
+        result = await registry.get("market_agent").ainvoke({
+            "messages": [*history, HumanMessage(content=message)]
+        }, config=run_config())
         return result.get("output", "Sorry, I couldn't process that request.")
     except Exception as e:
         return f"Error processing market query: {str(e)}"
 
-async def handle_personalized_query(message: str, user_id: str) -> str:
+async def build_personalized_input(message: str, user_id: str, history: Sequence[BaseMessage] = ()):
+    """
+    Build the personalized agent input with the user's real portfolio injected.
+    Returns an error message string if the portfolio cannot be retrieved.
+    """
+    from tools import get_user_portfolio
+
+    portfolio_data = await get_user_portfolio.ainvoke({"user_id": user_id}, config=run_config())
+
+    if "error" in portfolio_data:
+        return f"Could not retrieve portfolio: {portfolio_data['error']}"
+
+    contextualized_message = (
+        f"User portfolio: {format_portfolio(portfolio_data)}\n\n"
+        f"Query: {message}"
+    )
+    return {"messages": [*history, HumanMessage(content=contextualized_message)]}
+
+async def handle_personalized_query(message: str, user_id: str, history: Sequence[BaseMessage] = ()) -> str:
     """
     Handle personalized queries by dynamically injecting user's real portfolio context.
     """
     try:
-        portfolio_data = get_user_portfolio(user_id)
-        
-        if "error" in portfolio_data:
-            return f"Could not retrieve portfolio: {portfolio_data['error']}"
-
-        contextualized_message = (
-            f"User portfolio: {portfolio_data}\n\n"
-            f"Query: {message}"
-        )
+        inputs = await build_personalized_input(message, user_id, history)
+        if isinstance(inputs, str):
+            return inputs
 
-        result = personalized_finance_agent_executor.invoke({
-            "messages": [HumanMessage(content=contextualized_message)]
-        })
+        limit_tool_calls()
+        result = await registry.get("personalized_agent").ainvoke(inputs, config=run_config())
 
         return result.get("output", "Sorry, I couldn't process that request.")
-    
+
     except Exception as e:
         return f"Error processing personalized query: {str(e)}"
 
-async def handle_general_query(message: str) -> str:
+def general_model_name() -> str:
+    model = registry.get("model")
+    return getattr(model, "model", None) or type(model).__name__
+
+async def handle_general_query(message: str, history: Sequence[BaseMessage] = ()) -> str:
     """
-    Handle general queries using the base model.
+    Handle general queries using the base model. Answers don't depend on the
+    user or on time, so a conversation's first question is served from the
+    response cache when possible; follow-ups are answered with the history.
     """
     try:
-        response = model.invoke([HumanMessage(content=message)])
+        cached = None if history else await run_blocking(response_cache.lookup, message, general_model_name())
+        if cached is not None:
+            return cached
+        response = await registry.get("model").ainvoke([*history, HumanMessage(content=message)], config=run_config())
+        if isinstance(response.content, str) and response.content and not history:
+            await run_blocking(response_cache.store, message, general_model_name(), response.content)
         return response.content
     except Exception as e:
         return f"Error processing general query: {str(e)}"
@@ -1,45 +1,62 @@
 import os
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda, RunnableBranch
-from tools import tools_for_market_agent, tools_for_personalized_agent
+from blacklist import is_blacklisted
+from registry import registry
 
 load_dotenv()
 
-model = None
-market_finance_agent_executor = None
-personalized_finance_agent_executor = None
-classification_chain = None
+DEFAULT_MODEL = os.getenv("CHAT_MODEL", "gemini-2.0-flash")
 
-# 🔒 Blacklist layer
-blacklisted_keywords = [
-    "torrent", "xxx", "porn", "hagu", "nsfw", "sex", "nude", "naked", "deepfake", "hentai",
-    "erotic", "adult", "camgirl", "webcam", "escort", "fetish", "incest", "lolita", "bdsm", "explicit",
-    "onlyfans", "hookup", "rape", "child porn", "cp", "dark web", "black market", "drugs", "weed", "marijuana",
-    "cocaine", "heroin", "lsd", "meth", "cheat code", "hack", "crack", "keygen", "serial key", "license bypass",
-    "phishing", "ddos", "ransomware", "scam", "scammer", "bitcoin fraud", "carding", "fake id", "identity theft", "spyware"
-]
+# Model behind each tier; model_router.ROUTES decides which tier serves
+# which call.
+MODEL_TIERS = {
+    "fast": os.getenv("FAST_MODEL", "gemini-2.0-flash-lite"),
+    "standard": DEFAULT_MODEL,
+    "heavy": os.getenv("HEAVY_MODEL", "gemini-2.5-flash"),
+}
+# Retries inside one tier call; the router falls back to another tier instead.
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "1"))
 
-def is_blacklisted(query: str) -> bool:
-    return any(word in query.lower() for word in blacklisted_keywords)
+# Components built on first use; see register_models().
+MODEL_COMPONENTS = ("model_router", "model", "classification_chain", "general_chain", "market_agent", "personalized_agent")
 
-def initialize_models(input_model="gemini-2.0-flash") -> dict:
-    global model, market_finance_agent_executor, personalized_finance_agent_executor, classification_chain
+def build_model(input_model: str = DEFAULT_MODEL, max_tokens: int = 600, timeout: float = 20):
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-    model = ChatGoogleGenerativeAI(
+    return ChatGoogleGenerativeAI(
         model=input_model,
         temperature=0.1,
-        max_completion_tokens=100
+        max_output_tokens=max_tokens,
+        timeout=timeout,
+        max_retries=MODEL_MAX_RETRIES
     )
 
+def build_model_router(tiers: dict):
+    from model_router import ModelRouter
+
+    return ModelRouter(tiers, build_model)
+
+def routed_model(route: str):
+    """
+    Chat model for one route of the model router.
+    """
+    return registry.get("model_router").chat_model(route)
+
+def _blacklist_response():
+    from langchain_core.runnables import RunnableLambda
+
     # 🛑 Response when query is blacklisted
-    blacklist_response = RunnableLambda(
+    return RunnableLambda(
         lambda x: "I'm sorry, but I cannot assist with that request."
     )
 
+def build_classification_chain():
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnableBranch
+
+    model = routed_model("intent")
+
     # 🔤 CLASSIFICATION CHAIN
     classification_template = ChatPromptTemplate.from_messages(
         [
@@ -63,11 +80,18 @@ def initialize_models(input_model="gemini-2.0-flash") -> dict:
     )
     normal_classification = classification_template | model | StrOutputParser()
 
-    classification_chain = RunnableBranch(
-        (lambda x: is_blacklisted(x["query"]), blacklist_response),
+    return RunnableBranch(
+        (lambda x: is_blacklisted(x["query"]), _blacklist_response()),
         normal_classification
     )
 
+def build_general_chain():
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnableBranch
+
+    model = registry.get("model")
+
     # 📘 GENERAL INFORMATION CHAIN
     general_information_template = ChatPromptTemplate.from_messages(
         [
@@ -84,11 +108,17 @@ def initialize_models(input_model="gemini-2.0-flash") -> dict:
             )
         ]
     )
-    general_chain = RunnableBranch(
-        (lambda x: is_blacklisted(x["input"]), blacklist_response),
+    return RunnableBranch(
+        (lambda x: is_blacklisted(x["input"]), _blacklist_response()),
         general_information_template | model | StrOutputParser()
     )
 
+def build_market_agent():
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from tools import tools_for_market_agent
+    from tool_runtime import guard_tools
+
     # 📊 MARKET FINANCE AGENT
     market_agent_prompt = ChatPromptTemplate.from_messages(
         [
@@ -97,19 +127,30 @@ def initialize_models(input_model="gemini-2.0-flash") -> dict:
                 (
                     "Your name is FinGPT. You are a highly accurate AI assistant for real-time market data. "
                     "If you are asked about your identity or greeted, respond with 'FinGPT, made by Team Sniders'. "
-                    "Your task is to answer queries using available market data tools. Do not reveal internal chain logic."
+                    "Your task is to answer queries using available market data tools. Do not reveal internal chain logic. "
+                    "When a query needs several independent tool calls (e.g. one per ticker), request them all in the same step."
                 )
             ),
             MessagesPlaceholder(variable_name="messages"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ]
     )
-    market_finance_agent = create_tool_calling_agent(model, tools_for_market_agent, market_agent_prompt)
-    market_finance_agent_executor = AgentExecutor(
+    tools = guard_tools(tools_for_market_agent)
+    market_finance_agent = create_tool_calling_agent(routed_model("market_agent"), tools, market_agent_prompt)
+    # Not streamed: ainvoke then sends each step through the router's hedged
+    # call path. astream_events still streams tokens.
+    return AgentExecutor(
         agent=market_finance_agent,
-        tools=tools_for_market_agent
+        tools=tools,
+        stream_runnable=False
     )
 
+def build_personalized_agent():
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from tools import tools_for_personalized_agent
+    from tool_runtime import guard_tools
+
     # 🧠 PERSONALIZED FINANCE AGENT
     personalized_agent_prompt = ChatPromptTemplate.from_messages(
         [
@@ -118,25 +159,51 @@ def initialize_models(input_model="gemini-2.0-flash") -> dict:
                 (
                     "Your name is FinGPT. You are an intelligent AI assistant designed to provide personalized financial advice. "
                     "Answer queries using any available tools and your reasoning. If a query is off-topic, politely decline. "
-                    "Do not hallucinate and ensure correctness."
+                    "Do not hallucinate and ensure correctness. "
+                    "To value the user's holdings or their profit/loss, call portfolio_valuation once rather than a tool per holding. "
+                    "When a query needs several independent tool calls (e.g. one per ticker), request them all in the same step."
                 )
             ),
             MessagesPlaceholder(variable_name="messages"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
         ]
     )
-    personalized_finance_agent = create_tool_calling_agent(model, tools_for_personalized_agent, personalized_agent_prompt)
-    personalized_finance_agent_executor = AgentExecutor(
+    tools = guard_tools(tools_for_personalized_agent)
+    personalized_finance_agent = create_tool_calling_agent(routed_model("personalized_agent"), tools, personalized_agent_prompt)
+    # Not streamed: ainvoke then sends each step through the router's hedged
+    # call path. astream_events still streams tokens.
+    return AgentExecutor(
         agent=personalized_finance_agent,
-        tools=tools_for_personalized_agent
+        tools=tools,
+        stream_runnable=False
     )
 
-    return {
-        "model": model,
-        "market_agent": market_finance_agent_executor,
-        "personalized_agent": personalized_finance_agent_executor,
-        "classification_chain": classification_chain,
-        "general_chain": general_chain
-    }
+def register_models(input_model: str = DEFAULT_MODEL, chat_model=None) -> None:
+    """
+    Register the model router, chains and agents with the registry. Nothing
+    is built until a component is first requested (or warmed up).
+    input_model replaces the standard tier's model. Pass chat_model to use
+    an already constructed chat model for every tier instead of Gemini, or
+    a dict of tier name to chat model (or model name) to swap single tiers.
+    """
+    tiers = dict(MODEL_TIERS, standard=input_model)
+    if isinstance(chat_model, dict):
+        tiers.update(chat_model)
+    elif chat_model is not None:
+        tiers = {tier: chat_model for tier in tiers}
+    registry.register("model_router", lambda: build_model_router(tiers))
+    # The general route's model, for direct calls.
+    registry.register("model", lambda: routed_model("general"))
+    registry.register("classification_chain", build_classification_chain)
+    registry.register("general_chain", build_general_chain)
+    registry.register("market_agent", build_market_agent)
+    registry.register("personalized_agent", build_personalized_agent)
+
+def initialize_models(input_model: str = DEFAULT_MODEL, chat_model=None) -> dict:
+    """
+    Eagerly (re)build every model component, e.g. to switch the LLM.
+    """
+    register_models(input_model, chat_model)
+    return {name: registry.get(name) for name in MODEL_COMPONENTS}
 
-initialize_models()
+register_models()
@@ -0,0 +1,393 @@
+"""
+Routing of LLM calls to model tiers. Each route (intent classification,
+general answers, summaries, and the agents' tool-selection and answer
+steps) names the tiers it may use in order of preference, a token budget, a
+latency SLO and a timeout. A call goes to the preferred tier; if that tier
+misses the SLO the call is hedged to the next tier and the first answer
+wins, and if it fails the next tier answers instead. Moving averages of
+latency and success per route and tier demote a tier that is failing or
+slower than the SLO while the next one is doing better.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from metrics import CallbackMetric, metrics_registry
+from registry import registry
+
+# Share of a route's calls that may be hedged to a second tier.
+MODEL_HEDGE_RATIO = float(os.getenv("MODEL_HEDGE_RATIO", "0.1"))
+# Hedges a route may save up while its calls meet the SLO.
+MODEL_HEDGE_BURST = float(os.getenv("MODEL_HEDGE_BURST", "20"))
+# A tier is demoted while its success rate is below this, or its latency
+# above the route's SLO, and the next tier is doing better.
+MODEL_MIN_SUCCESS_RATE = float(os.getenv("MODEL_MIN_SUCCESS_RATE", "0.8"))
+# Every MODEL_PROBE_EVERY-th call of a route uses the preferred order
+# regardless, so a demoted tier's stats catch up once it recovers.
+MODEL_PROBE_EVERY = int(os.getenv("MODEL_PROBE_EVERY", "20"))
+# Weight of the latest call in the moving averages.
+MODEL_STATS_ALPHA = float(os.getenv("MODEL_STATS_ALPHA", "0.2"))
+
+
+class Route:
+    """
+    Tiers in order of preference, output token budget, latency SLO (seconds
+    before the call is hedged) and timeout (seconds before it fails).
+    """
+
+    def __init__(self, tiers: Sequence[str], max_tokens: int, slo: float, timeout: float):
+        self.tiers = tuple(tiers)
+        self.max_tokens = max_tokens
+        self.slo = slo
+        self.timeout = timeout
+
+
+# Agent routes apply to the tool-selection steps; "<agent>.answer" to the
+# step that answers from tool results.
+ROUTES: Dict[str, Route] = {
+    "intent": Route(("fast", "standard"), max_tokens=16, slo=1.5, timeout=8),
+    "summary": Route(("fast", "standard"), max_tokens=400, slo=4, timeout=20),
+    "general": Route(("standard", "fast"), max_tokens=600, slo=4, timeout=20),
+    "market_agent": Route(("standard", "fast"), max_tokens=300, slo=3, timeout=20),
+    "market_agent.answer": Route(("standard", "heavy"), max_tokens=800, slo=5, timeout=30),
+    "personalized_agent": Route(("standard", "heavy"), max_tokens=300, slo=3, timeout=20),
+    "personalized_agent.answer": Route(("heavy", "standard"), max_tokens=1200, slo=8, timeout=40),
+}
+
+
+class TierStats:
+    """
+    Moving averages of one tier's latency and success on one route.
+    """
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.calls += 1
+        self.failures += not ok
+        self.success_rate += MODEL_STATS_ALPHA * (ok - self.success_rate)
+        self.observe(seconds)
+
+    def observe(self, seconds: float) -> None:
+        self.latency = seconds if self.latency is None else self.latency + MODEL_STATS_ALPHA * (seconds - self.latency)
+
+    def healthy(self, slo: float) -> bool:
+        return self.success_rate >= MODEL_MIN_SUCCESS_RATE and (self.latency is None or self.latency <= slo)
+
+
+class ModelRouter:
+    """
+    Builds one chat model per tier and token budget up front (from a model
+    name through `build`, or uses an already constructed chat model as is),
+    and runs calls over them following ROUTES. Hedged calls are not counted
+    against the LLM concurrency limit; MODEL_HEDGE_RATIO bounds them.
+    """
+
+    def __init__(self, tiers: Dict[str, Any], build: Callable[..., BaseChatModel],
+                 routes: Optional[Dict[str, Route]] = None):
+        self.tiers = tiers
+        self.build = build
+        self.routes = routes or ROUTES
+        for name, route in self.routes.items():
+            unknown = set(route.tiers) - set(tiers)
+            if unknown:
+                raise ValueError(f"Route '{name}' uses unknown model tiers: {', '.join(sorted(unknown))}.")
+        self.stats = {(name, tier): TierStats() for name, route in self.routes.items() for tier in route.tiers}
+        self.calls = {name: 0 for name in self.routes}
+        self.hedges = {name: 0 for name in self.routes}
+        self.fallbacks = {name: 0 for name in self.routes}
+        self.timeouts = {name: 0 for name in self.routes}
+        self._hedge_credit = {name: 1.0 for name in self.routes}
+        self._models: Dict[Tuple[str, int, float], BaseChatModel] = {}
+        self._chat_models: Dict[str, "RoutedChatModel"] = {}
+        self._lock = threading.Lock()
+        # Build every tier model now, so warming up the router warms them up.
+        for route in self.routes.values():
+            for tier in route.tiers:
+                self.tier_model(tier, route)
+
+    def tier_model(self, tier: str, route: Route) -> BaseChatModel:
+        spec = self.tiers[tier]
+        if not isinstance(spec, str):
+            return spec
+        key = (tier, route.max_tokens, route.timeout)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self.build(spec, max_tokens=route.max_tokens, timeout=route.timeout)
+            return self._models[key]
+
+    def model_name(self, route: str) -> str:
+        spec = self.tiers[self.routes[route].tiers[0]]
+        return spec if isinstance(spec, str) else getattr(spec, "model", None) or type(spec).__name__
+
+    def chat_model(self, route: str) -> "RoutedChatModel":
+        """
+        A chat model whose calls follow `route`, for use in chains and agents.
+        """
+        with self._lock:
+            if route not in self._chat_models:
+                self._chat_models[route] = RoutedChatModel(router=self, route=route)
+            return self._chat_models[route]
+
+    def order(self, name: str) -> List[str]:
+        """
+        The route's tiers in the order to try them on this call.
+        """
+        route = self.routes[name]
+        tiers = list(route.tiers)
+        self.calls[name] += 1
+        if len(tiers) > 1 and self.calls[name] % MODEL_PROBE_EVERY:
+            first, second = (self.stats[(name, tier)] for tier in tiers[:2])
+            if not first.healthy(route.slo) and (
+                second.healthy(route.slo) or second.success_rate > first.success_rate
+            ):
+                tiers[0], tiers[1] = tiers[1], tiers[0]
+        return tiers
+
+    def _take_hedge(self, name: str) -> bool:
+        if self._hedge_credit[name] >= 1:
+            self._hedge_credit[name] -= 1
+            return True
+        return False
+
+    async def run(self, name: str, call: Callable[[str], Awaitable[Any]]) -> Tuple[str, Any]:
+        """
+        Run `call(tier)` following route `name`: on the first tier, hedged
+        to the next once the SLO passes, falling back to the next when every
+        tier tried so far failed. Returns (tier, result) of the first
+        success; raises the last error, or TimeoutError after the route's
+        timeout.
+        """
+        route = self.routes[name]
+        waiting = self.order(name)
+        self._hedge_credit[name] = min(self._hedge_credit[name] + MODEL_HEDGE_RATIO, MODEL_HEDGE_BURST)
+        running: Dict[asyncio.Future, Tuple[str, float]] = {}
+        error: Optional[BaseException] = None
+        timed_out = False
+        start = time.monotonic()
+        deadline = start + route.timeout
+
+        def launch() -> float:
+            tier = waiting.pop(0)
+            began = time.monotonic()
+            running[asyncio.ensure_future(call(tier))] = (tier, began)
+            return began + route.slo
+
+        hedge_at: Optional[float] = launch()
+        try:
+            while running:
+                now = time.monotonic()
+                if now >= deadline:
+                    self.timeouts[name] += 1
+                    timed_out = True
+                    raise asyncio.TimeoutError(f"No model tier answered route '{name}' within {route.timeout:g}s.")
+                timeout = deadline - now
+                if waiting and hedge_at is not None:
+                    timeout = min(timeout, max(hedge_at - now, 0))
+                done, _ = await asyncio.wait(list(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tier, began = running.pop(task)
+                    ok = task.exception() is None
+                    self.stats[(name, tier)].record(time.monotonic() - began, ok)
+                    if ok:
+                        return tier, task.result()
+                    error = task.exception()
+                if waiting and not running:
+                    self.fallbacks[name] += 1
+                    hedge_at = launch()
+                elif waiting and hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if self._take_hedge(name):
+                        self.hedges[name] += 1
+                        launch()
+            raise error
+        finally:
+            for task, (tier, began) in running.items():
+                task.cancel()
+                if timed_out:
+                    self.stats[(name, tier)].record(time.monotonic() - began, False)
+                else:
+                    # The loser of a hedge took at least this long.
+                    self.stats[(name, tier)].observe(time.monotonic() - began)
+
+    def stats_by_tier(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        return {
+            key: {"latency": stats.latency, "success_rate": stats.success_rate,
+                  "calls": stats.calls, "failures": stats.failures}
+            for key, stats in self.stats.items()
+        }
+
+
+def _as_chunk(message: AIMessage) -> AIMessageChunk:
+    # Models without native streaming yield their whole answer as one
+    # AIMessage.
+    if isinstance(message, AIMessageChunk):
+        return message
+    return AIMessageChunk(
+        content=message.content,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        usage_metadata=message.usage_metadata,
+        id=message.id,
+        tool_call_chunks=[
+            tool_call_chunk(name=call["name"], args=json.dumps(call["args"]), id=call["id"], index=i)
+            for i, call in enumerate(message.tool_calls)
+        ],
+    )
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model that sends each call through the router. An agent's calls
+    that answer from tool results use the "<route>.answer" route when there
+    is one. A stream is routed like a call up to its first chunk (hedged
+    after the SLO, falling back on failure) and then reads from the winning
+    tier alone, within the route's timeout.
+    """
+
+    router: Any
+    route: str
+    tools: Optional[List[Any]] = None
+    tool_kwargs: Dict[str, Any] = {}
+    _bound: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def model(self) -> str:
+        return self.router.model_name(self.route)
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tools": list(tools), "tool_kwargs": kwargs})
+
+    def _route_for(self, messages: List[BaseMessage]) -> str:
+        answer = f"{self.route}.answer"
+        if messages and isinstance(messages[-1], ToolMessage) and answer in self.router.routes:
+            return answer
+        return self.route
+
+    def _tier_model(self, tier: str, route: str):
+        model = self.router.tier_model(tier, self.router.routes[route])
+        if self.tools is None:
+            return model
+        key = f"{tier}:{route}"
+        if key not in self._bound:
+            self._bound[key] = model.bind_tools(self.tools, **self.tool_kwargs)
+        return self._bound[key]
+
+    @staticmethod
+    def _result(tier: str, message: AIMessage) -> ChatResult:
+        message.response_metadata = dict(message.response_metadata or {}, model_tier=tier)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        route = self._route_for(messages)
+
+        # Tier calls run without the outer run's callbacks: the routed call
+        # already holds an LLM slot and reports the winner's token usage.
+        async def call(tier: str) -> AIMessage:
+            return await self._tier_model(tier, route).ainvoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+
+        tier, message = await self.router.run(route, call)
+        return self._result(tier, message)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        route = self._route_for(messages)
+        error: Optional[Exception] = None
+        for tier in self.router.order(route):
+            stats = self.router.stats[(route, tier)]
+            began = time.monotonic()
+            try:
+                message = self._tier_model(tier, route).invoke(messages, stop=stop, config={"callbacks": []}, **kwargs)
+            except Exception as e:
+                stats.record(time.monotonic() - began, False)
+                error = e
+                continue
+            stats.record(time.monotonic() - began, True)
+            return self._result(tier, message)
+        raise error
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        route = self._route_for(messages)
+        deadline = time.monotonic() + self.router.routes[route].timeout
+
+        # A tier's call is its time to first chunk; the router hedges and
+        # falls back on that, and closes the streams that lose.
+        async def first_chunk(tier: str):
+            stream = self._tier_model(tier, route).astream(messages, stop=stop, config={"callbacks": []}, **kwargs)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        tier, (stream, chunk) = await self.router.run(route, first_chunk)
+        try:
+            while chunk is not None:
+                chunk = _as_chunk(chunk)
+                chunk.response_metadata = dict(chunk.response_metadata or {}, model_tier=tier)
+                yield ChatGenerationChunk(message=chunk)
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    chunk = None
+                except asyncio.TimeoutError:
+                    self.router.timeouts[route] += 1
+                    raise asyncio.TimeoutError(f"Route '{route}' did not finish streaming within its timeout.")
+        finally:
+            await stream.aclose()
+
+
+def _router_stats(key: str) -> Dict[Tuple[str, str], Any]:
+    if not registry.is_built("model_router"):
+        return {}
+    return {labels: stats[key] for labels, stats in registry.get("model_router").stats_by_tier().items()}
+
+
+def _route_counts(name: str) -> Dict[Tuple[str], int]:
+    if not registry.is_built("model_router"):
+        return {}
+    return {(route,): count for route, count in getattr(registry.get("model_router"), name).items()}
+
+
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_tier_latency_seconds", "Moving average of model call latency.", "gauge", ("route", "tier"),
+    lambda: _router_stats("latency")
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_tier_success_ratio", "Moving average of model call success.", "gauge", ("route", "tier"),
+    lambda: _router_stats("success_rate")
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_tier_calls_total", "Model calls completed, by route and tier.", "counter", ("route", "tier"),
+    lambda: _router_stats("calls")
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_hedges_total", "Model calls hedged to a second tier after missing the route's SLO.",
+    "counter", ("route",), lambda: _route_counts("hedges")
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_fallbacks_total", "Model calls retried on another tier after failing.",
+    "counter", ("route",), lambda: _route_counts("fallbacks")
+))
+metrics_registry.register(CallbackMetric(
+    "fingpt_model_timeouts_total", "Model calls no tier answered within the route's timeout.",
+    "counter", ("route",), lambda: _route_counts("timeouts")
+))
@@ -0,0 +1,172 @@
+"""
+Projection and compaction of tool results before they are handed back to
+the LLM. Raw yfinance payloads carry hundreds of fields the agents never
+use; every one of them is paid for in prompt tokens on each agent step.
+"""
+import json
+import math
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Collection, Dict, Iterable, List, Optional
+
+from metrics import record_payload
+
+# Strings longer than this are cut, lists longer than that are truncated.
+PAYLOAD_MAX_TEXT = int(os.getenv("PAYLOAD_MAX_TEXT", "400"))
+PAYLOAD_MAX_ITEMS = int(os.getenv("PAYLOAD_MAX_ITEMS", "10"))
+# Significant digits kept for ratios and unitless numbers. Prices and money
+# amounts of one or more are rounded to PAYLOAD_MONEY_DECIMALS instead.
+PAYLOAD_DIGITS = int(os.getenv("PAYLOAD_DIGITS", "4"))
+PAYLOAD_MONEY_DECIMALS = int(os.getenv("PAYLOAD_MONEY_DECIMALS", "2"))
+
+# Field names holding prices or money amounts, and markers of ratios whose
+# names mention one ("priceToBook", "day_change_pct", "dividendYield").
+_MONEY_RE = re.compile(r"price|close|open|high|low|value|cost|profit|loss|change|eps|dividend|amount|revenue|"
+                       r"income|cash|cap|moving_average|ema", re.IGNORECASE)
+_RATIO_RE = re.compile(r"[a-z]To[A-Z]|_to_|pct|percent|yield|ratio|growth|coverage|weight|52WeekChange",
+                       re.IGNORECASE)
+
+# get_info() fields returned when the agent does not ask for specific ones.
+INFO_FIELDS = (
+    "symbol", "longName", "sector", "industry", "country", "website", "fullTimeEmployees",
+    "currency", "regularMarketPrice", "previousClose", "marketCap", "trailingPE", "forwardPE",
+    "trailingEps", "dividendYield", "beta", "fiftyTwoWeekLow", "fiftyTwoWeekHigh",
+    "recommendationKey", "longBusinessSummary",
+)
+COMPARE_FIELDS = (
+    "longName", "sector", "industry", "currency", "regularMarketPrice", "marketCap", "trailingPE",
+    "forwardPE", "dividendYield", "beta", "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "recommendationKey",
+)
+
+
+def estimate_tokens(payload: Any) -> int:
+    """
+    Approximate prompt tokens for a payload serialized the way LangChain
+    turns tool output into a message (JSON, else str()), at about four
+    characters per token.
+    """
+    if not isinstance(payload, str):
+        try:
+            payload = json.dumps(payload, ensure_ascii=False)
+        except (TypeError, ValueError):
+            payload = str(payload)
+    return math.ceil(len(payload) / 4)
+
+
+def is_money(field: str) -> bool:
+    return bool(_MONEY_RE.search(field)) and not _RATIO_RE.search(field)
+
+
+def _round(value: float, money: bool = False) -> float:
+    if value == 0 or not math.isfinite(value):
+        return value
+    if money and abs(value) >= 1:
+        return round(value, PAYLOAD_MONEY_DECIMALS)
+    digits = max(PAYLOAD_DIGITS - int(math.floor(math.log10(abs(value)))) - 1, 0)
+    return round(value, digits)
+
+
+def compact(value: Any, uncapped: Collection[str] = (), max_items: Optional[int] = PAYLOAD_MAX_ITEMS,
+            money: bool = False) -> Any:
+    """
+    Make a value small and JSON-friendly: floats rounded to PAYLOAD_DIGITS
+    significant digits (whole numbers kept) or, under a price or money field
+    or with money=True, to PAYLOAD_MONEY_DECIMALS decimals; long text
+    truncated, long lists cut, dates as ISO strings, pandas/numpy objects
+    converted. Lists under a dict key named in `uncapped` are kept whole
+    (their items are still compacted); max_items=None does the same for the
+    value itself.
+    """
+    if value is None or isinstance(value, (bool, int)):
+        return value
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        return _round(value, money)
+    if isinstance(value, str):
+        return value if len(value) <= PAYLOAD_MAX_TEXT else value[:PAYLOAD_MAX_TEXT].rstrip() + "..."
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item") and not hasattr(value, "__len__"):
+        return compact(value.item(), money=money)
+    if hasattr(value, "to_dict"):
+        return compact(value.to_dict(), uncapped, max_items, money)
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            # Values under date keys (a pandas Series) take their parent's kind.
+            item_money = is_money(key) if isinstance(key, str) else money
+            item = compact(item, uncapped, None if key in uncapped else PAYLOAD_MAX_ITEMS, item_money)
+            if item is not None:
+                result[str(compact(key))] = item
+        return result
+    if isinstance(value, (list, tuple)) or hasattr(value, "tolist"):
+        items = value.tolist() if hasattr(value, "tolist") else list(value)
+        limit = len(items) if max_items is None else max_items
+        result = [compact(item, uncapped, money=money) for item in items[:limit]]
+        if len(items) > limit:
+            result.append(f"... {len(items) - limit} more")
+        return result
+    return str(value)
+
+
+def project(record: Dict[str, Any], fields: Optional[Iterable[str]], default: Iterable[str]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields (or the defaults) of a record. Requested
+    fields the record does not have are listed under "missing_fields".
+    """
+    if not isinstance(record, dict) or "error" in record:
+        return record
+    wanted = list(fields) if fields else list(default)
+    projected = {field: record[field] for field in wanted if record.get(field) is not None}
+    missing = [field for field in wanted if field not in record] if fields else []
+    if missing:
+        projected["missing_fields"] = missing
+    return projected
+
+
+def news_items(news: Any, limit: int) -> List[Dict[str, Any]]:
+    """
+    Title, publisher, date, summary and link of each article. Handles both
+    the flat and the nested ("content") yfinance news formats.
+    """
+    items = []
+    for article in (news or [])[:limit]:
+        content = article.get("content") or article
+        provider = content.get("provider") or {}
+        url = content.get("canonicalUrl") or content.get("clickThroughUrl") or {}
+        published = content.get("pubDate") or content.get("providerPublishTime")
+        if isinstance(published, (int, float)):
+            published = datetime.fromtimestamp(published, tz=timezone.utc).isoformat()
+        items.append({
+            "title": content.get("title"),
+            "publisher": provider.get("displayName") or content.get("publisher"),
+            "published": published,
+            "summary": content.get("summary"),
+            "link": url.get("url") if isinstance(url, dict) else content.get("link"),
+        })
+    return items
+
+
+def shrink(tool: str, raw: Any, projected: Any = None, uncapped: Collection[str] = ()) -> Any:
+    """
+    Compact a tool result and report raw vs. sent token estimates for it.
+    `projected` is the result after tool-specific projection, if any;
+    `uncapped` names keys whose lists the agent needs in full.
+    """
+    result = compact(raw if projected is None else projected, uncapped)
+    record_payload(tool, estimate_tokens(raw.to_dict() if hasattr(raw, "to_dict") else raw), estimate_tokens(result))
+    return result
+
+
+def format_portfolio(portfolio: Dict[str, Any]) -> str:
+    """
+    One-line portfolio summary for the personalized agent prompt.
+    """
+    holdings = ", ".join(
+        f"{item.get('stock')}: {compact(item.get('holding'))}" for item in portfolio.get("stocks", [])
+    )
+    return f"user {portfolio.get('userId')} holds {holdings or 'nothing'}"
@@ -0,0 +1,278 @@
+"""
+Popularity-driven prefetching of market data. Tickers used in agent tool
+calls and watched on the graph server are counted with exponentially
+decaying weights; a background loop keeps quotes/company info and daily
+history of the top PREFETCH_TOP_N tickers warm, within an upstream request
+budget, so most requests find fresh data in the caches. With a shared cache
+backend one worker, the leader, prefetches for all of them; otherwise the
+budget is split between the WEB_CONCURRENCY workers.
+"""
+import asyncio
+import glob
+import json
+import math
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cache_backends import cache_backend
+from concurrency import run_blocking
+from market_cache import market_cache, market_open, quote_max_age
+from price_store import PRICE_STORE_DIR, TICKER_RE, get_ticker, period_start, price_store
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFETCH_TOP_N = int(os.getenv("PREFETCH_TOP_N", "20"))
+# Upstream requests per minute the prefetcher may spend, across all workers.
+PREFETCH_BUDGET_PER_MINUTE = float(os.getenv("PREFETCH_BUDGET_PER_MINUTE", "120"))
+# API worker processes, as set for uvicorn/gunicorn. Only used to split the
+# budget when the cache backend is per process and no leader can be elected.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Seconds between passes while the market is open and while it is closed.
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "5"))
+PREFETCH_CLOSED_INTERVAL = float(os.getenv("PREFETCH_CLOSED_INTERVAL", "60"))
+# Refresh an entry once it has used this fraction of its freshness window.
+PREFETCH_REFRESH_AT = float(os.getenv("PREFETCH_REFRESH_AT", "0.6"))
+# Prefetch requests in flight at once (also bounded by YAHOO_MAX_CONCURRENCY).
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+# Seconds the prefetch leader's claim lasts without renewal; another worker
+# takes over once a leader has been gone this long.
+PREFETCH_LEADER_TTL = float(os.getenv("PREFETCH_LEADER_TTL", str(2 * PREFETCH_CLOSED_INTERVAL)))
+# Half-life of a ticker's popularity, in seconds.
+POPULARITY_HALF_LIFE = float(os.getenv("POPULARITY_HALF_LIFE", str(60 * 60)))
+# Popularity is shared between processes (graph server, API workers)
+# through small JSON files next to the price store.
+POPULARITY_DIR = os.getenv("POPULARITY_DIR", PRICE_STORE_DIR)
+POPULARITY_SAVE_INTERVAL = float(os.getenv("POPULARITY_SAVE_INTERVAL", "30"))
+
+TICKER_ARGS = ("ticker", "ticker1", "ticker2", "tickers", "symbol")
+
+
+class PopularityTracker:
+    """
+    Decaying per-ticker counts. Each process saves its counts to
+    popularity-<source>-<pid>.json at most every POPULARITY_SAVE_INTERVAL
+    seconds; top() merges them with every other process's file.
+    """
+
+    def __init__(self, source: str, half_life: float = POPULARITY_HALF_LIFE, directory: str = POPULARITY_DIR):
+        self.decay = math.log(2) / half_life
+        self.directory = directory
+        self.path = os.path.join(directory, f"popularity-{source}-{os.getpid()}.json")
+        self._scores: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        self._tasks = set()
+
+    def _decayed(self, score: float, since: float, now: float) -> float:
+        return score * math.exp(-self.decay * (now - since))
+
+    def touch(self, ticker: str, weight: float = 1.0) -> None:
+        ticker = ticker.strip().upper()
+        if not TICKER_RE.match(ticker):
+            return
+        now = time.time()
+        with self._lock:
+            score = self._scores.get(ticker)
+            value = weight + (self._decayed(score[0], score[1], now) if score else 0.0)
+            self._scores[ticker] = [value, now]
+        if now - self._saved_at > POPULARITY_SAVE_INTERVAL:
+            self._saved_at = now
+            self._save_soon()
+
+    def _save_soon(self) -> None:
+        # touch() is called from event loops (tool calls, socket events):
+        # the file is written on the blocking pool there.
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        task = loop.create_task(run_blocking(self.save))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def touch_args(self, args: Dict) -> None:
+        """
+        Count the tickers named in a tool call's arguments.
+        """
+        for name in TICKER_ARGS:
+            value = args.get(name)
+            for ticker in ([value] if isinstance(value, str) else value or []):
+                if isinstance(ticker, str):
+                    self.touch(ticker)
+
+    def counts(self, now: Optional[float] = None) -> Dict[str, float]:
+        now = now or time.time()
+        with self._lock:
+            return {ticker: self._decayed(score, since, now) for ticker, (score, since) in self._scores.items()}
+
+    def save(self) -> None:
+        now = time.time()
+        self._saved_at = now
+        # Forget tickers that decayed to nothing.
+        counts = {ticker: score for ticker, score in self.counts(now).items() if score >= 0.01}
+        with self._lock:
+            for ticker in set(self._scores) - set(counts):
+                self._scores.pop(ticker, None)
+        tmp = f"{self.path}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({"saved_at": now, "counts": counts}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Could not save ticker popularity: {str(e)}")
+
+    def _shared_counts(self, now: float) -> Iterable[Dict[str, float]]:
+        for path in glob.glob(os.path.join(self.directory, "popularity-*.json")):
+            if path == self.path:
+                continue
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                continue
+            factor = math.exp(-self.decay * (now - saved["saved_at"]))
+            if factor < 0.001:
+                # Left behind by a process that is long gone.
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            yield {ticker: score * factor for ticker, score in saved["counts"].items()}
+
+    def top(self, n: int) -> List[str]:
+        now = time.time()
+        merged = self.counts(now)
+        for counts in self._shared_counts(now):
+            for ticker, score in counts.items():
+                merged[ticker] = merged.get(ticker, 0.0) + score
+        return [ticker for ticker, _ in sorted(merged.items(), key=lambda item: -item[1])[:n]]
+
+
+class Prefetcher:
+    """
+    Refreshes the most popular tickers' quote/company info and daily
+    history before they go stale: every PREFETCH_INTERVAL seconds while the
+    market is open (when quotes only stay fresh for seconds), every
+    PREFETCH_CLOSED_INTERVAL otherwise. Upstream requests are paid from a
+    token bucket of PREFETCH_BUDGET_PER_MINUTE; quotes are refreshed first,
+    most popular first. With a shared cache backend only the worker holding
+    the leader claim prefetches, so the budget is spent once however many
+    workers there are; with a per-process backend each worker gets
+    1 / `workers` of it.
+    """
+
+    namespace = "prefetch"
+
+    def __init__(self, tracker: PopularityTracker, top_n: int = PREFETCH_TOP_N,
+                 budget_per_minute: float = PREFETCH_BUDGET_PER_MINUTE, workers: int = WEB_CONCURRENCY):
+        self.tracker = tracker
+        self.top_n = top_n
+        self.workers = max(workers, 1)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+        self.rate = budget_per_minute / 60
+        self.capacity = max(budget_per_minute, 1)
+        self.tokens = self.capacity
+        self._filled_at = time.monotonic()
+        self.requests = {"info": 0, "history": 0}
+        self.errors = 0
+        self.over_budget = 0
+        self.passes = 0
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="prefetch")
+
+    def _take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._filled_at) * self.rate)
+        self._filled_at = now
+        if self.tokens < 1:
+            self.over_budget += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def stale(self, ticker: str) -> List[str]:
+        """
+        Kinds of data for `ticker` due for a refresh.
+        """
+        due = []
+        age = market_cache.age(ticker, "info")
+        if age is None or age > quote_max_age() * PREFETCH_REFRESH_AT:
+            due.append("info")
+        if time.time() - price_store.last_refresh(ticker) > price_store.refresh_interval * PREFETCH_REFRESH_AT:
+            due.append("history")
+        return due
+
+    def run_once(self) -> int:
+        """
+        One prefetch pass. Returns the number of upstream requests made.
+        """
+        self.passes += 1
+        tickers = self.tracker.top(self.top_n)
+        due = {ticker: self.stale(ticker) for ticker in tickers}
+        jobs = [(kind, ticker) for kind in ("info", "history") for ticker in tickers if kind in due[ticker]]
+        affordable = 0
+        while affordable < len(jobs) and self._take():
+            affordable += 1
+        return sum(self._executor.map(self._fetch, jobs[:affordable]))
+
+    def _fetch(self, job: Tuple[str, str]) -> int:
+        kind, ticker = job
+        try:
+            if kind == "info":
+                market_cache.refresh(ticker, "info", lambda: get_ticker(ticker).get_info())
+            else:
+                price_store.refresh(ticker, period_start("1y"), force=True)
+        except Exception as e:
+            self.errors += 1
+            print(f"Could not prefetch {kind} for {ticker}: {str(e)}")
+            return 0
+        self.requests[kind] += 1
+        return 1
+
+    def interval(self) -> float:
+        return PREFETCH_INTERVAL if market_open() else PREFETCH_CLOSED_INTERVAL
+
+    def lead(self) -> bool:
+        """
+        Take or renew the prefetch leader claim. Always true with a
+        per-process cache backend.
+        """
+        backend = cache_backend()
+        self.leader = not backend.shared or backend.claim(self.namespace, "leader", self.owner, PREFETCH_LEADER_TTL)
+        return self.leader
+
+    async def run(self) -> None:
+        if not cache_backend().shared:
+            # No leader without a shared backend: each worker spends its share.
+            self.rate /= self.workers
+            self.capacity = max(self.capacity / self.workers, 1)
+            self.tokens = min(self.tokens, self.capacity)
+        while True:
+            try:
+                if await run_blocking(self.lead):
+                    await run_blocking(self.run_once)
+                # Followers still publish their popularity for the leader.
+                await run_blocking(self.tracker.save)
+            except Exception as e:
+                print(f"Prefetch pass failed: {str(e)}")
+            await asyncio.sleep(self.interval())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "info_requests": self.requests["info"],
+            "history_requests": self.requests["history"],
+            "errors": self.errors,
+            "over_budget": self.over_budget,
+            "passes": self.passes,
+            "leader": self.leader,
+        }
+
+
+popularity = PopularityTracker("api")
+prefetcher = Prefetcher(popularity)
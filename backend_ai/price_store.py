@@ -0,0 +1,238 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from singleflight import SingleFlight
+from registry import registry
+from concurrency import yahoo_limit
+
+PRICE_STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".price_store")
+)
+# Minimum seconds between upstream refreshes of the same ticker, unless a
+# caller asks for fresher data (the graph server's pollers do).
+PRICE_STORE_REFRESH_INTERVAL = float(os.getenv("PRICE_STORE_REFRESH_INTERVAL", "60"))
+
+# Tickers name files in the store, and come from LLM tool arguments, so
+# anything else (a path, say) is refused before touching the filesystem.
+TICKER_RE = re.compile(r"^[A-Z0-9.^=\-]{1,15}$")
+
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+RECORD_DTYPE = np.dtype([("timestamp", "datetime64[ns]"), ("ohlcv", np.float64, (len(COLUMNS),))])
+
+_EMPTY_META = {"coverage_start": None, "complete": False, "last_refresh": 0.0}
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """
+    First (exchange-local, naive) day covered by a yfinance period such as
+    '5d', '1mo', '6mo', '1y', 'ytd' or 'max'. None means all history.
+    """
+    now = (now or pd.Timestamp.now()).normalize()
+    period = period.strip().lower()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return now.replace(month=1, day=1)
+    for suffix, unit in (("mo", "months"), ("wk", "weeks"), ("y", "years"), ("d", "days")):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return now - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period '{period}'.")
+
+
+class PriceHistory:
+    """
+    Read-only daily OHLCV slice. timestamps are exchange-local naive
+    datetime64[ns]; both arrays are views into the memory-mapped store.
+    """
+
+    def __init__(self, ticker: str, records: np.ndarray):
+        self.ticker = ticker
+        self.timestamps = records["timestamp"]
+        self.values = records["ohlcv"]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.timestamps) == 0
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, COLUMNS.index(name)]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column("Close")
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(np.asarray(self.values), index=pd.DatetimeIndex(self.timestamps), columns=list(COLUMNS))
+
+
+def normalize_ticker(ticker: str) -> str:
+    """
+    Upper-cased ticker; raises ValueError unless it looks like one.
+    """
+    normalized = ticker.strip().upper() if isinstance(ticker, str) else ""
+    if not TICKER_RE.match(normalized) or not normalized.strip("."):
+        raise ValueError(f"Invalid ticker '{ticker}'.")
+    return normalized
+
+
+def _yfinance_ticker():
+    from yfinance import Ticker
+    return Ticker
+
+
+# Market data provider: yfinance.Ticker unless another class is registered
+# (e.g. the fake used by the benchmarks).
+registry.register_default("ticker", _yfinance_ticker)
+
+
+def get_ticker(symbol: str):
+    return registry.get("ticker")(symbol)
+
+
+def fetch_daily_history(ticker: str, start: Optional[pd.Timestamp]) -> pd.DataFrame:
+    with yahoo_limit:
+        if start is None:
+            return get_ticker(ticker).history(period="max", interval="1d")
+        return get_ticker(ticker).history(start=start.strftime("%Y-%m-%d"), interval="1d")
+
+
+class PriceStore:
+    """
+    On-disk daily OHLCV store: one memory-mapped record array and one small
+    JSON metadata file per ticker. A refresh only fetches bars from the last
+    stored day onwards (that day is re-fetched, since it changes during the
+    session); asking for a longer period than stored back-fills once. Reads
+    are zero-copy slices, and files are replaced atomically so several
+    processes can share one directory.
+    """
+
+    def __init__(self, root: str = PRICE_STORE_DIR, refresh_interval: float = PRICE_STORE_REFRESH_INTERVAL,
+                 fetcher: Callable[[str, Optional[pd.Timestamp]], pd.DataFrame] = fetch_daily_history):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.fetcher = fetcher
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, Tuple[int, np.ndarray, dict]] = {}
+        self.upstream_fetches = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{normalize_ticker(ticker)}.{suffix}")
+
+    def _load(self, ticker: str) -> Tuple[np.ndarray, dict]:
+        """
+        Current (records, meta) for a ticker, re-mapping the file only when
+        another writer has replaced it.
+        """
+        try:
+            version = os.stat(self._path(ticker, "json")).st_mtime_ns
+        except FileNotFoundError:
+            return np.empty(0, dtype=RECORD_DTYPE), dict(_EMPTY_META)
+        with self._lock:
+            loaded = self._loaded.get(ticker)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1], loaded[2]
+        try:
+            with open(self._path(ticker, "json")) as f:
+                meta = json.load(f)
+            records = np.load(self._path(ticker, "npy"), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return np.empty(0, dtype=RECORD_DTYPE), dict(_EMPTY_META)
+        with self._lock:
+            self._loaded[ticker] = (version, records, meta)
+        return records, meta
+
+    def _save(self, ticker: str, records: np.ndarray, meta: dict) -> None:
+        for suffix, write in (("npy", lambda f: np.save(f, records)), ("json", lambda f: f.write(json.dumps(meta).encode()))):
+            tmp = self._path(ticker, f"{suffix}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, self._path(ticker, suffix))
+
+    @staticmethod
+    def _to_records(frame: pd.DataFrame) -> np.ndarray:
+        index = frame.index
+        if getattr(index, "tz", None) is not None:
+            index = index.tz_localize(None)
+        records = np.empty(len(frame), dtype=RECORD_DTYPE)
+        records["timestamp"] = index.values.astype("datetime64[ns]")
+        records["ohlcv"] = frame.reindex(columns=list(COLUMNS)).to_numpy(dtype=np.float64)
+        return records
+
+    @staticmethod
+    def _covers(meta: dict, start: Optional[pd.Timestamp]) -> bool:
+        if meta["complete"]:
+            return True
+        if meta["coverage_start"] is None or start is None:
+            return False
+        return pd.Timestamp(meta["coverage_start"]) <= start
+
+    def refresh(self, ticker: str, start: Optional[pd.Timestamp] = None, force: bool = False,
+                max_age: Optional[float] = None) -> None:
+        """
+        Bring the stored history up to date if it is older than max_age
+        (refresh_interval by default) and extend it back to start if needed.
+        Concurrent refreshes of one ticker share a single fetch.
+        """
+        ticker = normalize_ticker(ticker)
+        max_age = self.refresh_interval if max_age is None else max_age
+
+        def fetch_and_store():
+            records, meta = self._load(ticker)
+            if not self._covers(meta, start) or not len(records):
+                records = self._to_records(self.fetcher(ticker, start))
+                meta = {
+                    "coverage_start": None if start is None else start.isoformat(),
+                    "complete": start is None,
+                }
+            else:
+                fresh = self._to_records(self.fetcher(ticker, pd.Timestamp(records["timestamp"][-1]).normalize()))
+                keep = np.searchsorted(records["timestamp"], fresh["timestamp"][0]) if len(fresh) else len(records)
+                records = np.concatenate([records[:keep], fresh])
+                meta = dict(meta)
+            meta["last_refresh"] = time.time()
+            self.upstream_fetches += 1
+            self._save(ticker, records, meta)
+
+        refreshed = False
+        while True:
+            records, meta = self._load(ticker)
+            stale = force or time.time() - meta["last_refresh"] > max_age
+            if self._covers(meta, start) and (refreshed or not stale):
+                return
+            # A shared in-flight refresh may have been for a shorter period,
+            # so coverage is re-checked after it completes.
+            self._flights.do(ticker, fetch_and_store)
+            refreshed = True
+
+    def last_refresh(self, ticker: str) -> float:
+        """
+        Epoch seconds of the ticker's last refresh, 0 if never stored.
+        """
+        return self._load(normalize_ticker(ticker))[1]["last_refresh"]
+
+    def history(self, ticker: str, period: str = "1y", max_age: Optional[float] = None) -> PriceHistory:
+        """
+        Daily bars for a yfinance-style period, refreshed first if older
+        than max_age (refresh_interval by default).
+        """
+        ticker = normalize_ticker(ticker)
+        start = period_start(period)
+        self.refresh(ticker, start, max_age=max_age)
+        records, _ = self._load(ticker)
+        first = 0 if start is None else np.searchsorted(records["timestamp"], start.to_datetime64())
+        return PriceHistory(ticker, records[first:])
+
+
+price_store = PriceStore()
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class Registry:
+    """
+    Named shared components (LLM, agents, database client) built on first
+    use instead of at import time. Each factory runs at most once; concurrent
+    first callers wait for the same build.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_seconds: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register (or replace) the factory for a component. Replacing one
+        drops any instance already built from the old factory.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._build_seconds.pop(name, None)
+
+    def register_default(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register a factory unless one was already registered under that name,
+        so a module imported late does not replace an override.
+        """
+        with self._lock:
+            if name not in self._factories:
+                self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No component registered as '{name}'.")
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._build_seconds[name] = time.perf_counter() - start
+            return self._instances[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Build the given components (all registered ones by default) ahead of
+        the first request. Returns build seconds per component.
+        """
+        for name in list(names if names is not None else self._factories):
+            self.get(name)
+        return self.stats()
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._build_seconds.clear()
+            else:
+                self._instances.pop(name, None)
+                self._build_seconds.pop(name, None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._build_seconds)
+
+
+registry = Registry()
@@ -0,0 +1,241 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from cache_backends import cache_backend
+
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite3")
+)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# Cosine similarity above which a different phrasing with the same content
+# words counts as the same question.
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.5"))
+
+EMBEDDING_DIM = 1024
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s/%&.-]+|(?<!\d)\.(?!\d)")
+_FILLER_RE = re.compile(r"\b(?:please|pls|plz|kindly|can you|could you|tell me|i want to know|a|an|the)\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+_NOT_PLURAL = {"does", "has", "was", "this", "its", "gas", "plus", "bus"}
+# Words that only shape a question. Two queries are near duplicates only when
+# every other word matches, so "market order vs limit order" never answers
+# "stop order vs limit order" however close their vectors are. "What is X"
+# and "explain X" ask the same thing; how/why/when/which/who and modal verbs
+# change the question, so they are content words and must match too.
+_QUESTION_WORDS = frozenset({
+    "what", "whats", "what's", "is", "do", "does", "did", "explain", "define", "definition", "meaning", "mean",
+    "of", "in", "on", "for", "to", "and", "or", "vs", "v", "versus", "between", "difference", "about", "me", "i",
+    "it", "this", "that", "there", "work", "with", "be", "know", "understand", "describe", "give", "show", "some",
+})
+
+
+def _normalize_word(word: str) -> str:
+    if word == "are":
+        return "is"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and word not in _NOT_PLURAL:
+        return word[:-1]
+    return word
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercase, drop punctuation, filler words and articles, and fold plurals,
+    so trivially different phrasings share one cache key.
+    """
+    query = _PUNCTUATION_RE.sub(" ", query.lower())
+    query = _FILLER_RE.sub(" ", query)
+    return " ".join(_normalize_word(word) for word in _WHITESPACE_RE.split(query) if word)
+
+
+def content_words(normalized: str) -> FrozenSet[str]:
+    return frozenset(word for word in normalized.split() if word not in _QUESTION_WORDS)
+
+
+def embed(normalized: str) -> np.ndarray:
+    """
+    Hashed bag of words and character trigrams, L2-normalized. Cheap to
+    compute locally and good enough to spot rephrasings of the same question.
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = normalized.split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    padded = f" {normalized} "
+    features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for feature in features:
+        vector[zlib.crc32(feature.encode()) % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """
+    Cache of LLM answers to user- and time-independent queries, keyed by
+    (model name, normalized query) with an optional near-duplicate match:
+    a cosine similarity above `similarity` and the same content words.
+    Entries expire after ttl seconds, the least recently used are evicted
+    beyond max_entries, and everything is persisted to SQLite so the cache
+    survives restarts. When the cache backend is shared, exact matches
+    stored by other workers are found there too.
+    """
+
+    namespace = "response"
+
+    def __init__(self, path: Optional[str] = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl: float = RESPONSE_CACHE_TTL, similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        # One row per entry, updated in place as entries come and go; rows
+        # of evicted entries are zeroed and reused.
+        self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._rows: Dict[tuple, int] = {}
+        self._row_keys: List[Optional[tuple]] = []
+        self._free_rows: List[int] = []
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "model TEXT, query TEXT, response TEXT, created REAL, PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self) -> None:
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT model, query, response, created FROM responses ORDER BY created DESC LIMIT ?",
+            (self.max_entries,)
+        ).fetchall()
+        for model_name, query, response, created in reversed(rows):
+            self._put((model_name, query), response, created)
+
+    def _put(self, key: tuple, response: str, created: float) -> List[tuple]:
+        # Called with the lock held. Returns the keys evicted to make room.
+        evicted = []
+        if key not in self._entries:
+            while self._entries and len(self._entries) >= self.max_entries:
+                old_key = self._entries.popitem(last=False)[0]
+                self._drop_row(old_key)
+                evicted.append(old_key)
+        self._entries[key] = {"response": response, "created": created, "content": content_words(key[1])}
+        self._entries.move_to_end(key)
+        self._set_row(key, embed(key[1]))
+        return evicted
+
+    def _set_row(self, key: tuple, vector: np.ndarray) -> None:
+        row = self._rows.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._row_keys)
+                if row == len(self._matrix):
+                    grown = np.zeros((max(row + 1, min(2 * row, self.max_entries), 16), EMBEDDING_DIM),
+                                     dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._row_keys.append(None)
+            self._rows[key] = row
+            self._row_keys[row] = key
+        self._matrix[row] = vector
+
+    def _drop_row(self, key: tuple) -> None:
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._matrix[row] = 0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _similar_key(self, model_name: str, normalized: str) -> Optional[tuple]:
+        used = len(self._row_keys)
+        if not self._rows:
+            return None
+        scores = self._matrix[:used] @ embed(normalized)
+        top = np.argpartition(scores, -5)[-5:] if used > 5 else np.arange(used)
+        content = content_words(normalized)
+        for index in top[np.argsort(scores[top])[::-1]]:
+            if scores[index] < self.similarity:
+                break
+            key = self._row_keys[index]
+            if key is not None and key[0] == model_name and self._entries[key]["content"] == content:
+                return key
+        return None
+
+    def lookup(self, query: str, model_name: str) -> Optional[str]:
+        normalized = normalize_query(query)
+        key = (model_name, normalized)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            near = False
+            if entry is None and self.similarity < 1.0:
+                similar = self._similar_key(model_name, normalized)
+                if similar is not None:
+                    key, entry, near = similar, self._entries[similar], True
+            if entry is not None and now - entry["created"] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.near_hits += near
+                return entry["response"]
+        backend = cache_backend()
+        shared = backend.get(self.namespace, f"{model_name}|{normalized}") if backend.shared else None
+        with self._lock:
+            if shared is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember((model_name, normalized), shared[1], shared[0])
+        return shared[1]
+
+    def store(self, query: str, model_name: str, response: str) -> None:
+        normalized = normalize_query(query)
+        created = time.time()
+        backend = cache_backend()
+        if backend.shared:
+            backend.set(self.namespace, f"{model_name}|{normalized}", response, self.ttl)
+        with self._lock:
+            self._remember((model_name, normalized), response, created)
+
+    def _remember(self, key: tuple, response: str, created: float) -> None:
+        # Called with the lock held.
+        model_name, normalized = key
+        evicted = self._put(key, response, created)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (model, query, response, created) VALUES (?, ?, ?, ?)",
+                (model_name, normalized, response, created)
+            )
+            self._db.executemany("DELETE FROM responses WHERE model = ? AND query = ?", evicted)
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "entries": len(self._entries),
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,77 @@
+import asyncio
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+from concurrency import run_blocking
+from prefetch import popularity
+
+# Tool calls from one chat request that may run at the same time.
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+# Seconds before a tool call is abandoned and reported as timed out.
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+
+# Tools that legitimately take longer than TOOL_TIMEOUT.
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "portfolio_technical_analysis": 45,
+    "aggregate_market_data": 30,
+}
+
+
+_tool_slots: ContextVar[Optional[asyncio.Semaphore]] = ContextVar("tool_slots", default=None)
+
+
+def limit_tool_calls(limit: int = AGENT_TOOL_CONCURRENCY) -> None:
+    """
+    Give the guarded tool calls made from the current task (including the
+    parallel calls of an agent step, which run in tasks it starts) `limit`
+    shared slots. Call once per chat request, before running the agent.
+    """
+    _tool_slots.set(asyncio.Semaphore(limit))
+
+
+def tool_timeout(name: str) -> float:
+    return TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT)
+
+
+async def _call(tool: StructuredTool, kwargs: Dict[str, Any]) -> Any:
+    # Call the underlying function rather than the tool, so callbacks fire
+    # once, for the guarded tool.
+    if tool.coroutine is not None:
+        return await tool.coroutine(**kwargs)
+    return await run_blocking(tool.func, **kwargs)
+
+
+def guard_tool(tool: StructuredTool) -> StructuredTool:
+    """
+    Wrap a tool so it waits for a concurrency slot, is abandoned after its
+    timeout, and reports timeouts and exceptions as {"error": ...} results
+    the agent can reason about instead of failing the whole run. A timed-out
+    synchronous tool keeps its worker thread until it returns.
+    """
+    timeout = tool_timeout(tool.name)
+
+    async def guarded(**kwargs: Any) -> Any:
+        popularity.touch_args(kwargs)
+        slots = _tool_slots.get()
+        try:
+            if slots is None:
+                return await asyncio.wait_for(_call(tool, kwargs), timeout)
+            async with slots:
+                return await asyncio.wait_for(_call(tool, kwargs), timeout)
+        except asyncio.TimeoutError:
+            return {"error": f"{tool.name} timed out after {timeout:g}s.", "tool": tool.name, "error_type": "timeout"}
+        except Exception as e:
+            return {"error": f"{tool.name} failed: {str(e)}", "tool": tool.name, "error_type": type(e).__name__}
+
+    return StructuredTool.from_function(
+        coroutine=guarded,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
+
+
+def guard_tools(tools: List[BaseTool]) -> List[BaseTool]:
+    return [guard_tool(tool) if isinstance(tool, StructuredTool) else tool for tool in tools]
@@ -1,21 +1,63 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from langchain.tools import tool
-from yfinance import Ticker
-from datetime import date
-from typing import Dict, Any, List
-from pymongo import MongoClient
-from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
+import numpy as np
+from concurrency import run_blocking
+from market_cache import market_cache, quote_max_age
+from price_store import get_ticker, price_store
+from indicators import align_closes, compute_indicators, indicators_by_ticker
+from db import find_portfolio, push_stock, pull_stock
+from payloads import COMPARE_FIELDS, INFO_FIELDS, news_items, project, shrink
+from valuation import merge_holdings, value_positions
 
 load_dotenv()
 
-MONGODB_URL = os.getenv("MONGODB_URL")
-if not MONGODB_URL:
-    raise ValueError("MONGODB_URL is not set in the environment variables.")
+# Maximum number of concurrent upstream requests for one batch fetch.
+MARKET_FANOUT_LIMIT = int(os.getenv("MARKET_FANOUT_LIMIT", "8"))
+_fanout_executor = ThreadPoolExecutor(max_workers=MARKET_FANOUT_LIMIT, thread_name_prefix="market-fanout")
 
-client = MongoClient(MONGODB_URL)
-db = client["test"]
-stocks_collection = db["stocks"]
+
+def _ticker_info(ticker: str, max_age: float = None) -> dict:
+    """
+    Cached Ticker.get_info(). Pass max_age to demand quote-level freshness.
+    """
+    return market_cache.get_or_fetch(ticker, "info", lambda: get_ticker(ticker).get_info(), max_age=max_age)
+
+def _ticker_quote_info(ticker: str) -> dict:
+    return _ticker_info(ticker, max_age=quote_max_age())
+
+def fetch_ticker_infos(tickers: List[str], max_age: float = None) -> Dict[str, dict]:
+    """
+    Fetch get_info() for many tickers concurrently (at most MARKET_FANOUT_LIMIT
+    upstream requests at once), so latency follows the slowest ticker rather
+    than the sum. A ticker that fails maps to {"error": ...}.
+    """
+    unique = list(dict.fromkeys(tickers))
+
+    def fetch(ticker):
+        try:
+            return _ticker_info(ticker, max_age=max_age)
+        except Exception as e:
+            return {"error": str(e)}
+
+    if len(unique) <= 1:
+        return {ticker: fetch(ticker) for ticker in unique}
+    return dict(zip(unique, _fanout_executor.map(fetch, unique)))
+
+def fetch_market_quotes(tickers: List[str]) -> Dict[str, dict]:
+    """
+    Batch quote lookup: {ticker: {"price": ..., "marketCap": ...}} at
+    quote-level freshness.
+    """
+    quotes = {}
+    for ticker, info in fetch_ticker_infos(tickers, max_age=quote_max_age()).items():
+        quotes[ticker] = {"price": info.get("regularMarketPrice"), "marketCap": info.get("marketCap")}
+        if "error" in info:
+            quotes[ticker]["error"] = info["error"]
+    return quotes
 
 
 @tool
@@ -24,65 +66,70 @@ def get_current_price(ticker: str) -> dict:
     Retrieve the current market price for the given ticker.
     This uses the YFinance API to get the 'regularMarketPrice' from the ticker's info.
     """
-    ticker_obj = Ticker(ticker)
-    info = ticker_obj.get_info()
+    info = _ticker_quote_info(ticker)
     current_price = info.get("regularMarketPrice")
     if current_price is None:
         return {"error": f"Current price not available for ticker {ticker}."}
     return {"ticker": ticker, "current_price": current_price}
 
 @tool
-def company_information(ticker: str) -> dict:
+def company_information(ticker: str, fields: Optional[List[str]] = None) -> dict:
     """
-    Retrieve company information (address, industry, sector, officers,
-    business summary, website, market cap, etc.) for the given ticker.
+    Retrieve company information for the given ticker: name, sector,
+    industry, country, website, employees, price, market cap, P/E, EPS,
+    dividend yield, beta, 52-week range, analyst recommendation and business
+    summary. Pass `fields` with Yahoo Finance info keys (e.g. "address1",
+    "companyOfficers", "totalRevenue") to get exactly those instead.
     """
-    ticker_obj = Ticker(ticker)
-    return ticker_obj.get_info()
+    info = _ticker_info(ticker)
+    return shrink("company_information", info, project(info, fields, INFO_FIELDS))
 
 @tool
 def last_dividend_and_earnings_date(ticker: str) -> dict:
     """
     Retrieve the company's last dividend and earnings release dates.
     """
-    ticker_obj = Ticker(ticker)
-    return ticker_obj.get_calendar()
+    calendar = market_cache.get_or_fetch(ticker, "calendar", lambda: get_ticker(ticker).get_calendar())
+    return shrink("last_dividend_and_earnings_date", calendar)
 
 @tool
 def stock_splits_history(ticker: str) -> dict:
     """
     Retrieve historical stock splits data for the given ticker.
     """
-    ticker_obj = Ticker(ticker)
-    splits = ticker_obj.get_splits()
-    return splits.to_dict()
+    splits = market_cache.get_or_fetch(ticker, "splits", lambda: get_ticker(ticker).get_splits())
+    return shrink("stock_splits_history", splits)
 
 @tool
-def stock_news(ticker: str) -> dict:
+def stock_news(ticker: str, limit: int = 5) -> dict:
     """
-    Retrieve the latest news articles for the given stock ticker.
+    Retrieve the latest `limit` news articles (title, publisher, date,
+    summary, link) for the given stock ticker.
     """
-    ticker_obj = Ticker(ticker)
-    return ticker_obj.get_news()
+    news = market_cache.get_or_fetch(ticker, "news", lambda: get_ticker(ticker).get_news())
+    return shrink("stock_news", news, news_items(news, limit))
 
 @tool
-def stock_compare(ticker1: str, ticker2: str) -> dict:
-    """
-    Compare two stock tickers by returning their respective company information.
-    """
-    return {
-        ticker1: Ticker(ticker1).get_info(),
-        ticker2: Ticker(ticker2).get_info()
-    }
+def stock_compare(ticker1: str, ticker2: str, fields: Optional[List[str]] = None) -> dict:
+    """
+    Compare two stock tickers side by side: name, sector, industry, price,
+    market cap, P/E, dividend yield, beta, 52-week range and analyst
+    recommendation. Pass `fields` with Yahoo Finance info keys to compare
+    those instead.
+    """
+    infos = fetch_ticker_infos([ticker1, ticker2])
+    raw = {ticker1: infos[ticker1], ticker2: infos[ticker2]}
+    return shrink("stock_compare", raw, {
+        ticker: project(info, fields, COMPARE_FIELDS) for ticker, info in raw.items()
+    })
 
 @tool
 def last_n_years_dividends(ticker: str, n: int) -> dict:
     """
     Retrieve dividends data for the last n years for the given ticker.
     """
-    ticker_obj = Ticker(ticker)
-    dividends = ticker_obj.dividends
-    return dividends.tail(n).to_dict()
+    dividends = market_cache.get_or_fetch(ticker, "dividends", lambda: get_ticker(ticker).dividends)
+    return shrink("last_n_years_dividends", dividends.tail(n))
 
 @tool
 def summary_of_mutual_fund_holders(ticker: str) -> dict:
@@ -90,10 +137,11 @@ def summary_of_mutual_fund_holders(ticker: str) -> dict:
     Retrieve company's top mutual fund holders including percentage of share,
     stock count, and value of holdings.
     """
-    ticker_obj = Ticker(ticker)
-    mf_holders = ticker_obj.get_mutualfund_holders()
+    mf_holders = market_cache.get_or_fetch(
+        ticker, "holders", lambda: get_ticker(ticker).get_mutualfund_holders(), holder="mutualfund"
+    )
     try:
-        return mf_holders.to_dict(orient="records")
+        return shrink("summary_of_mutual_fund_holders", mf_holders.to_dict(orient="records"))
     except Exception as e:
         return {"error": str(e)}
 
@@ -103,10 +151,11 @@ def summary_of_institutional_holders(ticker: str) -> dict:
     Retrieve company's top institutional holders including percentage of share,
     stock count, and value of holdings.
     """
-    ticker_obj = Ticker(ticker)
-    inst_holders = ticker_obj.get_institutional_holders()
+    inst_holders = market_cache.get_or_fetch(
+        ticker, "holders", lambda: get_ticker(ticker).get_institutional_holders(), holder="institutional"
+    )
     try:
-        return inst_holders.to_dict(orient="records")
+        return shrink("summary_of_institutional_holders", inst_holders.to_dict(orient="records"))
     except Exception as e:
         return {"error": str(e)}
 
@@ -138,14 +187,11 @@ def stock_performance_analysis(ticker: str, period: str = "1y") -> dict:
     Analyze historical performance of a stock over a specified period.
     Returns average return, volatility, and trend direction.
     """
-    ticker_obj = Ticker(ticker)
-    hist = ticker_obj.history(period=period)
+    hist = price_store.history(ticker, period)
     if hist.empty:
         return {"error": "No historical data available."}
-    avg_return = hist['Close'].pct_change().mean() * 100
-    volatility = hist['Close'].pct_change().std() * 100
-    trend = "upward" if hist['Close'].iloc[-1] > hist['Close'].iloc[0] else "downward"
-    return {"average_return": avg_return, "volatility": volatility, "trend": trend}
+    indicators = indicators_by_ticker([ticker], compute_indicators(hist.close))[ticker]
+    return shrink("stock_performance_analysis", {key: indicators[key] for key in ("average_return", "volatility", "trend")})
 
 @tool
 def buy_sell_recommendation(ticker: str) -> dict:
@@ -153,31 +199,47 @@ def buy_sell_recommendation(ticker: str) -> dict:
     Provide a simple recommendation to buy or sell a stock using a moving
     average crossover strategy.
     """
-    ticker_obj = Ticker(ticker)
-    hist = ticker_obj.history(period="6mo")
+    hist = price_store.history(ticker, "6mo")
     if hist.empty:
         return {"error": "No historical data available."}
-    short_ma = hist['Close'].rolling(window=20).mean().iloc[-1]
-    long_ma = hist['Close'].rolling(window=50).mean().iloc[-1]
-    recommendation = "buy" if short_ma > long_ma else "sell"
-    return {"short_moving_average": short_ma, "long_moving_average": long_ma, "recommendation": recommendation}
+    indicators = indicators_by_ticker([ticker], compute_indicators(hist.close))[ticker]
+    return shrink("buy_sell_recommendation", {key: indicators[key] for key in ("short_moving_average", "long_moving_average", "recommendation")})
 
 @tool
-def get_user_portfolio(user_id: str) -> Dict[str, Any]:
+def portfolio_technical_analysis(tickers: List[str], period: str = "1y") -> dict:
+    """
+    Analyze many stocks at once (e.g. a whole portfolio or watchlist) over a
+    period. For each ticker returns last price, 20/50-day moving averages and
+    EMAs with a buy/sell crossover signal, average daily return and
+    volatility (%), trend, maximum drawdown (%) and 14-day RSI.
+    """
+    unique = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+
+    def load(ticker):
+        try:
+            return price_store.history(ticker, period)
+        except Exception:
+            return None
+
+    histories = dict(zip(unique, _fanout_executor.map(load, unique)))
+    available = [ticker for ticker in unique if histories[ticker] is not None and not histories[ticker].empty]
+    _, prices = align_closes([histories[ticker] for ticker in available])
+    result = indicators_by_ticker(available, compute_indicators(prices)) if available else {}
+    for ticker in unique:
+        if ticker not in result:
+            result[ticker] = {"error": "No historical data available."}
+    return shrink("portfolio_technical_analysis", result)
+
+@tool
+async def get_user_portfolio(user_id: str) -> Dict[str, Any]:
     """
     Retrieve the user's portfolio from the stocks collection.
-    Tries both string and ObjectId lookups for flexibility.
+    Matches both string and ObjectId userIds in a single query.
     The collection schema:
       { userId: <ObjectId or String>, stocks: [ { stock: <String>, holding: <Number> } ] }
     """
     try:
-        portfolio = stocks_collection.find_one({"userId": user_id})
-        if not portfolio:
-            try:
-                object_id = ObjectId(user_id)
-                portfolio = stocks_collection.find_one({"userId": object_id})
-            except Exception:
-                pass
+        portfolio = await find_portfolio(user_id)
 
         if portfolio:
             return {
@@ -191,41 +253,21 @@ def get_user_portfolio(user_id: str) -> Dict[str, Any]:
         return {"error": f"Error retrieving portfolio: {str(e)}"}
 
 @tool
-def add_stock(user_id: str, stock: str, holding: int) -> Dict[str, Any]:
+async def add_stock(user_id: str, stock: str, holding: int) -> Dict[str, Any]:
     """
     Add a stock to a user's portfolio.
     """
-    result = stocks_collection.update_one(
-        {"userId": user_id},
-        {"$push": {"stocks": {"stock": stock, "holding": holding}}},
-        upsert=True  
-    )
+    result = await push_stock(user_id, stock, holding)
     if result.modified_count or result.upserted_id:
         return {"message": f"Added {stock} ({holding} shares) for user {user_id}."}
     return {"error": "Failed to add stock."}
 
-# @tool
-# def edit_stock(user_id: str, stock: str, new_holding: int) -> Dict[str, Any]:
-#     """
-#     Update the holding quantity of a stock in a user's portfolio.
-#     """
-#     result = stocks_collection.update_one(
-#         {"userId": user_id, "stocks.stock": stock},
-#         {"$set": {"stocks.$.holding": new_holding}}
-#     )
-#     if result.matched_count == 0:
-#         return {"message": f"Stock {stock} not found for user {user_id}."}
-#     return {"message": f"Updated {stock} holding to {new_holding} shares for user {user_id}."}
-
 @tool
-def delete_stock(user_id: str, stock: str) -> Dict[str, Any]:
+async def delete_stock(user_id: str, stock: str) -> Dict[str, Any]:
     """
     Delete a stock from a user's portfolio.
     """
-    result = stocks_collection.update_one(
-        {"userId": user_id},
-        {"$pull": {"stocks": {"stock": stock}}}
-    )
+    result = await pull_stock(user_id, stock)
     if result.modified_count == 0:
         return {"message": f"Stock {stock} not found for user {user_id}."}
     return {"message": f"Deleted {stock} from user {user_id}."}
@@ -236,15 +278,13 @@ def aggregate_market_data(tickers: List[str]) -> dict:
     Retrieve and aggregate market data for multiple tickers.
     Returns a summary including average price and total market capitalization.
     """
-    aggregated = {}
+    aggregated = fetch_market_quotes(tickers)
     total_price = 0
     count = 0
     market_caps = []
-    for ticker in tickers:
-        info = Ticker(ticker).get_info()
-        price = info.get("regularMarketPrice")
-        market_cap = info.get("marketCap")
-        aggregated[ticker] = {"price": price, "marketCap": market_cap}
+    for quote in aggregated.values():
+        price = quote["price"]
+        market_cap = quote["marketCap"]
         if price is not None:
             total_price += price
             count += 1
@@ -253,7 +293,50 @@ def aggregate_market_data(tickers: List[str]) -> dict:
     avg_price = total_price / count if count > 0 else None
     total_market_cap = sum(market_caps) if market_caps else None
     aggregated["summary"] = {"average_price": avg_price, "total_market_cap": total_market_cap}
-    return aggregated
+    return shrink("aggregate_market_data", aggregated)
+
+async def value_user_portfolio(user_id: str, cost_basis: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Value the user's whole portfolio: every price is fetched in one batch at
+    quote freshness, then all positions are valued in one vectorized pass.
+    `cost_basis` maps tickers to the price paid per share, for P&L.
+    """
+    portfolio = await find_portfolio(user_id)
+    if not portfolio:
+        return {"error": f"No portfolio found for user {user_id}. Please check the user ID is correct."}
+
+    holdings = merge_holdings(portfolio.get("stocks", []), cost_basis)
+    tickers = list(holdings["tickers"])
+    infos = await run_blocking(fetch_ticker_infos, tickers, quote_max_age())
+    quotes = [infos.get(ticker) or {} for ticker in tickers]
+
+    def field(*names):
+        return np.array([next((q[n] for n in names if q.get(n) is not None), np.nan) for q in quotes], dtype=float)
+
+    valuation = value_positions(
+        tickers,
+        holdings["quantities"],
+        field("regularMarketPrice", "currentPrice"),
+        field("regularMarketPreviousClose", "previousClose"),
+        holdings["cost_basis"],
+        [quote.get("sector") for quote in quotes],
+    )
+    return {"userId": str(portfolio.get("userId")), "as_of": datetime.now(timezone.utc).isoformat(timespec="seconds"), **valuation}
+
+@tool
+async def portfolio_valuation(user_id: str, cost_basis: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Value the user's whole portfolio in one call: per-position price, market
+    value, weight, day change and profit/loss, portfolio totals, and exposure
+    by sector. Pass cost_basis ({ticker: price paid per share}) when the user
+    states what they paid, to get profit/loss.
+    """
+    try:
+        # Every position is kept: the agent has to answer about any holding.
+        return shrink("portfolio_valuation", await value_user_portfolio(user_id, cost_basis),
+                      uncapped=("positions", "missing"))
+    except Exception as e:
+        return {"error": f"Error valuing portfolio: {str(e)}"}
 
 tools_for_market_agent = [
     get_current_price,
@@ -269,13 +352,14 @@ tools_for_market_agent = [
 
 tools_for_personalized_agent = [
     company_information,
+    portfolio_valuation,
     calculate_profit_loss,
     expected_return,
     stock_performance_analysis,
     buy_sell_recommendation,
+    portfolio_technical_analysis,
     get_user_portfolio,
     add_stock,
     delete_stock,
-    #edit_stock,
     aggregate_market_data
 ]
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Vectorized portfolio valuation: market value, weights, day change, P&L
+against an optional cost basis, and sector exposure for every position in
+one pass over (position,) arrays.
+"""
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _json(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def merge_holdings(stocks: Sequence[Dict[str, Any]],
+                   cost_basis: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    One row per ticker from a portfolio's `stocks` list, summing repeated
+    entries. A position's cost basis (price paid per share) comes from
+    `cost_basis`, else from the entry's "purchase_price"; repeated entries
+    are combined into their quantity-weighted average. The cost basis is NaN
+    unless it is known for every share.
+    """
+    cost_basis = {ticker.upper(): price for ticker, price in (cost_basis or {}).items()}
+    tickers = np.array([str(item.get("stock", "")).upper() for item in stocks], dtype=str)
+    quantities = np.array([_number(item.get("holding")) for item in stocks])
+    costs = np.array([_number(cost_basis.get(ticker, item.get("purchase_price")))
+                      for ticker, item in zip(tickers, stocks)])
+    unique, index = np.unique(tickers, return_inverse=True)
+    index = index.reshape(-1)
+    quantity = np.bincount(index, weights=np.nan_to_num(quantities), minlength=len(unique))
+    known = ~np.isnan(costs)
+    paid = np.bincount(index, weights=np.where(known, costs * np.nan_to_num(quantities), 0.0), minlength=len(unique))
+    known_quantity = np.bincount(index, weights=np.where(known, np.nan_to_num(quantities), 0.0), minlength=len(unique))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average_cost = np.where((quantity > 0) & np.isclose(known_quantity, quantity), paid / quantity, np.nan)
+    return {"tickers": unique, "quantities": quantity, "cost_basis": average_cost}
+
+
+def value_positions(tickers: Sequence[str], quantities: np.ndarray, prices: np.ndarray,
+                    previous_closes: np.ndarray, cost_basis: np.ndarray,
+                    sectors: Sequence[Optional[str]]) -> Dict[str, Any]:
+    """
+    Value positions given per-position arrays. Positions without a price are
+    listed under "missing" and left out of totals and weights; P&L totals
+    cover the positions with a known cost basis.
+    """
+    quantities = np.asarray(quantities, dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    previous_closes = np.asarray(previous_closes, dtype=float)
+    cost_basis = np.asarray(cost_basis, dtype=float)
+
+    priced = ~np.isnan(prices)
+    market_value = quantities * prices
+    total_value = float(np.nansum(market_value))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = market_value / total_value if total_value else np.full(len(prices), np.nan)
+        day_change = quantities * (prices - previous_closes)
+        day_change_pct = (prices / previous_closes - 1) * 100
+        cost = quantities * cost_basis
+        profit_loss = market_value - cost
+        profit_loss_pct = profit_loss / cost * 100
+
+    has_cost = priced & ~np.isnan(cost)
+    total_cost = float(np.sum(cost[has_cost]))
+    total_profit_loss = float(np.sum(profit_loss[has_cost]))
+    previous_value = float(np.nansum(quantities * previous_closes * priced))
+    total_day_change = float(np.nansum(day_change))
+
+    sector_names = np.array([sector or "Unknown" for sector in sectors])
+    sector_values: Dict[str, Dict[str, Optional[float]]] = {}
+    if priced.any():
+        names, index = np.unique(sector_names[priced], return_inverse=True)
+        values = np.bincount(index.reshape(-1), weights=market_value[priced], minlength=len(names))
+        for name, value in sorted(zip(names, values), key=lambda item: -item[1]):
+            sector_values[str(name)] = {"market_value": float(value), "weight": float(value / total_value) if total_value else None}
+
+    positions = []
+    for i, ticker in enumerate(tickers):
+        if not priced[i]:
+            continue
+        positions.append({
+            "ticker": str(ticker),
+            "quantity": float(quantities[i]),
+            "price": float(prices[i]),
+            "market_value": float(market_value[i]),
+            "weight": _json(weight[i]),
+            "day_change": _json(day_change[i]),
+            "day_change_pct": _json(day_change_pct[i]),
+            "cost_basis": _json(cost_basis[i]),
+            "profit_loss": _json(profit_loss[i]),
+            "profit_loss_pct": _json(profit_loss_pct[i]),
+            "sector": str(sector_names[i]),
+        })
+    positions.sort(key=lambda position: -position["market_value"])
+
+    return {
+        "positions": positions,
+        "total": {
+            "market_value": total_value,
+            "day_change": total_day_change,
+            "day_change_pct": total_day_change / previous_value * 100 if previous_value else None,
+            "cost_basis": total_cost if has_cost.any() else None,
+            "profit_loss": total_profit_loss if has_cost.any() else None,
+            "profit_loss_pct": total_profit_loss / total_cost * 100 if total_cost else None,
+            "cost_basis_coverage": float(np.sum(market_value[has_cost]) / total_value) if total_value else None,
+        },
+        "sectors": sector_values,
+        "missing": [str(ticker) for ticker in np.asarray(tickers)[~priced]],
+    }
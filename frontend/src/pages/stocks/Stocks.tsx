@@ -5,6 +5,7 @@ import { IoMdArrowRoundBack } from "react-icons/io";
 import { FaMagnifyingGlass } from "react-icons/fa6";
 import { Link } from "react-router-dom";
 import getAuthInitials from "../../utils/getAuthInitials";
+import { applyDelta, applySnapshot, BarMessage, BarState } from "../../utils/barFeed";
 import { useAuthContext } from "../../context/AuthContext";
 
 const Stocks: React.FC = () => {
@@ -13,18 +14,34 @@ const Stocks: React.FC = () => {
 	const [monitorInterval, setMonitorInterval] = useState<number>(30);
 	const [stockData, setStockData] = useState<StockData | null>(null);
 	const socketRef = useRef<ReturnType<typeof io> | null>(null);
+	const barStateRef = useRef<BarState | null>(null);
 	const SOCKET_URL = import.meta.env.VITE_SOCKET_URL;
 
 	useEffect(() => {
 		const socket = io(SOCKET_URL);
 		socketRef.current = socket;
 
-		socket.on("stock_update", (data: StockData) => {
-			setStockData(data);
+		const setBarState = (state: BarState | null) => {
+			barStateRef.current = state;
+			if (state) setStockData(state.stockData);
+		};
+
+		socket.on("stock_snapshot", (snapshot: BarMessage) => {
+			setBarState(applySnapshot(barStateRef.current, snapshot));
+		});
+
+		socket.on("stock_delta", (delta: BarMessage) => {
+			const state = applyDelta(barStateRef.current, delta);
+			if (state) {
+				setBarState(state);
+			} else {
+				// Missed a delta: ask for a fresh snapshot.
+				socket.emit("resync");
+			}
 		});
 
 		// Monitor NVDA by default
-		socket.emit("start_monitoring", { symbol: "NVDA", interval: 30 });
+		socket.emit("start_monitoring", { symbol: "NVDA", interval: 30, protocol: "delta" });
 
 		return () => {
 			socket.disconnect();
@@ -36,6 +53,7 @@ const Stocks: React.FC = () => {
 			socketRef.current.emit("start_monitoring", {
 				symbol: search.toUpperCase(),
 				interval: monitorInterval,
+				protocol: "delta",
 			});
 		}
 	};
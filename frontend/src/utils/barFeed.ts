@@ -0,0 +1,72 @@
+import { StockData } from "../components/CandleStickChart";
+
+// Columnar bar message from the graph server: parallel arrays, one entry per bar.
+export interface BarMessage {
+  symbol: string;
+  seq: number;
+  prev_seq?: number;
+  start: string | null;
+  timestamp: string;
+  date: string[];
+  open: number[];
+  high: number[];
+  low: number[];
+  close: number[];
+  volume: number[];
+}
+
+export interface BarState {
+  seq: number;
+  stockData: StockData;
+}
+
+const toRows = (message: BarMessage) =>
+  message.date.map((date, i) => ({
+    date,
+    open: message.open[i],
+    high: message.high[i],
+    low: message.low[i],
+    close: message.close[i],
+  }));
+
+const toState = (message: BarMessage): BarState => ({
+  seq: message.seq,
+  stockData: {
+    symbol: message.symbol,
+    timestamp: Date.parse(message.timestamp),
+    data: toRows(message),
+  },
+});
+
+export const applySnapshot = (state: BarState | null, snapshot: BarMessage): BarState | null => {
+  // A delta newer than this snapshot may already have been applied.
+  if (state && state.stockData.symbol === snapshot.symbol && state.seq > snapshot.seq) {
+    return state;
+  }
+  return toState(snapshot);
+};
+
+// Returns the new state, or null when the delta does not follow the current
+// seq and a resync is needed.
+export const applyDelta = (state: BarState | null, delta: BarMessage): BarState | null => {
+  if (delta.prev_seq === 0) {
+    return toState(delta);
+  }
+  if (!state || state.stockData.symbol !== delta.symbol || delta.prev_seq !== state.seq) {
+    return state && state.seq >= delta.seq ? state : null;
+  }
+  const changed = new Map(toRows(delta).map((row) => [row.date, row]));
+  const kept = state.stockData.data
+    .filter((row) => delta.start === null || row.date >= delta.start)
+    .map((row) => changed.get(row.date) ?? row);
+  const known = new Set(kept.map((row) => row.date));
+  const added = toRows(delta).filter((row) => !known.has(row.date));
+  return {
+    seq: delta.seq,
+    stockData: {
+      symbol: delta.symbol,
+      timestamp: Date.parse(delta.timestamp),
+      data: [...kept, ...added].sort((a, b) => a.date.localeCompare(b.date)),
+    },
+  };
+};
@@ -0,0 +1,97 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def history_columns(history) -> Dict[str, np.ndarray]:
+    """
+    Columnar view of a PriceHistory: a 'date' array of YYYY-MM-DD strings and
+    one float array per OHLCV field, built without iterating over rows.
+    """
+    columns = {"date": history.timestamps.astype("datetime64[D]").astype(str)}
+    for i, field in enumerate(FIELDS):
+        columns[field] = np.asarray(history.values[:, i])
+    return columns
+
+
+def encode_columns(symbol: str, columns: Dict[str, np.ndarray], **header: Any) -> Dict[str, Any]:
+    """
+    Wire payload with bars as parallel arrays.
+    """
+    payload = {"symbol": symbol, **header, "timestamp": datetime.now().isoformat()}
+    for name, values in columns.items():
+        payload[name] = values.tolist()
+    return payload
+
+
+def to_frame(payload: Dict[str, Any], binary: bool) -> Any:
+    """
+    Serialize a payload as a msgpack binary frame when requested and
+    available, otherwise leave it for socket.io's JSON encoding.
+    """
+    if binary and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True)
+    return payload
+
+
+def _first(dates: np.ndarray) -> Optional[str]:
+    return str(dates[0]) if len(dates) else None
+
+
+class BarFeed:
+    """
+    Sequenced per-symbol bar state. update() diffs a fresh window against the
+    previous one and returns a delta carrying only new or changed bars; each
+    delta names the sequence number it applies on top of (prev_seq), so a
+    client that missed one can detect the gap and ask for a snapshot.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.seq = 0
+        self.columns: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    def update(self, columns: Dict[str, np.ndarray]) -> Optional[Dict[str, Any]]:
+        """
+        Apply a fresh window. Returns the delta payload, or None when nothing
+        changed (no message needs to be sent).
+        """
+        with self._lock:
+            previous = self.columns
+            dates = columns["date"]
+            changed = np.ones(len(dates), dtype=bool)
+            if previous is not None:
+                old_dates = previous["date"]
+                if len(old_dates):
+                    position = np.minimum(np.searchsorted(old_dates, dates), len(old_dates) - 1)
+                    known = old_dates[position] == dates
+                    changed = ~known
+                    for field in FIELDS:
+                        old = previous[field][position]
+                        new = columns[field]
+                        changed |= known & ~((old == new) | (np.isnan(old) & np.isnan(new)))
+                window_moved = _first(old_dates) != _first(dates)
+                if not changed.any() and not window_moved:
+                    return None
+
+            prev_seq = self.seq
+            self.seq += 1
+            self.columns = columns
+            delta = {name: values[changed] for name, values in columns.items()}
+            return encode_columns(self.symbol, delta, seq=self.seq, prev_seq=prev_seq, start=_first(dates))
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self.columns is None:
+                return None
+            return encode_columns(self.symbol, self.columns, seq=self.seq, start=_first(self.columns["date"]))
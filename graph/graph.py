@@ -1,67 +1,121 @@
 import os
-import yfinance as yf
-from flask import Flask, render_template
-from flask_socketio import SocketIO
+import sys
+from flask import Flask, render_template, request
+from flask_socketio import SocketIO, join_room, leave_room
 from flask_cors import CORS
 from datetime import datetime
-import threading
-import time
+from bar_feed import FIELDS, history_columns, msgpack, to_frame
+from subscriptions import RateBudget, SubscriptionManager
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend_ai"))
+from price_store import TICKER_RE, price_store
+from prefetch import PopularityTracker
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-current_symbol = "NVDA"
-monitoring_thread = None
-monitoring_lock = threading.Lock()
+# Upstream fetch budget shared by every symbol poller.
+UPSTREAM_RATE = float(os.getenv("GRAPH_UPSTREAM_RATE", "5"))
+UPSTREAM_BURST = int(os.getenv("GRAPH_UPSTREAM_BURST", "10"))
+MIN_INTERVAL = float(os.getenv("GRAPH_MIN_INTERVAL", "5"))
 
-def fetch_stock_data(symbol):
-    stock = yf.Ticker(symbol)
-    data = stock.history(period="1mo", interval="1d")
+# Update modes a client can ask for in start_monitoring. "full" is the
+# original protocol: the whole month as rows on every tick.
+FULL, DELTA, DELTA_MSGPACK = "full", "delta", "delta-msgpack"
+
+def fetch_stock_columns(symbol):
+    # Pollers run every MIN_INTERVAL seconds or slower; anything older than
+    # that is refreshed rather than waiting out the store's own interval.
+    data = price_store.history(symbol, "1mo", max_age=MIN_INTERVAL)
     if data.empty:
         return None
+    return history_columns(data)
 
-    ohlc_data = []
-    for date, row in data.iterrows():
-        ohlc_data.append({
-            "date": date.strftime("%Y-%m-%d"),
-            "open": row["Open"],
-            "high": row["High"],
-            "low": row["Low"],
-            "close": row["Close"],
-            "volume": row["Volume"]
-        })
-
+def full_payload(symbol, columns):
+    names = ("date",) + FIELDS
     return {
-        "symbol": symbol.upper(),
-        "data": ohlc_data,
+        "symbol": symbol,
+        "data": [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))],
         "timestamp": datetime.now().isoformat()
     }
 
-def start_stock_monitoring(interval=30):
-    global current_symbol
-    while True:
-        result = fetch_stock_data(current_symbol)
-        if result:
-            socketio.emit('stock_update', result)
-        time.sleep(interval)
+def fetch_stock_data(symbol):
+    columns = fetch_stock_columns(symbol)
+    return full_payload(symbol.upper(), columns) if columns else None
+
+def room_for(symbol, mode):
+    # One socket.io room per symbol and mode: only its watchers receive the update.
+    return symbol if mode == FULL else f"{symbol}:{mode}"
+
+def broadcast_stock_update(symbol, columns, delta):
+    if subscriptions.has_mode(symbol, FULL):
+        socketio.emit('stock_update', full_payload(symbol, columns), to=room_for(symbol, FULL))
+    if delta is None:
+        return
+    socketio.emit('stock_delta', delta, to=room_for(symbol, DELTA))
+    if msgpack is not None and subscriptions.has_mode(symbol, DELTA_MSGPACK):
+        socketio.emit('stock_delta', to_frame(delta, binary=True), to=room_for(symbol, DELTA_MSGPACK))
+
+def send_snapshot(symbol, mode):
+    snapshot = subscriptions.snapshot(symbol)
+    if snapshot:
+        socketio.emit('stock_snapshot', to_frame(snapshot, binary=mode == DELTA_MSGPACK), to=request.sid)
+
+subscriptions = SubscriptionManager(
+    fetch=fetch_stock_columns,
+    publish=broadcast_stock_update,
+    budget=RateBudget(UPSTREAM_RATE, UPSTREAM_BURST),
+    min_interval=MIN_INTERVAL
+)
+popularity = PopularityTracker("graph")
 
 @socketio.on('start_monitoring')
 def handle_start_monitoring(data):
-    global current_symbol, monitoring_thread
-    symbol = data.get('symbol', 'NVDA').upper()
+    symbol = str(data.get('symbol', 'NVDA')).strip().upper()
     interval = data.get('interval', 30)
+    if not TICKER_RE.match(symbol):
+        socketio.emit('error', {"error": f"Invalid symbol '{symbol}'."}, to=request.sid)
+        return
+    mode = FULL
+    if data.get('protocol') == 'delta':
+        mode = DELTA_MSGPACK if data.get('format') == 'msgpack' and msgpack is not None else DELTA
+
+    # Watched symbols count towards the API's prefetch ranking.
+    popularity.touch(symbol)
+    # Join the room before subscribing: subscribing may start the symbol's
+    # poller, whose first publish must already reach this client.
+    previous = subscriptions.current(request.sid)
+    if previous and previous != (symbol, mode):
+        leave_room(room_for(*previous))
+    join_room(room_for(symbol, mode))
+    subscriptions.subscribe(request.sid, symbol, interval, mode)
+
+    if mode != FULL:
+        # Later stock_delta messages apply on top of this snapshot's seq.
+        send_snapshot(symbol, mode)
+        return
+    latest = subscriptions.latest(symbol)
+    if latest:
+        socketio.emit('stock_update', full_payload(symbol, latest), to=request.sid)
+
+@socketio.on('resync')
+def handle_resync(data=None):
+    # Sent by delta clients that saw a gap in seq numbers.
+    current = subscriptions.current(request.sid)
+    if current:
+        send_snapshot(*current)
+
+@socketio.on('stop_monitoring')
+def handle_stop_monitoring(data=None):
+    previous = subscriptions.unsubscribe(request.sid)
+    if previous:
+        leave_room(room_for(*previous))
 
-    with monitoring_lock:
-        current_symbol = symbol
-        if monitoring_thread is None or not monitoring_thread.is_alive():
-            monitoring_thread = threading.Thread(
-                target=start_stock_monitoring,
-                args=(interval,),
-                daemon=True
-            )
-            monitoring_thread.start()
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    subscriptions.unsubscribe(request.sid)
 
 @app.route('/')
 def index():
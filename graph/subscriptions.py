@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from bar_feed import BarFeed
+
+
+class RateBudget:
+    """
+    Token bucket shared by all pollers, capping upstream fetches per second
+    across every watched symbol.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """
+        Block until a token is available. Returns False if stop is set first.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class SymbolPoller:
+    """
+    Background thread fetching one symbol's bars every `interval` seconds.
+    Each fetch is diffed by the symbol's BarFeed and handed to `publish`
+    as (symbol, columns, delta); delta is None when no bar changed.
+    """
+
+    def __init__(self, symbol: str, interval: float, fetch: Callable[[str], Any],
+                 publish: Callable[[str, Any, Any], None], budget: RateBudget):
+        self.symbol = symbol
+        self.interval = interval
+        self.fetch = fetch
+        self.publish = publish
+        self.budget = budget
+        self.feed = BarFeed(symbol)
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"poller-{symbol}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.budget.acquire(self._stop):
+                return
+            try:
+                result = self.fetch(self.symbol)
+            except Exception as e:
+                print(f"Error fetching {self.symbol}: {str(e)}")
+                result = None
+            if result and not self._stop.is_set():
+                self.last_result = result
+                self.publish(self.symbol, result, self.feed.update(result))
+            self._stop.wait(self.interval)
+
+
+class SubscriptionManager:
+    """
+    Tracks which client watches which symbol and runs exactly one poller per
+    actively watched symbol. A poller starts with its first subscriber, polls
+    at the shortest interval any subscriber asked for, and stops when the
+    last one leaves.
+    """
+
+    def __init__(self, fetch: Callable[[str], Any], publish: Callable[[str, Any, Any], None],
+                 budget: RateBudget, min_interval: float = 5):
+        self.fetch = fetch
+        self.publish = publish
+        self.budget = budget
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._client_symbol: Dict[str, Tuple[str, str]] = {}
+        self._subscribers: Dict[str, Dict[str, float]] = {}
+        self._pollers: Dict[str, SymbolPoller] = {}
+
+    def subscribe(self, sid: str, symbol: str, interval: float, mode: str = "full") -> Optional[Tuple[str, str]]:
+        """
+        Point a client at a symbol, receiving updates in the given mode.
+        Returns the (symbol, mode) it was previously subscribed with, if any,
+        so the caller can leave that room.
+        """
+        interval = max(float(interval), self.min_interval)
+        with self._lock:
+            previous = self._client_symbol.get(sid)
+            if previous is not None and previous[0] != symbol:
+                self._remove(sid, previous[0])
+            self._client_symbol[sid] = (symbol, mode)
+            self._subscribers.setdefault(symbol, {})[sid] = interval
+            poller = self._pollers.get(symbol)
+            if poller is None:
+                poller = self._pollers[symbol] = SymbolPoller(symbol, interval, self.fetch, self.publish, self.budget)
+                poller.start()
+            poller.interval = min(self._subscribers[symbol].values())
+        return previous if previous != (symbol, mode) else None
+
+    def unsubscribe(self, sid: str) -> Optional[Tuple[str, str]]:
+        """
+        Drop a client's subscription. Returns the (symbol, mode) it had.
+        """
+        with self._lock:
+            previous = self._client_symbol.pop(sid, None)
+            if previous is not None:
+                self._remove(sid, previous[0])
+            return previous
+
+    def current(self, sid: str) -> Optional[Tuple[str, str]]:
+        return self._client_symbol.get(sid)
+
+    def has_mode(self, symbol: str, mode: str) -> bool:
+        with self._lock:
+            return any(self._client_symbol.get(sid, (None, None))[1] == mode
+                       for sid in self._subscribers.get(symbol, {}))
+
+    def latest(self, symbol: str) -> Any:
+        poller = self._pollers.get(symbol)
+        return poller.last_result if poller is not None else None
+
+    def snapshot(self, symbol: str) -> Optional[Dict[str, Any]]:
+        poller = self._pollers.get(symbol)
+        return poller.feed.snapshot() if poller is not None else None
+
+    def _remove(self, sid: str, symbol: str) -> None:
+        subscribers = self._subscribers.get(symbol, {})
+        subscribers.pop(sid, None)
+        if subscribers:
+            self._pollers[symbol].interval = min(subscribers.values())
+            return
+        self._subscribers.pop(symbol, None)
+        poller = self._pollers.pop(symbol, None)
+        if poller is not None:
+            poller.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._client_symbol),
+                "symbols": {symbol: len(subscribers) for symbol, subscribers in self._subscribers.items()},
+            }